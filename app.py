@@ -4,9 +4,12 @@ import uvicorn
 from typing import Dict
 import logging
 from services.web_hook_processor import WebHookProcessor
-from services.redis_cache_service import RedisService
+from services.redis_cache_service import AsyncRedisService
 from services.mongodb_service import MongodbService
 from services.es_service import ESService
+from services.webhook_queue_service import WebHookQueueService
+from services.conversation_executor import ConversationExecutor
+from kafka_handler.kafka_producer_service import KafkaProducerService
 from di.di_container import Container
 from dependency_injector.wiring import inject
 from models.custom_exceptions import APPException
@@ -15,9 +18,8 @@ from openai._exceptions import OpenAIError
 from redis.exceptions import RedisError
 from aiohttp.client_exceptions import ClientResponseError
 import time
-import psutil
 from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_metricks.metricks import APP_MEMORY_USAGE, SUCCESS_REQUEST_COUNT, FAILED_REQUEST_COUNT
+from prometheus_metricks.metricks import SUCCESS_REQUEST_COUNT, FAILED_REQUEST_COUNT
 import os
 
 container = Container()
@@ -33,6 +35,7 @@ container.wire(
 )
 app = FastAPI()
 logger = logging.getLogger(__name__)
+WEBHOOK_INGESTION_MODE: str = os.getenv("WEBHOOK_INGESTION_MODE", "inline")
 
 Instrumentator().instrument(app).expose(app)
 
@@ -40,6 +43,14 @@ Instrumentator().instrument(app).expose(app)
 @app.on_event("startup")
 async def startup():
     container.init_resources()
+    await container.http_session_service().start()
+    await container.es_service().start()
+    await container.deferred_analysis_service().start()
+    await container.resource_monitor_service().start()
+    if WEBHOOK_INGESTION_MODE == "queue":
+        await container.webhook_queue_service().start()
+    if WEBHOOK_INGESTION_MODE == "kafka":
+        await container.kafka_producer_service().start()
 
 
 @app.exception_handler(APPException)
@@ -145,21 +156,19 @@ async def handle_http_error(
 
 @app.on_event("shutdown")
 async def shutdown():
+    if WEBHOOK_INGESTION_MODE == "queue":
+        await container.webhook_queue_service().stop()
+    if WEBHOOK_INGESTION_MODE == "kafka":
+        await container.kafka_producer_service().stop()
+    await container.resource_monitor_service().stop()
+    await container.deferred_analysis_service().stop()
+    await container.es_service().stop()
+    await container.mongo_db_service().stop()
+    await container.http_session_service().close()
     await container.shutdown_resources()
-
-
-@app.middleware('http')
-async def process_metrics(request: Request, call_next):
-    process = psutil.Process()
-
-    memory_before = process.memory_info().rss / (1024 * 1024)
-
-    response = await call_next(request)
-    memory_after = process.memory_info().rss / (1024 * 1024)
-
-    APP_MEMORY_USAGE.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).set(memory_after)
-
-    return response
+    await container.redis_events_pool().disconnect()
+    await container.redis_messages_pool().disconnect()
+    await container.redis_translations_pool().disconnect()
 
 
 @app.post("/webhook/test")
@@ -170,14 +179,14 @@ async def get_message(
             lambda: container.web_hook_processor()
         ),
         mongo_db_service: MongodbService = Depends(lambda: container.mongo_db_service()),
-        redis_service: RedisService = Depends(lambda: container.redis_service()),
+        redis_service: AsyncRedisService = Depends(lambda: container.redis_service()),
 ):
     payload: Dict = await request.json()
 
     notification_event_id: str | None = payload.get("id", None)
     if notification_event_id == None:
         return Response(status_code=status.HTTP_200_OK)
-    is_event_handled = redis_service.set_key(notification_event_id, "1")
+    is_event_handled = await redis_service.set_key(notification_event_id, "1")
     if is_event_handled == True:
 
         # await mongo_db_service.add_document_to_collection(
@@ -202,8 +211,15 @@ async def get_message(
             lambda: container.web_hook_processor()
         ),
         mongo_db_service: MongodbService = Depends(lambda: container.mongo_db_service()),
-        redis_service: RedisService = Depends(lambda: container.redis_service()),
+        redis_service: AsyncRedisService = Depends(lambda: container.redis_service()),
         es_service: ESService = Depends(lambda: container.es_service()),
+        webhook_queue_service: WebHookQueueService = Depends(
+            lambda: container.webhook_queue_service()
+        ),
+
+        conversation_executor: ConversationExecutor = Depends(
+            lambda: container.conversation_executor()
+        ),
 ):
     try:
 
@@ -212,11 +228,31 @@ async def get_message(
         notification_event_id: str | None = payload.get("id", None)
         if notification_event_id == None:
             return Response(status_code=status.HTTP_200_OK)
-        is_event_handled = redis_service.set_key(notification_event_id, "1")
+        is_event_handled = await redis_service.set_key(notification_event_id, "1")
         if is_event_handled == True:
 
             topic: str = payload.get("topic", "")
-            await web_hook_processor.process_message(topic, payload)
+            if WEBHOOK_INGESTION_MODE == "queue":
+                is_enqueued: bool = webhook_queue_service.enqueue(topic, payload)
+                if is_enqueued == False:
+                    # let intercom retry the event once the queue has room
+                    await redis_service.delete_key(notification_event_id)
+                    FAILED_REQUEST_COUNT.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).inc()
+                    return Response(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content="queue is full"
+                    )
+            elif WEBHOOK_INGESTION_MODE == "kafka":
+                kafka_producer_service: KafkaProducerService = container.kafka_producer_service()
+                is_published: bool = await kafka_producer_service.publish(payload)
+                if is_published == False:
+                    # let intercom retry the event once the broker is reachable
+                    await redis_service.delete_key(notification_event_id)
+                    FAILED_REQUEST_COUNT.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).inc()
+                    return Response(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content="broker unavailable"
+                    )
+            else:
+                await conversation_executor.process_message(topic, payload)
             SUCCESS_REQUEST_COUNT.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).inc()
 
             return Response(status_code=status.HTTP_200_OK)
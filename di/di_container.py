@@ -1,14 +1,30 @@
 from dependency_injector import containers, providers
 from services.mongodb_service import MongodbService
-from services.redis_cache_service import RedisService
+from services.redis_cache_service import (
+    AsyncRedisService,
+    AsyncMessagesCache,
+    create_async_redis_pool,
+)
 from services.web_hook_processor import WebHookProcessor
 from services.intercom_api_service import IntercomAPIService
 from services.openai_api_service import OpenAIService
 from services.conversation_parts_service import ConversationPartsService
-from services.redis_cache_service import MessagesCache
 from services.openai_translator_service import OpenAITranslatorService
 from services.es_service import ESService
+from services.http_service import HTTPSessionService
+from services.translation_cache_service import TranslationCacheService
 from services.claude_ai import ClaudeService
+from services.webhook_queue_service import WebHookQueueService
+from services.conversation_executor import ConversationExecutor
+from services.hedging_service import HedgedAnalyzerService
+from services.llm_limiter_service import LLMLimiterService
+from services.model_router_service import ModelRouterService
+from services.context_compaction_service import ContextCompactionService
+from services.deferred_analysis_service import DeferredAnalysisService
+from services.celery_tasks_service import CeleryTasksService
+from kafka_handler.kafka_producer_service import KafkaProducerService
+from kafka_handler.kafka_consumer_service import KafkaConsumerService
+from services.resource_monitor_service import ResourceMonitorService
 
 
 class Container(containers.DeclarativeContainer):
@@ -23,19 +39,69 @@ class Container(containers.DeclarativeContainer):
     # )
 
     mongo_db_service = providers.Singleton(MongodbService)
-    redis_service = providers.Singleton(RedisService)
+    redis_events_pool = providers.Singleton(create_async_redis_pool, db=1)
+    redis_messages_pool = providers.Singleton(create_async_redis_pool, db=2)
+    redis_translations_pool = providers.Singleton(create_async_redis_pool, db=3)
+    redis_service = providers.Singleton(
+        AsyncRedisService, connection_pool=redis_events_pool
+    )
     es_service:ESService = providers.Singleton(ESService)
-    intercom_api_service = providers.Singleton(IntercomAPIService)
-    messages_cache_service: MessagesCache = providers.Singleton(MessagesCache)
-    open_ai_service = providers.Singleton(OpenAIService, messages_cache_service=messages_cache_service)
-    claude_ai_service = providers.Singleton(ClaudeService, messages_cache_service=messages_cache_service)
-    translations_service = providers.Singleton(OpenAITranslatorService)
+    http_session_service = providers.Singleton(HTTPSessionService)
+    resource_monitor_service = providers.Singleton(ResourceMonitorService)
+    intercom_api_service = providers.Singleton(
+        IntercomAPIService, http_session_service=http_session_service
+    )
+    messages_cache_service: AsyncMessagesCache = providers.Singleton(
+        AsyncMessagesCache, connection_pool=redis_messages_pool
+    )
+    llm_limiter_service = providers.Singleton(LLMLimiterService)
+    open_ai_service = providers.Singleton(
+        OpenAIService,
+        messages_cache_service=messages_cache_service,
+        llm_limiter_service=llm_limiter_service,
+    )
+    claude_ai_service = providers.Singleton(
+        ClaudeService,
+        messages_cache_service=messages_cache_service,
+        llm_limiter_service=llm_limiter_service,
+    )
+    model_router_service = providers.Singleton(ModelRouterService)
+    context_compaction_service = providers.Singleton(
+        ContextCompactionService,
+        openai_service=open_ai_service,
+        messages_cache_service=messages_cache_service,
+    )
+    deferred_analysis_service = providers.Singleton(
+        DeferredAnalysisService,
+        openai_service=open_ai_service,
+        messages_cache_service=messages_cache_service,
+        context_compaction_service=context_compaction_service,
+    )
+    hedged_analyzer_service = providers.Singleton(
+        HedgedAnalyzerService,
+        openai_service=open_ai_service,
+        claude_ai_service=claude_ai_service,
+    )
+    translation_cache_service = providers.Singleton(
+        TranslationCacheService, connection_pool=redis_translations_pool
+    )
+    translations_service = providers.Singleton(
+        OpenAITranslatorService,
+        translation_cache=translation_cache_service,
+        llm_limiter_service=llm_limiter_service,
+    )
 
     conversation_parts_service = providers.Singleton(
         ConversationPartsService,
         open_ai_client=open_ai_service,
         intercom_client=intercom_api_service,
     )
+    celery_tasks_service = providers.Singleton(
+        CeleryTasksService,
+        open_ai_client=open_ai_service,
+        intercom_client=intercom_api_service,
+        conversation_parts_service=conversation_parts_service,
+    )
 
     web_hook_processor = providers.Singleton(
         WebHookProcessor,
@@ -46,5 +112,26 @@ class Container(containers.DeclarativeContainer):
         messages_cache_service=messages_cache_service,
         translations_service=translations_service,
         es_service=es_service,
-        claude_ai_service=claude_ai_service
+        claude_ai_service=claude_ai_service,
+        hedged_analyzer_service=hedged_analyzer_service,
+        model_router_service=model_router_service,
+        context_compaction_service=context_compaction_service,
+        deferred_analysis_service=deferred_analysis_service,
+    )
+
+    conversation_executor = providers.Singleton(
+        ConversationExecutor, web_hook_processor=web_hook_processor
+    )
+
+    webhook_queue_service = providers.Singleton(
+        WebHookQueueService,
+        conversation_executor=conversation_executor,
+        es_service=es_service,
+    )
+
+    kafka_producer_service = providers.Singleton(KafkaProducerService)
+    kafka_consumer_service = providers.Singleton(
+        KafkaConsumerService,
+        conversation_executor=conversation_executor,
+        es_service=es_service,
     )
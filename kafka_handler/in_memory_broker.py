@@ -0,0 +1,99 @@
+import asyncio
+import zlib
+from collections import namedtuple
+from typing import Dict, List, Set
+
+# same fields as the aiokafka structs the services read
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+ConsumerRecord = namedtuple(
+    "ConsumerRecord", ["topic", "partition", "offset", "key", "value"]
+)
+
+
+# single node stand-in for the broker, keeps the aiokafka producer and consumer
+# methods the services use so tests and local runs need no kafka
+class InMemoryBroker:
+    def __init__(self, partitions: int = 4):
+        self.partitions: int = partitions
+        self.logs: Dict[TopicPartition, List[ConsumerRecord]] = {}
+        self.committed: Dict[str, Dict[TopicPartition, int]] = {}
+
+    def topic_partitions(self, topic: str) -> List[TopicPartition]:
+        return [TopicPartition(topic, partition) for partition in range(self.partitions)]
+
+    def append(self, topic: str, key: bytes | None, value: bytes) -> ConsumerRecord:
+        # one key always lands on one partition, as with the kafka default partitioner
+        partition: int = zlib.crc32(key) % self.partitions if key is not None else 0
+        tp: TopicPartition = TopicPartition(topic, partition)
+        log: List[ConsumerRecord] = self.logs.setdefault(tp, [])
+        record: ConsumerRecord = ConsumerRecord(topic, partition, len(log), key, value)
+        log.append(record)
+        return record
+
+
+class InMemoryProducer:
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def send_and_wait(self, topic: str, value: bytes, key: bytes | None = None):
+        return self.broker.append(topic, key, value)
+
+
+class InMemoryConsumer:
+    def __init__(self, broker: InMemoryBroker, group_id: str):
+        self.broker = broker
+        self.group_id = group_id
+        self.assigned: Set[TopicPartition] = set()
+        self.positions: Dict[TopicPartition, int] = {}
+        self.listener = None
+
+    def subscribe(self, topics: List[str], listener=None):
+        self.listener = listener
+        for topic in topics:
+            self.assigned.update(self.broker.topic_partitions(topic))
+
+    async def start(self):
+        committed: Dict[TopicPartition, int] = self.broker.committed.get(self.group_id, {})
+        for tp in self.assigned:
+            self.positions[tp] = committed.get(tp, 0)
+        if self.listener is not None:
+            await self.listener.on_partitions_assigned(set(self.assigned))
+
+    async def stop(self):
+        if self.listener is not None:
+            await self.listener.on_partitions_revoked(set(self.assigned))
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self.assigned)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return len(self.broker.logs.get(tp, []))
+
+    async def getmany(
+        self, timeout_ms: int = 0, max_records: int | None = None
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        batch: Dict[TopicPartition, List[ConsumerRecord]] = {}
+        left: int = max_records if max_records is not None else -1
+        for tp in sorted(self.assigned):
+            records: List[ConsumerRecord] = self.broker.logs.get(tp, [])[self.positions[tp]:]
+            if left >= 0:
+                records = records[:left]
+                left -= len(records)
+            if records:
+                batch[tp] = records
+                self.positions[tp] += len(records)
+        if not batch:
+            await asyncio.sleep(timeout_ms / 1000)
+        return batch
+
+    async def commit(self, offsets: Dict[TopicPartition, int]):
+        self.broker.committed.setdefault(self.group_id, {}).update(offsets)
+
+    async def committed(self, tp: TopicPartition) -> int | None:
+        return self.broker.committed.get(self.group_id, {}).get(tp)
@@ -1,16 +1,200 @@
 import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from typing import Dict, List
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener
+from dotenv import load_dotenv
+from models.custom_exceptions import APPException
+from models.models import RequestInfo
+from services.conversation_executor import ConversationExecutor
+from services.es_service import ESService
+from prometheus_metricks.metricks import (
+    KAFKA_CONSUMER_LAG,
+    KAFKA_CONSUMED_COUNT,
+    KAFKA_COMMIT_COUNT,
+)
 
+load_dotenv()
+logger = logging.getLogger(__name__)
 
-class KafkaConsumerService:
-    def __init__(self):
-        pass
 
-    async def process_message(self):
+class CommitOnRevokeListener(ConsumerRebalanceListener):
+    def __init__(self, consumer_service: "KafkaConsumerService"):
+        self.consumer_service = consumer_service
+
+    async def on_partitions_revoked(self, revoked):
+        # the next owner starts from here, anything processed must be committed first
+        await self.consumer_service.commit()
+        for tp in revoked:
+            self.consumer_service.positions.pop(tp, None)
+            # committing a partition this member no longer owns fails the whole commit
+            self.consumer_service.pending_offsets.pop(tp, None)
+
+    async def on_partitions_assigned(self, assigned):
         pass
 
 
-def get_client():
-    pass
+class KafkaConsumerService:
+    def __init__(
+        self,
+        conversation_executor: ConversationExecutor,
+        es_service: ESService,
+        consumer=None,
+    ):
+        self.conversation_executor = conversation_executor
+        self.es_service = es_service
+        self.topic: str = os.getenv("KAFKA_WEBHOOK_TOPIC", "intercom-webhooks")
+        self.max_batch: int = int(os.getenv("KAFKA_MAX_BATCH", "100"))
+        self.poll_timeout_ms: int = int(os.getenv("KAFKA_POLL_TIMEOUT_MS", "1000"))
+        self.commit_interval: float = float(os.getenv("KAFKA_COMMIT_INTERVAL", "5.0"))
+        self.commit_batch: int = int(os.getenv("KAFKA_COMMIT_BATCH", "500"))
+        self.consumer = consumer or AIOKafkaConsumer(
+            bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
+            group_id=os.getenv("KAFKA_CONSUMER_GROUP", "webhook-processor"),
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+        )
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        # next offset to read per partition and the part of it not committed yet
+        self.positions: Dict = {}
+        self.pending_offsets: Dict = {}
+        self.uncommitted: int = 0
+        self.last_commit_at: float = time.monotonic()
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.task is not None:
+            return
+        self.consumer.subscribe([self.topic], listener=CommitOnRevokeListener(self))
+        await self.consumer.start()
+        self.task = asyncio.create_task(self.run())
+        logger.info(f"kafka consumer started topic:{self.topic}")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        await self.commit()
+        await self.consumer.stop()
+
+    async def run(self):
+        while True:
+            batch: Dict = await self.consumer.getmany(
+                timeout_ms=self.poll_timeout_ms, max_records=self.max_batch
+            )
+            # partitions run side by side, records of one partition in order
+            await asyncio.gather(
+                *(self.process_partition(tp, records) for tp, records in batch.items())
+            )
+            self.report_lag()
+            if self.uncommitted >= self.commit_batch or (
+                time.monotonic() - self.last_commit_at >= self.commit_interval
+            ):
+                await self.commit()
+
+    async def process_partition(self, tp, records: List):
+        for record in records:
+            await self.process_record(record)
+            self.positions[tp] = record.offset + 1
+            self.pending_offsets[tp] = record.offset + 1
+            self.uncommitted += 1
+
+    async def process_record(self, record):
+        try:
+            payload: Dict = json.loads(record.value)
+        except ValueError as e:
+            KAFKA_CONSUMED_COUNT.labels(pod_name=self.pod_name, result="invalid").inc()
+            logger.error(f"kafka record is not json partition:{record.partition} offset:{record.offset} error:{e}")
+            return
+        topic: str = payload.get("topic", "")
+        try:
+            await self.conversation_executor.process_message(topic, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # a failing event is recorded and skipped so it cannot block its partition
+            KAFKA_CONSUMED_COUNT.labels(pod_name=self.pod_name, result="failed").inc()
+            if isinstance(e, APPException):
+                app_exception: APPException = e
+            else:
+                app_exception = APPException(
+                    message=str(e),
+                    ex_class=f"{type(e).__module__}.{type(e).__name__}",
+                    event_type=topic,
+                    params={},
+                )
+            self.save_exception(app_exception)
+            return
+        KAFKA_CONSUMED_COUNT.labels(pod_name=self.pod_name, result="success").inc()
+
+    async def commit(self):
+        if not self.pending_offsets:
+            return
+        offsets: Dict = self.pending_offsets
+        self.pending_offsets = {}
+        self.uncommitted = 0
+        self.last_commit_at = time.monotonic()
+        try:
+            await self.consumer.commit(offsets)
+        except Exception as e:
+            # a quiet partition may never get a newer offset, retry these with
+            # the next commit unless a later record already moved past them
+            for tp, offset in offsets.items():
+                self.pending_offsets[tp] = max(self.pending_offsets.get(tp, 0), offset)
+            KAFKA_COMMIT_COUNT.labels(pod_name=self.pod_name, result="failed").inc()
+            logger.error(f"kafka commit failed: {e}")
+            return
+        KAFKA_COMMIT_COUNT.labels(pod_name=self.pod_name, result="success").inc()
+
+    def report_lag(self):
+        for tp in self.consumer.assignment():
+            highwater: int | None = self.consumer.highwater(tp)
+            position: int | None = self.positions.get(tp)
+            if highwater is None or position is None:
+                continue
+            KAFKA_CONSUMER_LAG.labels(
+                pod_name=self.pod_name, topic=tp.topic, partition=str(tp.partition)
+            ).set(highwater - position)
+
+    def save_exception(self, exception: APPException):
+        logger.error(f" error:{exception.message} event_type:{exception.event_type} ")
+        request_info: RequestInfo = RequestInfo(
+            exception=exception.__dict__,
+            status="error",
+            execution_time=None,
+            event_type=exception.event_type,
+        )
+        self.es_service.add_document(index_name="requests", document=request_info.dict())
+
+
+async def main():
+    # processing scales with consumers of the group, separate from the http pods
+    from di.di_container import Container
+
+    container = Container()
+    await container.http_session_service().start()
+    await container.es_service().start()
+    await container.deferred_analysis_service().start()
+    consumer_service: KafkaConsumerService = container.kafka_consumer_service()
+    await consumer_service.start()
+
+    stop_event: asyncio.Event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(stop_signal, stop_event.set)
+    await stop_event.wait()
+
+    await consumer_service.stop()
+    await container.deferred_analysis_service().stop()
+    await container.es_service().stop()
+    await container.mongo_db_service().stop()
+    await container.http_session_service().close()
 
 
-asyncio.run(KafkaConsumerService().process_message())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+from typing import Dict
+from aiokafka import AIOKafkaProducer
+from dotenv import load_dotenv
+from prometheus_metricks.metricks import KAFKA_PUBLISHED_COUNT
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class KafkaProducerService:
+    def __init__(self, producer=None):
+        self.topic: str = os.getenv("KAFKA_WEBHOOK_TOPIC", "intercom-webhooks")
+        # acks from all replicas before the webhook is answered, the event is
+        # not acknowledged to intercom until it is durable
+        self.producer = producer or AIOKafkaProducer(
+            bootstrap_servers=os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
+            acks="all",
+            enable_idempotence=True,
+            linger_ms=int(os.getenv("KAFKA_LINGER_MS", "5")),
+        )
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    async def start(self):
+        await self.producer.start()
+
+    async def stop(self):
+        await self.producer.stop()
+
+    async def publish(self, payload: Dict) -> bool:
+        # keyed by conversation so every event of a conversation shares a partition
+        conversation_id: str = payload.get("data", {}).get("item", {}).get("id", "")
+        try:
+            await self.producer.send_and_wait(
+                self.topic,
+                value=json.dumps(payload).encode("utf-8"),
+                key=conversation_id.encode("utf-8") if conversation_id else None,
+            )
+        except Exception as e:
+            KAFKA_PUBLISHED_COUNT.labels(pod_name=self.pod_name, result="failed").inc()
+            logger.error(f"kafka publish failed conversation:{conversation_id} error:{e}")
+            return False
+        KAFKA_PUBLISHED_COUNT.labels(pod_name=self.pod_name, result="success").inc()
+        return True
@@ -48,6 +48,15 @@ class ConversationMessages(BaseModel):
     messages: List[ConversationMessage] = []
 
 
+class ConversationState(BaseModel):
+    conversation_id: str
+    status: Optional[str] = None
+    language: Optional[str] = None
+    context_analysis: Optional[str] = None
+    analysis_status: Optional[str] = None
+    messages: List[ConversationMessage] = []
+
+
 class UserMessage(BaseModel):
     status: str
     original_text: str
@@ -65,3 +74,17 @@ class RequestInfo(BaseModel):
     event_type: str
     exception: Optional[Dict[str, Any]] = None
     timestamp: Optional[datetime] = datetime.utcnow().isoformat()
+
+
+class ModelRouteRule(BaseModel):
+    name: str
+    model: str
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    scripts: List[str] = []
+    last_statuses: List[str] = []
+
+
+class ModelRoute(BaseModel):
+    name: str
+    model: str
@@ -10,3 +10,116 @@ USER_CREATED_DURATION = Histogram(name='user_created_handler_duration', document
 SUCCESS_REQUEST_COUNT = Counter(name='success_request_count',labelnames=['pod_name'], documentation='succes request count')
 FAILED_REQUEST_COUNT = Counter(name='failed_request_count',labelnames=['pod_name'], documentation='failed request count')
 APP_MEMORY_USAGE = Gauge(name='app_memory_usage',labelnames=['pod_name'], documentation='app memory usage in mb')
+
+WEBHOOK_QUEUE_DEPTH = Gauge(name='webhook_queue_depth', labelnames=['pod_name'],
+                            documentation='webhook events waiting in the ingestion queue')
+WEBHOOK_QUEUE_WAIT_TIME = Histogram(name='webhook_queue_wait_time', documentation='seconds event spent in queue',
+                                    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0], labelnames=['pod_name'])
+WEBHOOK_QUEUE_REJECTED_COUNT = Counter(name='webhook_queue_rejected_count', labelnames=['pod_name'],
+                                       documentation='webhook events rejected because queue is full')
+WEBHOOK_QUEUE_FAILED_COUNT = Counter(name='webhook_queue_failed_count', labelnames=['pod_name'],
+                                     documentation='queued webhook events failed during processing')
+
+HTTP_POOL_CONNECTIONS_CREATED = Counter(name='http_pool_connections_created', labelnames=['pod_name'],
+                                        documentation='new tcp connections opened by shared http session')
+HTTP_POOL_CONNECTIONS_REUSED = Counter(name='http_pool_connections_reused', labelnames=['pod_name'],
+                                       documentation='keep-alive connections reused by shared http session')
+HTTP_POOL_CONNECTIONS_QUEUED = Counter(name='http_pool_connections_queued', labelnames=['pod_name'],
+                                       documentation='requests that waited for a free pooled connection')
+HTTP_REQUESTS_IN_FLIGHT = Gauge(name='http_requests_in_flight', labelnames=['pod_name'],
+                                documentation='outbound http requests in progress on shared session')
+
+RATE_LIMITER_TOKENS = Gauge(name='rate_limiter_tokens', labelnames=['pod_name', 'limiter'],
+                            documentation='tokens available in client side token bucket')
+RATE_LIMITER_RATE = Gauge(name='rate_limiter_rate', labelnames=['pod_name', 'limiter'],
+                          documentation='current refill rate of token bucket per second')
+RATE_LIMITER_QUEUE_SIZE = Gauge(name='rate_limiter_queue_size', labelnames=['pod_name', 'limiter'],
+                                documentation='requests waiting for a token')
+RATE_LIMITER_WAIT_TIME = Histogram(name='rate_limiter_wait_time', documentation='seconds waited for a token',
+                                   buckets=[0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0],
+                                   labelnames=['pod_name', 'limiter', 'priority'])
+INTERCOM_RATE_LIMITED_COUNT = Counter(name='intercom_rate_limited_count', labelnames=['pod_name'],
+                                      documentation='intercom responses with status 429')
+
+TRANSLATION_CACHE_REQUESTS = Counter(name='translation_cache_requests', labelnames=['pod_name', 'result'],
+                                     documentation='translation cache lookups by result (memory_hit, redis_hit, coalesced, miss)')
+LANGUAGE_DETECTION_COUNT = Counter(name='language_detection_count', labelnames=['pod_name', 'source', 'language'],
+                                   documentation='language detections resolved locally or by the llm fallback')
+USER_REPLIED_PIPELINE_DURATION = Histogram(name='user_replied_pipeline_duration',
+                                           documentation='user replied handler duration by analyzer mode and language',
+                                           buckets=[0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+                                           labelnames=['pod_name', 'mode', 'language'])
+SPECULATIVE_ANALYSIS_COUNT = Counter(name='speculative_analysis_count', labelnames=['pod_name', 'result'],
+                                     documentation='speculative analyses used or discarded after language detection')
+CLAUDE_INPUT_TOKENS = Counter(name='claude_input_tokens', labelnames=['pod_name', 'model', 'kind'],
+                              documentation='claude input tokens by kind (uncached, cache_read, cache_creation)')
+OPENAI_PROMPT_TOKENS = Counter(name='openai_prompt_tokens', labelnames=['pod_name', 'template', 'kind'],
+                               documentation='openai prompt tokens by template and kind (cached, uncached)')
+LLM_HEDGED_REQUESTS = Counter(name='llm_hedged_requests', labelnames=['pod_name', 'event_type', 'hedged'],
+                              documentation='analyzer requests by whether the secondary provider was fired')
+LLM_HEDGE_WINNER = Counter(name='llm_hedge_winner', labelnames=['pod_name', 'event_type', 'provider'],
+                           documentation='provider whose analysis was used (primary, secondary, none)')
+LLM_CONCURRENCY_LIMIT = Gauge(name='llm_concurrency_limit', labelnames=['pod_name', 'model'],
+                              documentation='current adaptive concurrency limit per model')
+LLM_IN_FLIGHT = Gauge(name='llm_in_flight', labelnames=['pod_name', 'model'],
+                      documentation='llm calls currently holding a concurrency slot')
+LLM_QUEUE_DEPTH = Gauge(name='llm_queue_depth', labelnames=['pod_name', 'model'],
+                        documentation='llm calls waiting for a concurrency slot')
+LLM_QUEUE_WAIT_TIME = Histogram(name='llm_queue_wait_time', labelnames=['pod_name', 'model'],
+                                documentation='seconds spent waiting for an llm concurrency slot',
+                                buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0])
+LLM_RATE_LIMITED_COUNT = Counter(name='llm_rate_limited_count', labelnames=['pod_name', 'model'],
+                                 documentation='llm calls rejected with 429 and retried')
+MODEL_ROUTE_DURATION = Histogram(name='model_route_duration', labelnames=['pod_name', 'route', 'model'],
+                                 documentation='analyzer call duration per model route',
+                                 buckets=[0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 7.0, 10.0, 15.0])
+MODEL_ROUTE_TOKENS = Histogram(name='model_route_tokens', labelnames=['pod_name', 'route', 'model', 'kind'],
+                               documentation='analyzer tokens per call per model route (prompt, completion)',
+                               buckets=[100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000])
+CONTEXT_ANALYSIS_TOKENS = Histogram(name='context_analysis_tokens', labelnames=['pod_name', 'stage'],
+                                    documentation='estimated tokens of the stored context analysis (stored, compacted)',
+                                    buckets=[50, 100, 200, 300, 400, 600, 800, 1200, 2000])
+CONTEXT_COMPACTION_COUNT = Counter(name='context_compaction_count', labelnames=['pod_name', 'mode', 'result'],
+                                   documentation='context compactions by result (compacted, stale, rejected, failed)')
+DEFERRED_QUEUE_DEPTH = Gauge(name='deferred_queue_depth', labelnames=['pod_name', 'mode'],
+                             documentation='deferred llm jobs waiting to be run or batched')
+DEFERRED_WORK_COUNT = Counter(name='deferred_work_count', labelnames=['pod_name', 'mode', 'result'],
+                              documentation='deferred context updates by result (written, stale, failed, rejected)')
+DEFERRED_BATCHES_SUBMITTED = Counter(name='deferred_batches_submitted', labelnames=['pod_name'],
+                                     documentation='openai batch jobs submitted for deferred work')
+ES_BUFFER_SIZE = Gauge(name='es_buffer_size', labelnames=['pod_name'],
+                       documentation='documents waiting for the next elasticsearch bulk flush')
+ES_DOCUMENTS_DROPPED = Counter(name='es_documents_dropped', labelnames=['pod_name', 'reason'],
+                               documentation='documents not indexed (overflow, sampled, failed)')
+ES_BULK_DURATION = Histogram(name='es_bulk_duration', labelnames=['pod_name'],
+                             documentation='elasticsearch bulk request duration',
+                             buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0])
+MONGO_WRITE_QUEUE_DEPTH = Gauge(name='mongo_write_queue_depth', labelnames=['pod_name'],
+                                documentation='documents waiting for the next mongo insert_many')
+MONGO_BATCH_DOCUMENTS = Histogram(name='mongo_batch_documents', labelnames=['pod_name'],
+                                  documentation='documents per mongo insert_many',
+                                  buckets=[1, 10, 50, 100, 250, 500, 1000])
+MONGO_SPILLED_COUNT = Counter(name='mongo_spilled_count', labelnames=['pod_name', 'reason'],
+                              documentation='documents spilled to disk (backpressure, failed, shutdown)')
+MONGO_REPLAYED_COUNT = Counter(name='mongo_replayed_count', labelnames=['pod_name'],
+                               documentation='spilled documents written to mongo on replay')
+KAFKA_PUBLISHED_COUNT = Counter(name='kafka_published_count', labelnames=['pod_name', 'result'],
+                                documentation='webhook events published to kafka (success, failed)')
+KAFKA_CONSUMED_COUNT = Counter(name='kafka_consumed_count', labelnames=['pod_name', 'result'],
+                               documentation='webhook events consumed from kafka (success, failed, invalid)')
+KAFKA_COMMIT_COUNT = Counter(name='kafka_commit_count', labelnames=['pod_name', 'result'],
+                             documentation='kafka offset commits (success, failed)')
+KAFKA_CONSUMER_LAG = Gauge(name='kafka_consumer_lag', labelnames=['pod_name', 'topic', 'partition'],
+                           documentation='records between the partition high watermark and the last processed offset')
+APP_CPU_PERCENT = Gauge(name='app_cpu_percent', labelnames=['pod_name'],
+                        documentation='process cpu usage in percent of one core since the previous sample')
+APP_OPEN_FDS = Gauge(name='app_open_fds', labelnames=['pod_name'],
+                     documentation='open file descriptors of the process')
+APP_THREADS = Gauge(name='app_threads', labelnames=['pod_name'],
+                    documentation='threads of the process')
+APP_GC_OBJECTS = Gauge(name='app_gc_objects', labelnames=['pod_name', 'generation'],
+                       documentation='objects tracked per gc generation')
+APP_GC_COLLECTIONS = Gauge(name='app_gc_collections', labelnames=['pod_name', 'generation'],
+                           documentation='gc collections per generation since start')
+EVENT_LOOP_LAG = Gauge(name='event_loop_lag', labelnames=['pod_name'],
+                       documentation='worst event loop scheduling delay in seconds since the previous sample')
@@ -4,10 +4,15 @@ from services.conversation_parts_service import ConversationPartsService
 
 
 class CeleryTasksService:
-    def __init__(self):
-        self.open_ai_client = OpenAIService()
-        self.intercom_client = IntercomAPIService()
-        self.conversation_parts_service = ConversationPartsService()
+    def __init__(
+        self,
+        open_ai_client: OpenAIService,
+        intercom_client: IntercomAPIService,
+        conversation_parts_service: ConversationPartsService,
+    ):
+        self.open_ai_client = open_ai_client
+        self.intercom_client = intercom_client
+        self.conversation_parts_service = conversation_parts_service
 
     async def translate_message_from_hindi_to_admin(
         self, message: str, admin_id: str, conversation_id: str
@@ -4,16 +4,152 @@ from dotenv import load_dotenv
 import json
 from typing import Dict, List
 from models.models import UserMessage
-from services.redis_cache_service import MessagesCache
+from services.redis_cache_service import AsyncMessagesCache
+from services.llm_limiter_service import LLMLimiterService
 from models.models import ConversationMessages, ConversationMessage
+from prometheus_metricks.metricks import CLAUDE_INPUT_TOKENS
+from services.prompt_templates import (
+    USER_MESSAGE_ANALYZER_PROMPT,
+    build_user_message_input,
+    parse_user_message,
+)
 
 load_dotenv()
 
+CLAUDE_ANALYZER_MODEL: str = "claude-3-5-sonnet-20241022"
+
+CLAUDE_ANALYZER_EXAMPLES_PROMPT = """# Casino Support AI Assistant
+
+## EXAMPLES - STATUS=UNCERTAIN
+- "Mera petrol add nahi huwa?" (casino slang, unclear reference)
+- "Bhai mera khata me paisa nahi aaya, diesel payment ka wait kar raha hu" (unclear meaning)
+- "Problem abhi bhi hai" (which problem?)
+- "Ab to 48 ghante se jyada ho gai payment ko ab to kar do" (unclear reference)
+- "Kitna time lagega?" (waiting for what?)
+
+## EXAMPLES - STATUS=ERROR_FIXED
+- "Mera withdrawl nahi hua" → "Mera withdrawal nahi hua"
+- "Bonoos kab milega?" → "Bonus kab milega?"
+- "Deopsit failed ho gaya" → "Deposit failed ho gaya"
+
+## EXAMPLES - STATUS=NO_ERROR
+- "Withdrawal ID #45678 ka status kya hai?"
+- "Maine 5000 rupees deposit kiya hai lekin mere account me show nahi ho raha"
+- "10% deposit bonus mujhe nahi mila"
+
+## CASINO TERMINOLOGY
+- "petrol", "diesel", "gas", "fuel" → often mean "withdrawal" or payments
+- "engine", "car", "tank" → may refer to account functionality or balance
+- "recharge" → often means deposit
+- "mobile balance" → may refer to account balance
+- "ID" → may refer to player account or specific game/bet ID"""
+
+CLAUDE_ANALYZER_INSTRUCTIONS_PROMPT = """## CORE INSTRUCTIONS
+You are a casino support AI analyzing player messages in English, Hindi, Hinglish, or Bengali.
+
+LANGUAGE DETECTION: For each message, determine the language based on these criteria:
+- 'Hindi' – text written in Devanagari script (e.g., 'नमस्ते, मेरी समस्या है...')
+- 'Hinglish' – text written in Latin alphabet representing Hindi words phonetically (e.g., 'namaste, meri samasya hai...')
+- 'English' – standard English text (e.g., 'Hello, I have a problem...')
+- 'Bengali' – text written in Bengali script (বাংলা)
+- 'Uncertain' – language unclear or mixed in a way that makes identification difficult
+
+CONTEXT: Analyze full chat history before interpreting the current message. Pay attention to previously discussed topics, especially specific withdrawal IDs, bonus types, deposit amounts, etc.
+
+RESPONSE FORMAT: Return valid JSON with no text before or after it. No code blocks or markdown.
+
+{
+    "status": "[uncertain/error_fixed/no_error]",
+    "language": "[Hindi/Hinglish/English/Bengali/Uncertain]",
+    "original_text": "original message",
+    "translated_text": "English translation",
+    "context_analysis": "Brief summary of chat history's influence",
+    
+    // Only for status=error_fixed:
+    "corrected_text": "message with all corrections",
+    
+    // Only for status=uncertain:
+    "possible_interpretations": [
+        "Interpretation 1: most likely meaning",
+        "Interpretation 2: alternative meaning"
+    ],
+    "note": "Explanation with two alternative translations:\\n1. [First translation]\\n2. [Second translation]\\nClarification needed."
+}"""
+
+CLAUDE_ANALYZER_STATUS_RULES_PROMPT = """## STATUS DEFINITIONS
+
+### "uncertain" status
+Use when:
+- Multiple possible meanings exist
+- Contains unusual words in casino context
+- Contains regional slang
+- Lacks sufficient context
+- Is vague or unclear
+- Contains non-specific complaints
+- Lacks details about which feature has issues
+- Makes ambiguous references to previous issues
+- Discusses non-gambling problems
+- Expresses urgency without specifying issue
+- Uses ambiguous commands without specifics
+- Refers to "payment" without clarifying type
+
+### "error_fixed" status
+Use when correcting:
+- Spelling mistakes
+- Typos
+- Incorrect gambling terminology
+- Grammar errors affecting meaning
+Always include "corrected_text" field.
+
+### "no_error" status
+Use when message:
+- Has clear, specific request
+- Contains no mistakes or ambiguity
+- Is specific about feature being discussed
+- Does not require guesswork
+- Relates to casino services
+
+## PRIORITY RULES
+1. Context can override ambiguity ONLY when it provides COMPLETE clarity
+2. When in doubt between "no_error" and "uncertain", choose "uncertain"
+3. Messages with time urgency without context should be "uncertain"
+4. Generalized commands without specifics should be "uncertain"
+5. For ongoing problem complaints, reference specific previous issues"""
+
+# static prompt sections go first so the whole prefix is cached, only the
+# per-conversation messages after the breakpoint are billed at full price
+CLAUDE_ANALYZER_SYSTEM_BLOCKS: List[Dict] = [
+    {"type": "text", "text": CLAUDE_ANALYZER_EXAMPLES_PROMPT},
+    {"type": "text", "text": CLAUDE_ANALYZER_INSTRUCTIONS_PROMPT},
+    {
+        "type": "text",
+        "text": CLAUDE_ANALYZER_STATUS_RULES_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    },
+]
+
+# same analyzer prompt as OpenAIService, so either provider can answer a request
+USER_MESSAGE_ANALYZER_SYSTEM_BLOCKS: List[Dict] = [
+    {
+        "type": "text",
+        "text": USER_MESSAGE_ANALYZER_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    },
+]
+
 
 class ClaudeService:
-    def __init__(self, messages_cache_service: MessagesCache):
-        self.client = AsyncAnthropic(api_key=os.getenv("CLAUDE_API_KEY"))
+    def __init__(
+            self,
+            messages_cache_service: AsyncMessagesCache,
+            llm_limiter_service: LLMLimiterService | None = None,
+    ):
+        # retries are done by the limiter so it sees every 429
+        self.client = AsyncAnthropic(api_key=os.getenv("CLAUDE_API_KEY"), max_retries=0)
+        self.llm_limiter_service = llm_limiter_service or LLMLimiterService()
         self.messages_cache_service = messages_cache_service
+        self.chat_history_limit: int = int(os.getenv("CHAT_HISTORY_LIMIT", "20"))
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
 
     async def analyze_message_with_correction(self, message: str, conversation_id: str):
         system_promt = """# Casino Support AI Assistant
@@ -470,103 +606,6 @@ Use when message:
 - Does not require guesswork
 - Relates to casino services
 
-## PRIORITY RULES
-1. Context can override ambiguity ONLY when it provides COMPLETE clarity
-2. When in doubt between "no_error" and "uncertain", choose "uncertain"
-3. Messages with time urgency without context should be "uncertain"
-4. Generalized commands without specifics should be "uncertain"
-5. For ongoing problem complaints, reference specific previous issues"""
-        system_promt_language = """# Casino Support AI Assistant
-
-## EXAMPLES - STATUS=UNCERTAIN
-- "Mera petrol add nahi huwa?" (casino slang, unclear reference)
-- "Bhai mera khata me paisa nahi aaya, diesel payment ka wait kar raha hu" (unclear meaning)
-- "Problem abhi bhi hai" (which problem?)
-- "Ab to 48 ghante se jyada ho gai payment ko ab to kar do" (unclear reference)
-- "Kitna time lagega?" (waiting for what?)
-
-## EXAMPLES - STATUS=ERROR_FIXED
-- "Mera withdrawl nahi hua" → "Mera withdrawal nahi hua"
-- "Bonoos kab milega?" → "Bonus kab milega?"
-- "Deopsit failed ho gaya" → "Deposit failed ho gaya"
-
-## EXAMPLES - STATUS=NO_ERROR
-- "Withdrawal ID #45678 ka status kya hai?"
-- "Maine 5000 rupees deposit kiya hai lekin mere account me show nahi ho raha"
-- "10% deposit bonus mujhe nahi mila"
-
-## CASINO TERMINOLOGY
-- "petrol", "diesel", "gas", "fuel" → often mean "withdrawal" or payments
-- "engine", "car", "tank" → may refer to account functionality or balance
-- "recharge" → often means deposit
-- "mobile balance" → may refer to account balance
-- "ID" → may refer to player account or specific game/bet ID
-
-## CORE INSTRUCTIONS
-You are a casino support AI analyzing player messages in English, Hindi, Hinglish, or Bengali.
-
-LANGUAGE DETECTION: For each message, determine the language based on these criteria:
-- 'Hindi' – text written in Devanagari script (e.g., 'नमस्ते, मेरी समस्या है...')
-- 'Hinglish' – text written in Latin alphabet representing Hindi words phonetically (e.g., 'namaste, meri samasya hai...')
-- 'English' – standard English text (e.g., 'Hello, I have a problem...')
-- 'Bengali' – text written in Bengali script (বাংলা)
-- 'Uncertain' – language unclear or mixed in a way that makes identification difficult
-
-CONTEXT: Analyze full chat history before interpreting the current message. Pay attention to previously discussed topics, especially specific withdrawal IDs, bonus types, deposit amounts, etc.
-
-RESPONSE FORMAT: Return valid JSON with no text before or after it. No code blocks or markdown.
-
-{
-    "status": "[uncertain/error_fixed/no_error]",
-    "language": "[Hindi/Hinglish/English/Bengali/Uncertain]",
-    "original_text": "original message",
-    "translated_text": "English translation",
-    "context_analysis": "Brief summary of chat history's influence",
-    
-    // Only for status=error_fixed:
-    "corrected_text": "message with all corrections",
-    
-    // Only for status=uncertain:
-    "possible_interpretations": [
-        "Interpretation 1: most likely meaning",
-        "Interpretation 2: alternative meaning"
-    ],
-    "note": "Explanation with two alternative translations:\\n1. [First translation]\\n2. [Second translation]\\nClarification needed."
-}
-
-## STATUS DEFINITIONS
-
-### "uncertain" status
-Use when:
-- Multiple possible meanings exist
-- Contains unusual words in casino context
-- Contains regional slang
-- Lacks sufficient context
-- Is vague or unclear
-- Contains non-specific complaints
-- Lacks details about which feature has issues
-- Makes ambiguous references to previous issues
-- Discusses non-gambling problems
-- Expresses urgency without specifying issue
-- Uses ambiguous commands without specifics
-- Refers to "payment" without clarifying type
-
-### "error_fixed" status
-Use when correcting:
-- Spelling mistakes
-- Typos
-- Incorrect gambling terminology
-- Grammar errors affecting meaning
-Always include "corrected_text" field.
-
-### "no_error" status
-Use when message:
-- Has clear, specific request
-- Contains no mistakes or ambiguity
-- Is specific about feature being discussed
-- Does not require guesswork
-- Relates to casino services
-
 ## PRIORITY RULES
 1. Context can override ambiguity ONLY when it provides COMPLETE clarity
 2. When in doubt between "no_error" and "uncertain", choose "uncertain"
@@ -576,8 +615,8 @@ Use when message:
 
         try:
             messages: List[Dict] = []
-            chat_history: List[Dict] = self.get_chat_history(
-                conversation_id=conversation_id
+            chat_history: List[Dict] = await self.get_chat_history(
+                conversation_id=conversation_id, limit=self.chat_history_limit
             )
             for message_chat in chat_history:
                 messages.append(
@@ -589,14 +628,15 @@ Use when message:
 
             messages.append({"role": "user", "content": f"CURRENT MESSAGE: {message}"})
 
-            response = await self.client.messages.create(
+            response = await self.create_message(
                 # model="claude-3-5-haiku-20241022",
-                model="claude-3-5-sonnet-20241022",
+                model=CLAUDE_ANALYZER_MODEL,
                 max_tokens=500,
-                system=system_promt_language,
+                system=CLAUDE_ANALYZER_SYSTEM_BLOCKS,
                 temperature=0,
                 messages=[{"role": "user", "content": f"CURRENT MESSAGE: {message}"}],
             )
+            self.record_usage(model=CLAUDE_ANALYZER_MODEL, usage=response.usage)
 
             response_dict: Dict = json.loads(response.content[0].text)
 
@@ -656,17 +696,29 @@ Use when message:
         except Exception as e:
             raise e
 
-    def get_chat_history(self, conversation_id: str) -> List[Dict]:
-
-        chat_mesages: ConversationMessages | None = (
-            self.messages_cache_service.get_conversation_messages(
-                conversation_id=conversation_id
+    async def analyze_message_with_context(
+            self, message: str, analys: str
+    ) -> UserMessage | None:
+        user_input: str = build_user_message_input(message=message, analys=analys)
+        response = await self.create_message(
+            model=CLAUDE_ANALYZER_MODEL,
+            max_tokens=1024,
+            system=USER_MESSAGE_ANALYZER_SYSTEM_BLOCKS,
+            temperature=0,
+            messages=[{"role": "user", "content": user_input}],
+        )
+        self.record_usage(model=CLAUDE_ANALYZER_MODEL, usage=response.usage)
+        response_dict: Dict = json.loads(response.content[0].text)
+        return parse_user_message(response_dict)
+
+    async def get_chat_history(
+            self, conversation_id: str, limit: int | None = None
+    ) -> List[Dict]:
+        messages: List[ConversationMessage] = (
+            await self.messages_cache_service.get_last_conversation_messages(
+                conversation_id=conversation_id.removeprefix("conv:"), limit=limit
             )
         )
-        if chat_mesages == None:
-            return []
-
-        messages: List[ConversationMessage] = chat_mesages.messages
         result_messages: List[Dict] = []
         for chat_message in messages:
             if chat_message.user.type == "admin":
@@ -680,3 +732,19 @@ Use when message:
                 )
 
         return result_messages
+
+    async def create_message(self, **kwargs):
+        return await self.llm_limiter_service.call(
+            kwargs["model"], lambda: self.client.messages.create(**kwargs)
+        )
+
+    def record_usage(self, model: str, usage):
+        tokens_by_kind: Dict[str, int] = {
+            "uncached": usage.input_tokens or 0,
+            "cache_read": getattr(usage, "cache_read_input_tokens", None) or 0,
+            "cache_creation": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        }
+        for kind, tokens in tokens_by_kind.items():
+            CLAUDE_INPUT_TOKENS.labels(pod_name=self.pod_name, model=model, kind=kind).inc(
+                tokens
+            )
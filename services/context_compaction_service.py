@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from typing import Set
+from dotenv import load_dotenv
+from services.openai_api_service import OpenAIService
+from services.redis_cache_service import AsyncMessagesCache
+from prometheus_metricks.metricks import CONTEXT_ANALYSIS_TOKENS, CONTEXT_COMPACTION_COUNT
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    # close enough for english summaries with the gpt tokenizers
+    return len(text) // 4 + 1
+
+
+class ContextCompactionService:
+    def __init__(
+        self, openai_service: OpenAIService, messages_cache_service: AsyncMessagesCache
+    ):
+        self.openai_service = openai_service
+        self.messages_cache_service = messages_cache_service
+        self.mode: str = os.getenv("CONTEXT_COMPACTION_MODE", "async")
+        self.token_budget: int = int(os.getenv("CONTEXT_ANALYSIS_TOKEN_BUDGET", "400"))
+        self.threshold: int = int(
+            os.getenv("CONTEXT_COMPACTION_THRESHOLD", str(self.token_budget * 3 // 2))
+        )
+        self.model: str = os.getenv("CONTEXT_COMPACTION_MODEL", "gpt-4o-mini")
+        self.tasks: Set[asyncio.Task] = set()
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    async def compact(self, conversation_id: str, context_analysis: str):
+        tokens: int = estimate_tokens(context_analysis)
+        CONTEXT_ANALYSIS_TOKENS.labels(pod_name=self.pod_name, stage="stored").observe(tokens)
+        if self.mode == "off" or tokens <= self.threshold:
+            return
+        if self.mode == "async":
+            task: asyncio.Task = asyncio.create_task(
+                self.compact_and_store(conversation_id, context_analysis)
+            )
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            return
+        await self.compact_and_store(conversation_id, context_analysis)
+
+    async def compact_and_store(self, conversation_id: str, context_analysis: str):
+        try:
+            compacted: str = await self.openai_service.compact_context_analysis(
+                context_analysis=context_analysis,
+                word_limit=self.token_budget * 3 // 4,
+                model=self.model,
+            )
+            if not compacted or len(compacted) >= len(context_analysis):
+                CONTEXT_COMPACTION_COUNT.labels(
+                    pod_name=self.pod_name, mode=self.mode, result="rejected"
+                ).inc()
+                return
+            # a newer turn may have rewritten the analysis while we were summarizing
+            replaced: bool = await self.messages_cache_service.replace_context_analysis(
+                conversation_id=conversation_id,
+                expected=context_analysis,
+                context_analysis=compacted,
+            )
+            CONTEXT_COMPACTION_COUNT.labels(
+                pod_name=self.pod_name,
+                mode=self.mode,
+                result="compacted" if replaced else "stale",
+            ).inc()
+            if replaced:
+                CONTEXT_ANALYSIS_TOKENS.labels(
+                    pod_name=self.pod_name, stage="compacted"
+                ).observe(estimate_tokens(compacted))
+        except Exception as e:
+            CONTEXT_COMPACTION_COUNT.labels(
+                pod_name=self.pod_name, mode=self.mode, result="failed"
+            ).inc()
+            logger.error(f"context compaction failed conversation:{conversation_id} error:{e}")
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Dict
+from services.web_hook_processor import WebHookProcessor
+
+
+class ConversationExecutor:
+    def __init__(self, web_hook_processor: WebHookProcessor):
+        self.web_hook_processor = web_hook_processor
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.pending: Dict[str, int] = {}
+
+    async def process_message(self, topic: str, message: Dict):
+        conversation_id: str = message.get("data", {}).get("item", {}).get("id", "")
+        if conversation_id == "":
+            await self.web_hook_processor.process_message(topic, message)
+            return
+
+        # no await before acquire: events of one conversation take the lock
+        # in the order callers reached this point, and asyncio.Lock is FIFO
+        lock: asyncio.Lock | None = self.locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[conversation_id] = lock
+            self.pending[conversation_id] = 0
+        self.pending[conversation_id] += 1
+        try:
+            async with lock:
+                await self.web_hook_processor.process_message(topic, message)
+        finally:
+            self.pending[conversation_id] -= 1
+            if self.pending[conversation_id] == 0:
+                del self.pending[conversation_id]
+                del self.locks[conversation_id]
+
+    def active_conversations(self) -> int:
+        return len(self.locks)
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from services.openai_api_service import OpenAIService
+from services.redis_cache_service import AsyncMessagesCache
+from services.context_compaction_service import ContextCompactionService
+from prometheus_metricks.metricks import (
+    DEFERRED_QUEUE_DEPTH,
+    DEFERRED_WORK_COUNT,
+    DEFERRED_BATCHES_SUBMITTED,
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# conversation id, agent message and the context analysis it should be applied to
+AgentMessageJob = Tuple[str, str, str | None]
+
+
+class DeferredAnalysisService:
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        messages_cache_service: AsyncMessagesCache,
+        context_compaction_service: ContextCompactionService,
+    ):
+        self.openai_service = openai_service
+        self.messages_cache_service = messages_cache_service
+        self.context_compaction_service = context_compaction_service
+        # sync keeps the update inside the webhook, background runs it on a
+        # local worker, batch sends it through the openai batch api
+        self.mode: str = os.getenv("AGENT_CONTEXT_MODE", "background")
+        self.max_size: int = int(os.getenv("DEFERRED_QUEUE_MAX_SIZE", "1000"))
+        self.workers_count: int = int(os.getenv("DEFERRED_WORKERS", "2"))
+        self.batch_max_size: int = int(os.getenv("DEFERRED_BATCH_MAX_SIZE", "500"))
+        self.batch_interval: float = float(os.getenv("DEFERRED_BATCH_INTERVAL", "60"))
+        self.poll_interval: float = float(os.getenv("DEFERRED_BATCH_POLL_INTERVAL", "60"))
+        self.drain_timeout: float = float(os.getenv("DEFERRED_DRAIN_TIMEOUT", "10"))
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.queue: asyncio.Queue | None = None
+        self.workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self.mode == "sync" or self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        if self.mode == "batch":
+            self.workers = [
+                asyncio.create_task(self.submit_batches()),
+                asyncio.create_task(self.poll_batches()),
+            ]
+        else:
+            self.workers = [
+                asyncio.create_task(self.consume()) for _ in range(self.workers_count)
+            ]
+        logger.info(f"deferred analysis started mode:{self.mode} max_size:{self.max_size}")
+
+    async def stop(self):
+        if self.queue is None:
+            return
+        if self.mode != "batch":
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"deferred analysis drain timeout, jobs left:{self.queue.qsize()}"
+                )
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self.mode == "batch":
+            # whatever was collected still goes out, any pod picks up the results
+            await self.submit_batch(self.drain())
+        self.queue = None
+
+    def defer_agent_message(
+        self, conversation_id: str, agent_message: str, context_analysis: str | None
+    ) -> bool:
+        if self.queue is None:
+            return False
+        job: AgentMessageJob = (conversation_id, agent_message, context_analysis)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            DEFERRED_WORK_COUNT.labels(
+                pod_name=self.pod_name, mode=self.mode, result="rejected"
+            ).inc()
+            return False
+        DEFERRED_QUEUE_DEPTH.labels(pod_name=self.pod_name, mode=self.mode).set(
+            self.queue.qsize()
+        )
+        return True
+
+    async def consume(self):
+        while True:
+            job: AgentMessageJob = await self.queue.get()
+            DEFERRED_QUEUE_DEPTH.labels(pod_name=self.pod_name, mode=self.mode).set(
+                self.queue.qsize()
+            )
+            try:
+                await self.process(job)
+            finally:
+                self.queue.task_done()
+
+    async def process(self, job: AgentMessageJob, content: str | None = None):
+        # content is the batch answer, without it the update runs in real time
+        conversation_id, agent_message, context_analysis = job
+        try:
+            if content is None:
+                new_context_analysis: str = await self.openai_service.analyze_agent_message(
+                    agent_message=agent_message, context_analys=context_analysis or ""
+                )
+            else:
+                new_context_analysis = self.openai_service.parse_agent_message(content)
+            await self.write_back(job, new_context_analysis, redo=content is None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            DEFERRED_WORK_COUNT.labels(
+                pod_name=self.pod_name, mode=self.mode, result="failed"
+            ).inc()
+            logger.error(
+                f"deferred context update failed conversation:{conversation_id} error:{e}"
+            )
+
+    async def write_back(
+        self, job: AgentMessageJob, new_context_analysis: str, redo: bool = True
+    ):
+        conversation_id, agent_message, context_analysis = job
+        replaced: bool = await self.messages_cache_service.replace_context_analysis(
+            conversation_id=conversation_id,
+            expected=context_analysis,
+            context_analysis=new_context_analysis,
+        )
+        # a user turn rewrote the analysis meanwhile, a real time update is redone
+        # on top of it, a batch answer can be hours old and is dropped as stale
+        if not replaced and redo:
+            context_analysis = await self.messages_cache_service.get_conversation_analis(
+                conversation_id="conv_analys:" + conversation_id
+            )
+            new_context_analysis = await self.openai_service.analyze_agent_message(
+                agent_message=agent_message, context_analys=context_analysis or ""
+            )
+            replaced = await self.messages_cache_service.replace_context_analysis(
+                conversation_id=conversation_id,
+                expected=context_analysis,
+                context_analysis=new_context_analysis,
+            )
+        DEFERRED_WORK_COUNT.labels(
+            pod_name=self.pod_name,
+            mode=self.mode,
+            result="written" if replaced else "stale",
+        ).inc()
+        if replaced:
+            await self.context_compaction_service.compact(
+                conversation_id=conversation_id, context_analysis=new_context_analysis
+            )
+
+    def drain(self) -> List[AgentMessageJob]:
+        jobs: List[AgentMessageJob] = []
+        while True:
+            try:
+                jobs.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+            self.queue.task_done()
+        DEFERRED_QUEUE_DEPTH.labels(pod_name=self.pod_name, mode=self.mode).set(0)
+        return jobs
+
+    async def submit_batches(self):
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            await self.submit_batch(self.drain())
+
+    async def submit_batch(self, jobs: List[AgentMessageJob]):
+        for start in range(0, len(jobs), self.batch_max_size):
+            chunk: List[AgentMessageJob] = jobs[start:start + self.batch_max_size]
+            requests: Dict[str, Dict] = {}
+            pending: Dict[str, AgentMessageJob] = {}
+            for job in chunk:
+                custom_id: str = uuid.uuid4().hex
+                requests[custom_id] = self.openai_service.agent_message_request(
+                    agent_message=job[1], context_analys=job[2] or ""
+                )
+                pending[custom_id] = job
+            try:
+                batch_id: str = await self.openai_service.submit_chat_batch(requests)
+                await self.messages_cache_service.save_deferred_batch(batch_id, pending)
+            except Exception as e:
+                logger.error(f"deferred batch submit failed, running {len(chunk)} jobs now: {e}")
+                for job in chunk:
+                    await self.process(job)
+                continue
+            DEFERRED_BATCHES_SUBMITTED.labels(pod_name=self.pod_name).inc()
+            logger.info(f"deferred batch submitted batch:{batch_id} jobs:{len(chunk)}")
+
+    async def poll_batches(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.collect_batches()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"deferred batch poll failed: {e}")
+
+    async def collect_batches(self):
+        batches: Dict[str, Dict] = await self.messages_cache_service.get_deferred_batches()
+        for batch_id, pending in batches.items():
+            results: Dict[str, str] | None = (
+                await self.openai_service.get_chat_batch_results(batch_id)
+            )
+            if results is None:
+                continue
+            if not await self.messages_cache_service.claim_deferred_batch(batch_id):
+                continue
+            logger.info(
+                f"deferred batch finished batch:{batch_id} answered:{len(results)}/{len(pending)}"
+            )
+            for custom_id, job in pending.items():
+                # requests the batch could not answer fall back to real time
+                await self.process(tuple(job), content=results.get(custom_id))
@@ -1,21 +1,128 @@
-from elasticsearch import Elasticsearch
-from typing import Dict
+from elasticsearch import AsyncElasticsearch
+from typing import Deque, Dict, List, Tuple
+from collections import deque
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
+import random
+import time
+from prometheus_metricks.metricks import (
+    ES_BUFFER_SIZE,
+    ES_DOCUMENTS_DROPPED,
+    ES_BULK_DURATION,
+)
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 
 class ESService:
-    def __init__(self):
-        self.client = Elasticsearch(os.getenv("ESEARCH_URI_KS"))
+    def __init__(self, client=None):
+        self.client = client or AsyncElasticsearch(os.getenv("ESEARCH_URI_KS"))
+        self.max_size: int = int(os.getenv("ES_BUFFER_MAX_SIZE", "10000"))
+        self.flush_size: int = int(os.getenv("ES_FLUSH_SIZE", "500"))
+        self.flush_interval: float = float(os.getenv("ES_FLUSH_INTERVAL", "2.0"))
+        # drop_oldest keeps the newest documents, sample thins out successful
+        # request logs once the buffer is half full and keeps every error
+        self.overload_policy: str = os.getenv("ES_OVERLOAD_POLICY", "drop_oldest")
+        self.sample_rate: float = float(os.getenv("ES_OVERLOAD_SAMPLE_RATE", "0.1"))
+        self.buffer: Deque[Tuple[str, Dict]] = deque()
+        self.flush_event: asyncio.Event | None = None
+        self.flusher: asyncio.Task | None = None
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
 
-    def create_index(self, index_name: str):
-        self.client.indices.create(index=index_name)
+    async def start(self):
+        if self.flusher is not None:
+            return
+        self.flush_event = asyncio.Event()
+        self.flusher = asyncio.create_task(self.run())
 
-    def delete_index(self, index_name: str):
-        self.client.indices.delete(index=index_name)
+    async def stop(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            await asyncio.gather(self.flusher, return_exceptions=True)
+            self.flusher = None
+        await self.flush()
+        await self.client.close()
 
-    def add_document(self, index_name: str, document: Dict):
-        result = self.client.index(index=index_name, document=document)
-        return result
+    async def create_index(self, index_name: str):
+        await self.client.indices.create(index=index_name)
+
+    async def delete_index(self, index_name: str):
+        await self.client.indices.delete(index=index_name)
+
+    def add_document(self, index_name: str, document: Dict) -> bool:
+        # never waits for elasticsearch, the document is indexed by the next bulk flush
+        if (
+            self.overload_policy == "sample"
+            and len(self.buffer) >= self.max_size // 2
+            and document.get("status") != "error"
+            and random.random() >= self.sample_rate
+        ):
+            ES_DOCUMENTS_DROPPED.labels(pod_name=self.pod_name, reason="sampled").inc()
+            return False
+        if len(self.buffer) >= self.max_size:
+            self.buffer.popleft()
+            ES_DOCUMENTS_DROPPED.labels(pod_name=self.pod_name, reason="overflow").inc()
+        self.buffer.append((index_name, document))
+        ES_BUFFER_SIZE.labels(pod_name=self.pod_name).set(len(self.buffer))
+        if self.flush_event is not None and len(self.buffer) >= self.flush_size:
+            self.flush_event.set()
+        return True
+
+    def requeue(self, batch: List[Tuple[str, Dict]]):
+        # documents that arrived during the failed flush are newer, so with a
+        # full buffer the oldest of the failed batch are dropped first
+        room: int = max(self.max_size - len(self.buffer), 0)
+        dropped: int = max(len(batch) - room, 0)
+        if dropped:
+            ES_DOCUMENTS_DROPPED.labels(pod_name=self.pod_name, reason="overflow").inc(
+                dropped
+            )
+        self.buffer.extendleft(reversed(batch[dropped:]))
+        ES_BUFFER_SIZE.labels(pod_name=self.pod_name).set(len(self.buffer))
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self.buffer:
+            batch: List[Tuple[str, Dict]] = [
+                self.buffer.popleft()
+                for _ in range(min(self.flush_size, len(self.buffer)))
+            ]
+            ES_BUFFER_SIZE.labels(pod_name=self.pod_name).set(len(self.buffer))
+            operations: List[Dict] = []
+            for index_name, document in batch:
+                operations.append({"index": {"_index": index_name}})
+                operations.append(document)
+            start_time: float = time.perf_counter()
+            try:
+                response = await self.client.bulk(operations=operations)
+            except Exception as e:
+                # elasticsearch is unreachable, the batch goes back in front of
+                # newer documents and the next flush retries it
+                self.requeue(batch)
+                logger.error(f"es bulk flush failed documents:{len(batch)} error:{e}")
+                return
+            finally:
+                ES_BULK_DURATION.labels(pod_name=self.pod_name).observe(
+                    time.perf_counter() - start_time
+                )
+            if response.get("errors"):
+                failed: int = sum(
+                    1
+                    for item in response.get("items", [])
+                    if item.get("index", {}).get("error") is not None
+                )
+                ES_DOCUMENTS_DROPPED.labels(pod_name=self.pod_name, reason="failed").inc(
+                    failed
+                )
+                logger.error(f"es bulk flush rejected documents:{failed}/{len(batch)}")
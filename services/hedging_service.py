@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set
+from dotenv import load_dotenv
+from models.models import UserMessage, ModelRoute
+from services.openai_api_service import OpenAIService, DEFAULT_ANALYZER_ROUTE
+from services.claude_ai import ClaudeService
+from services.incremental_json_parser import FieldCallback
+from prometheus_metricks.metricks import LLM_HEDGED_REQUESTS, LLM_HEDGE_WINNER
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class HedgedAnalyzerService:
+    def __init__(self, openai_service: OpenAIService, claude_ai_service: ClaudeService):
+        self.openai_service = openai_service
+        self.claude_ai_service = claude_ai_service
+        self.enabled: bool = os.getenv("LLM_HEDGING_ENABLED", "true") == "true"
+        self.percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+        self.default_delay: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "3.0"))
+        self.min_delay: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+        self.min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.window_size: int = int(os.getenv("LLM_HEDGE_WINDOW_SIZE", "200"))
+        # one window per route, a fast cheap model must not set the delay of a slow one
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    def hedge_delay(self, route_name: str = DEFAULT_ANALYZER_ROUTE.name) -> float:
+        latencies: Deque[float] = self.latencies.get(route_name, deque())
+        if len(latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(latencies)
+        index: int = min(int(len(ordered) * self.percentile), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+
+    async def analyze_user_message(
+        self,
+        message: str,
+        analys: str,
+        event_type: str,
+        on_field: FieldCallback | None = None,
+        route: ModelRoute | None = None,
+    ) -> UserMessage | None:
+        if on_field is not None:
+            primary: Callable[[], Awaitable[UserMessage | None]] = (
+                lambda: self.openai_service.analyze_message_with_correction_v4_stream(
+                    message=message, analys=analys, on_field=on_field, route=route
+                )
+            )
+            # only the primary streams, so an early note never mixes two providers,
+            # the caller corrects it when the secondary wins
+            secondary: Callable[[], Awaitable[UserMessage | None]] = (
+                lambda: self.claude_ai_service.analyze_message_with_context(
+                    message=message, analys=analys
+                )
+            )
+        else:
+            primary = lambda: self.openai_service.analyze_message_with_correction_v4(
+                message=message, analys=analys, route=route
+            )
+            secondary = lambda: self.claude_ai_service.analyze_message_with_context(
+                message=message, analys=analys
+            )
+        if not self.enabled:
+            return await primary()
+        route_name: str = (route or DEFAULT_ANALYZER_ROUTE).name
+        return await self.run_hedged(primary, secondary, event_type, route_name)
+
+    async def run_hedged(
+        self,
+        primary: Callable[[], Awaitable[UserMessage | None]],
+        secondary: Callable[[], Awaitable[UserMessage | None]],
+        event_type: str,
+        route_name: str = DEFAULT_ANALYZER_ROUTE.name,
+    ) -> UserMessage | None:
+        start_time: float = time.perf_counter()
+        primary_task: asyncio.Task = asyncio.create_task(primary())
+        primary_task.add_done_callback(
+            lambda task: self.record_primary_latency(task, start_time, route_name)
+        )
+        tasks: Dict[asyncio.Task, str] = {primary_task: "primary"}
+        try:
+            done, _ = await asyncio.wait(
+                {primary_task}, timeout=self.hedge_delay(route_name)
+            )
+            if done and self.is_valid(primary_task):
+                LLM_HEDGED_REQUESTS.labels(
+                    pod_name=self.pod_name, event_type=event_type, hedged="false"
+                ).inc()
+                LLM_HEDGE_WINNER.labels(
+                    pod_name=self.pod_name, event_type=event_type, provider="primary"
+                ).inc()
+                return primary_task.result()
+
+            # slow or failed primary, the secondary races whatever is left of it
+            LLM_HEDGED_REQUESTS.labels(
+                pod_name=self.pod_name, event_type=event_type, hedged="true"
+            ).inc()
+            secondary_task: asyncio.Task = asyncio.create_task(secondary())
+            tasks[secondary_task] = "secondary"
+            pending: Set[asyncio.Task] = {task for task in tasks if not task.done()}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if self.is_valid(task):
+                        LLM_HEDGE_WINNER.labels(
+                            pod_name=self.pod_name,
+                            event_type=event_type,
+                            provider=tasks[task],
+                        ).inc()
+                        return task.result()
+
+            LLM_HEDGE_WINNER.labels(
+                pod_name=self.pod_name, event_type=event_type, provider="none"
+            ).inc()
+            # neither provider answered, surface the primary outcome as before hedging
+            return primary_task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def is_valid(self, task: asyncio.Task) -> bool:
+        if task.cancelled():
+            return False
+        exception: BaseException | None = task.exception()
+        if exception is not None:
+            logger.warning(f"hedged analyzer call failed: {exception}")
+            return False
+        return task.result() is not None
+
+    def record_primary_latency(
+        self, task: asyncio.Task, start_time: float, route_name: str
+    ):
+        # a cancelled primary took at least this long, keeping it stops the
+        # window from drifting towards only the fast answers
+        if not task.cancelled() and task.exception() is not None:
+            return
+        self.latencies.setdefault(route_name, deque(maxlen=self.window_size)).append(
+            time.perf_counter() - start_time
+        )
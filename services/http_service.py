@@ -6,40 +6,108 @@ from models.custom_exceptions import APPException
 import os
 from dotenv import load_dotenv
 from aiohttp.client_exceptions import ClientResponseError
+from prometheus_metricks.metricks import (
+    HTTP_POOL_CONNECTIONS_CREATED,
+    HTTP_POOL_CONNECTIONS_REUSED,
+    HTTP_POOL_CONNECTIONS_QUEUED,
+    HTTP_REQUESTS_IN_FLIGHT,
+)
 
 load_dotenv()
 
 
-class HTTPRequestService:
+class HTTPSessionService:
     def __init__(self):
-        pass
+        self.limit: int = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host: int = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "30"))
+        self.keepalive_timeout: float = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+        self.dns_cache_ttl: int = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+        self.request_timeout: float = float(os.getenv("HTTP_REQUEST_TIMEOUT", "30"))
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.session: aiohttp.ClientSession | None = None
+
+    async def start(self):
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            trace_configs=[self.create_trace_config()],
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self.on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(self.on_connection_queued_start)
+        trace_config.on_request_start.append(self.on_request_start)
+        trace_config.on_request_end.append(self.on_request_finished)
+        trace_config.on_request_exception.append(self.on_request_finished)
+        return trace_config
+
+    async def on_connection_create_end(self, session, context, params):
+        HTTP_POOL_CONNECTIONS_CREATED.labels(pod_name=self.pod_name).inc()
+
+    async def on_connection_reuseconn(self, session, context, params):
+        HTTP_POOL_CONNECTIONS_REUSED.labels(pod_name=self.pod_name).inc()
+
+    async def on_connection_queued_start(self, session, context, params):
+        HTTP_POOL_CONNECTIONS_QUEUED.labels(pod_name=self.pod_name).inc()
+
+    async def on_request_start(self, session, context, params):
+        HTTP_REQUESTS_IN_FLIGHT.labels(pod_name=self.pod_name).inc()
+
+    async def on_request_finished(self, session, context, params):
+        HTTP_REQUESTS_IN_FLIGHT.labels(pod_name=self.pod_name).dec()
+
+
+class HTTPRequestService:
+    def __init__(self, http_session_service: HTTPSessionService | None = None):
+        self.http_session_service = http_session_service or HTTPSessionService()
 
     async def get_request_async(
         self, url: str, headers: Dict[str, Any]
     ) -> Tuple[int, Dict]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=url, headers=headers) as response:
-                if response.status == 200:
-                    data: Dict = await response.json()
-                    return response.status, data
-                else:
-                    raise await response.raise_for_status()
+        session = await self.http_session_service.get_session()
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data: Dict = await response.json()
+                return response.status, data
+            else:
+                raise await response.raise_for_status()
 
     async def post_request_async(
         self, url: str, headers: Dict[str, Any], payload: Dict[str, Any]
     ) -> Tuple[int, Dict]:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url=url, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    data: Dict = await response.json()
-                    return response.status, data
-                else:
-                    raise await response.raise_for_status()
+        session = await self.http_session_service.get_session()
+        async with session.post(url=url, headers=headers, json=payload) as response:
+            if response.status == 200:
+                data: Dict = await response.json()
+                return response.status, data
+            else:
+                raise await response.raise_for_status()
 
 
 class IntercomAPIServiceV2:
-    def __init__(self):
-        self.http_service = HTTPRequestService()
+    def __init__(self, http_session_service: HTTPSessionService | None = None):
+        self.http_service = HTTPRequestService(http_session_service)
         self.token = os.getenv("INTERCOM_KEY")
 
     async def add_admin_note_to_conversation_async(
@@ -0,0 +1,62 @@
+import json
+from typing import Awaitable, Callable, Dict, List
+
+# called with the completed field name and every field parsed so far
+FieldCallback = Callable[[str, Dict[str, str]], Awaitable[None]]
+
+
+# reports each top level string field of a streamed json object as soon as
+# its closing quote arrives
+class IncrementalJSONParser:
+    def __init__(self):
+        self.depth: int = 0
+        self.in_string: bool = False
+        self.escaped: bool = False
+        self.capturing: bool = False
+        self.expecting_key: bool = False
+        self.current_key: str | None = None
+        self.buffer: List[str] = []
+        self.chunks: List[str] = []
+        self.fields: Dict[str, str] = {}
+
+    def feed(self, chunk: str) -> List[str]:
+        completed: List[str] = []
+        self.chunks.append(chunk)
+        for char in chunk:
+            if self.in_string:
+                if self.capturing:
+                    self.buffer.append(char)
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.capturing:
+                        self.capturing = False
+                        value: str = json.loads("".join(self.buffer))
+                        if self.expecting_key:
+                            self.current_key = value
+                        elif self.current_key is not None:
+                            self.fields[self.current_key] = value
+                            completed.append(self.current_key)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.capturing = self.depth == 1
+                self.buffer = ['"']
+            elif char in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.expecting_key = True
+            elif char in "}]":
+                self.depth -= 1
+            elif self.depth == 1 and char == ":":
+                self.expecting_key = False
+            elif self.depth == 1 and char == ",":
+                self.expecting_key = True
+        return completed
+
+    def result(self) -> Dict:
+        return json.loads("".join(self.chunks))
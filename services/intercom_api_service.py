@@ -1,19 +1,116 @@
 import requests
-from typing import Dict, Tuple
-import aiohttp
-import asyncio
+from typing import Any, Dict, Tuple
 import os
 from dotenv import load_dotenv
-import httpx
-from httpx import Response
+from services.http_service import HTTPSessionService
+from services.rate_limiter_service import (
+    TokenBucketRateLimiter,
+    PRIORITY_NOTE,
+    PRIORITY_REPLY,
+)
+from prometheus_metricks.metricks import INTERCOM_RATE_LIMITED_COUNT
 
 load_dotenv()
 
 
 class IntercomAPIService:
-    def __init__(self):
+    def __init__(self, http_session_service: HTTPSessionService | None = None):
+        self.http_session_service = http_session_service or HTTPSessionService()
         self.access_token = os.getenv("INTERCOM_KEY_TEST")
         self.base_url = "https://api.intercom.io"
+        self.max_retries: int = int(os.getenv("INTERCOM_MAX_RETRIES", "3"))
+        self.rate_limiter = TokenBucketRateLimiter(
+            name="intercom",
+            rate_per_second=float(os.getenv("INTERCOM_RATE_LIMIT_PER_MINUTE", "10000")) / 60,
+            capacity=float(os.getenv("INTERCOM_RATE_LIMIT_BURST", "100")),
+        )
+
+    async def send_request_async(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any] | None = None,
+        params: Dict[str, str] | None = None,
+        priority: int = PRIORITY_NOTE,
+    ) -> Tuple[int, Dict | None]:
+        session = await self.http_session_service.get_session()
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(priority)
+            async with session.request(
+                method, url, headers=headers, json=payload, params=params
+            ) as response:
+                self.rate_limiter.update_from_headers(response.headers, response.status)
+                if response.status == 429:
+                    INTERCOM_RATE_LIMITED_COUNT.labels(
+                        pod_name=os.environ.get("HOSTNAME", "unknown")
+                    ).inc()
+                    if attempt < self.max_retries:
+                        continue
+                if response.status == 200:
+                    data = await response.json()
+                    return response.status, data
+                else:
+                    return response.status, None
+
+    async def get_all_admins_async(self) -> Tuple[int, Dict | None]:
+        url: str = self.base_url + "/admins"
+        headers = {
+            "Intercom-Version": "2.12",
+            f"Authorization": f"Bearer {self.access_token}",
+        }
+        return await self.send_request_async("GET", url, headers=headers)
+
+    async def create_admin_async(self, admin_email: str) -> Tuple[int, Dict | None]:
+        url: str = self.base_url + "/admins"
+        headers = {
+            "Content-Type": "application/json",
+            "Intercom-Version": "2.12",
+            f"Authorization": f"Bearer {self.access_token}",
+        }
+        payload = {"email": admin_email, "role": "operator", "name": "ilya"}
+        return await self.send_request_async("POST", url, headers=headers, payload=payload)
+
+    async def create_conversation_async(
+        self, user_id: str, message: str
+    ) -> Tuple[int, Dict | None]:
+        url: str = self.base_url + "/conversations"
+        headers = {
+            "Content-Type": "application/json",
+            "Intercom-Version": "2.12",
+            f"Authorization": f"Bearer {self.access_token}",
+        }
+        payload = {"from": {"type": "user", "id": user_id}, "body": message}
+        return await self.send_request_async("POST", url, headers=headers, payload=payload)
+
+    async def create_user_async(self, email: str) -> Tuple[int, Dict | None]:
+        url: str = self.base_url + "/contacts"
+        headers = {
+            "Content-Type": "application/json",
+            "Intercom-Version": "2.12",
+            f"Authorization": f"Bearer {self.access_token}",
+        }
+        payload = {"email": email}
+        return await self.send_request_async("POST", url, headers=headers, payload=payload)
+
+    async def get_all_users_async(self) -> Tuple[int, Dict | None]:
+        url: str = self.base_url + "/contacts"
+        headers = {
+            "Intercom-Version": "2.12",
+            "Authorization": f"Bearer {self.access_token}",
+        }
+        return await self.send_request_async("GET", url, headers=headers)
+
+    async def get_conversation_by_id_async(
+        self, conversation_id: str
+    ) -> Tuple[int, Dict | None]:
+        url: str = f"https://api.intercom.io/conversations/{conversation_id}"
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Intercom-Version": "2.12",
+            "Accept": "application/json",
+        }
+        return await self.send_request_async("GET", url, headers=headers)
 
     def get_all_admins(self) -> Tuple[int, Dict | None]:
         url: str = self.base_url + "/admins"
@@ -98,13 +195,7 @@ class IntercomAPIService:
             "admin_id": admin_id,
             "assignee_id": admin_id,
         }
-        async with httpx.AsyncClient() as client:
-            response: Response = client.post(url=url, headers=headers, json=payload)
-            if response.status_code == 200:
-
-                return response.status_code, response.json()
-            else:
-                return response.status_code, None
+        return await self.send_request_async("POST", url, headers=headers, payload=payload)
 
     def add_admin_note_to_conversation(
         self, conversation_id: str, admin_id: str, note: str
@@ -164,13 +255,9 @@ class IntercomAPIService:
             "message_type": "comment",
             "body": message,
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return response.status, data
-                else:
-                    return response.status, None
+        return await self.send_request_async(
+            "POST", url, headers=headers, payload=payload, priority=PRIORITY_REPLY
+        )
 
     def create_user(self, email: str) -> Tuple[int, Dict | None]:
         url: str = self.base_url + "/contacts"
@@ -231,18 +318,18 @@ class IntercomAPIService:
             "type": "user",
             "intercom_user_id": user_id,
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/conversations/{conversation_id}/reply",
-                headers=headers,
-                json=payload,
-            ) as response:
-                response.raise_for_status()
-                if response.status == 200:
-                    json = await response.json()
-                    return response.status, json
-                else:
-                    return response.status, None
+        session = await self.http_session_service.get_session()
+        async with session.post(
+            f"{self.base_url}/conversations/{conversation_id}/reply",
+            headers=headers,
+            json=payload,
+        ) as response:
+            response.raise_for_status()
+            if response.status == 200:
+                json = await response.json()
+                return response.status, json
+            else:
+                return response.status, None
 
     async def add_admin_note_to_conversation_async(
         self, conversation_id: str, admin_id: str, note: str
@@ -259,13 +346,7 @@ class IntercomAPIService:
             "message_type": "note",
             "body": note,
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return response.status, data
-                else:
-                    return response.status, None
+        return await self.send_request_async("POST", url, headers=headers, payload=payload)
 
     async def get_conversation_parts_by_id_async(
         self, conversation_id: str
@@ -276,10 +357,4 @@ class IntercomAPIService:
             "Content-Type": "application/json",
         }
         query = {"display_as": "plaintext"}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, params=query) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return response.status, data
-                else:
-                    return response.status, None
+        return await self.send_request_async("GET", url, headers=headers, params=query)
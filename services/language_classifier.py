@@ -0,0 +1,132 @@
+import re
+from typing import Dict, FrozenSet, List, Tuple
+
+DEVANAGARI_RANGES: List[Tuple[int, int]] = [(0x0900, 0x097F), (0xA8E0, 0xA8FF)]
+BENGALI_RANGES: List[Tuple[int, int]] = [(0x0980, 0x09FF)]
+# danda marks live in the devanagari block but are used by bengali as well
+SHARED_PUNCTUATION: FrozenSet[str] = frozenset("\u0964\u0965")
+
+# romanized hindi words that are not also common english words
+HINGLISH_WORDS: FrozenSet[str] = frozenset(
+    """
+    hai hain hoon hu hun nahi nahin nhi na mera meri mere mujhe mujhko muje hum
+    hamara hamari aap aapka aapki aapke tum tumhara kya kyu kyun kyon kab kaise
+    kaisa kahan kitna kitne kitni kaun bhai bhaiya yaar ji haan han accha acha
+    achha theek thik sahi galat abhi bhi sab kuch bahut bohot bahot toh par pe
+    liye lekin aur ya phir fir jaldi kal aaj parso ghante ghanta din raat ho raha
+    rahi rahe gaya gayi gaye kar karo karna karke kiya kiye tha thi hua huwa
+    hui hoga hogi hoge se ka ki ke ko mein mai mujhse usko isko yeh ye woh wo
+    wala wali wale batao bataiye bataye dijiye karein kijiye chahiye milega
+    milegi mila mili diya dena aaya aayi aaye aayega khata paisa paise rupaye
+    lagega laga lagta samajh samjha dekho dekhiye bolo boliye suno
+    """.split()
+)
+
+# english function words; domain nouns like deposit or bonus are used in
+# hinglish too, so they are not evidence for either language
+ENGLISH_WORDS: FrozenSet[str] = frozenset(
+    """
+    the a an is are was were be been being am i you he she it we they my your
+    his her its our their me him us them this that these those what when where
+    why how which who can could will would should shall may might must have
+    has had do does did not no yes please thanks thank hello hi dear sir madam
+    there here still yet already again just only also very too with without
+    for from of in on at by about into after before since until because but
+    and or if then than so any some all every received sent got waiting wait
+    help check checked done why anyone someone nothing something
+    """.split()
+)
+
+WORD_PATTERN = re.compile(r"[a-z']+")
+
+# the answers the language detection prompt allows
+KNOWN_LANGUAGES: FrozenSet[str] = frozenset(
+    ["Hindi", "Hinglish", "English", "Bengali", "Uncertain"]
+)
+
+
+def in_ranges(code_point: int, ranges: List[Tuple[int, int]]) -> bool:
+    for start, end in ranges:
+        if start <= code_point <= end:
+            return True
+    return False
+
+
+def count_scripts(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {"devanagari": 0, "bengali": 0, "latin": 0, "other": 0}
+    for char in text:
+        if char in SHARED_PUNCTUATION:
+            continue
+        code_point: int = ord(char)
+        if in_ranges(code_point, DEVANAGARI_RANGES):
+            counts["devanagari"] += 1
+        elif in_ranges(code_point, BENGALI_RANGES):
+            counts["bengali"] += 1
+        elif ("a" <= char <= "z") or ("A" <= char <= "Z"):
+            counts["latin"] += 1
+        elif char.isalpha():
+            counts["other"] += 1
+    return counts
+
+
+def language_label(language: str) -> str:
+    # llm answers are free text, metric labels stay within the known set
+    return language if language in KNOWN_LANGUAGES else "other"
+
+
+def dominant_script(text: str) -> str:
+    counts: Dict[str, int] = count_scripts(text)
+    total: int = sum(counts.values())
+    if total == 0:
+        return "none"
+    script, count = max(counts.items(), key=lambda item: item[1])
+    if count / total < 0.8:
+        return "mixed"
+    return script
+
+
+class LanguageClassifier:
+    def __init__(self, min_confidence: float = 0.75, min_marker_words: int = 3):
+        self.min_confidence = min_confidence
+        self.min_marker_words = min_marker_words
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        counts: Dict[str, int] = count_scripts(text)
+        devanagari: int = counts["devanagari"]
+        bengali: int = counts["bengali"]
+        latin: int = counts["latin"]
+        other: int = counts["other"]
+
+        total: int = devanagari + bengali + latin + other
+        if total == 0:
+            return "Uncertain", 0.0
+        if devanagari > 0 and bengali > 0:
+            return "Uncertain", 0.0
+        if devanagari > 0:
+            return "Hindi", self.script_confidence(devanagari / total, other)
+        if bengali > 0:
+            return "Bengali", self.script_confidence(bengali / total, other)
+        if other > 0:
+            return "Uncertain", 0.0
+        return self.classify_latin(text)
+
+    def script_confidence(self, share: float, other: int) -> float:
+        if other > 0 or share < 0.5:
+            return 0.0
+        return min(1.0, share + 0.25)
+
+    def classify_latin(self, text: str) -> Tuple[str, float]:
+        words: List[str] = WORD_PATTERN.findall(text.lower())
+        hinglish_hits: int = sum(1 for word in words if word in HINGLISH_WORDS)
+        english_hits: int = sum(1 for word in words if word in ENGLISH_WORDS)
+        known: int = hinglish_hits + english_hits
+        if known == 0 or hinglish_hits == english_hits:
+            return "Uncertain", 0.0
+
+        dominance: float = max(hinglish_hits, english_hits) / known
+        coverage: float = min(1.0, known / self.min_marker_words)
+        language: str = "Hinglish" if hinglish_hits > english_hits else "English"
+        return language, dominance * coverage
+
+    def is_confident(self, confidence: float) -> bool:
+        return confidence >= self.min_confidence
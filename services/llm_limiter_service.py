@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, TypeVar
+from dotenv import load_dotenv
+from prometheus_metricks.metricks import (
+    LLM_CONCURRENCY_LIMIT,
+    LLM_IN_FLIGHT,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_WAIT_TIME,
+    LLM_RATE_LIMITED_COUNT,
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        latency_target: float,
+        decrease_cooldown: float,
+    ):
+        self.name = name
+        self.limit: float = initial_limit
+        self.min_limit: float = min_limit
+        self.max_limit: float = max_limit
+        self.latency_target: float = latency_target
+        self.decrease_cooldown: float = decrease_cooldown
+        self.last_decrease_at: float = 0.0
+        self.in_flight: int = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.report()
+
+    async def acquire(self):
+        start_time: float = time.perf_counter()
+        if not self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+        else:
+            future: asyncio.Future = asyncio.get_running_loop().create_future()
+            self.waiters.append(future)
+            self.report()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # the slot was handed over just before the cancellation
+                    self.in_flight -= 1
+                    self.release_waiters()
+                else:
+                    self.waiters.remove(future)
+                self.report()
+                raise
+        LLM_QUEUE_WAIT_TIME.labels(pod_name=self.pod_name, model=self.name).observe(
+            time.perf_counter() - start_time
+        )
+        self.report()
+
+    def release(self, latency: float, rate_limited: bool = False, cancelled: bool = False):
+        self.in_flight -= 1
+        # a cancelled call, like a hedge loser, says nothing about the provider
+        if not cancelled:
+            self.adjust(latency, rate_limited)
+        self.release_waiters()
+        self.report()
+
+    def adjust(self, latency: float, rate_limited: bool):
+        now: float = time.monotonic()
+        if rate_limited:
+            self.decrease(now, 0.5)
+        elif latency > self.latency_target:
+            self.decrease(now, 0.9)
+        else:
+            # additive increase, about one extra slot per limit successful calls
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self, now: float, factor: float):
+        # calls started under the old limit fail together, count them once
+        if now - self.last_decrease_at < self.decrease_cooldown:
+            return
+        self.last_decrease_at = now
+        self.limit = max(self.min_limit, self.limit * factor)
+        logger.warning(f"llm concurrency limit for {self.name} lowered to {self.limit:.1f}")
+
+    def release_waiters(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            future: asyncio.Future = self.waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def report(self):
+        LLM_CONCURRENCY_LIMIT.labels(pod_name=self.pod_name, model=self.name).set(self.limit)
+        LLM_IN_FLIGHT.labels(pod_name=self.pod_name, model=self.name).set(self.in_flight)
+        LLM_QUEUE_DEPTH.labels(pod_name=self.pod_name, model=self.name).set(len(self.waiters))
+
+
+class LLMLimiterService:
+    def __init__(self):
+        self.initial_limit: float = float(os.getenv("LLM_CONCURRENCY_INITIAL", "16"))
+        self.min_limit: float = float(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+        self.max_limit: float = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+        self.latency_target: float = float(os.getenv("LLM_LATENCY_TARGET", "20"))
+        self.decrease_cooldown: float = float(os.getenv("LLM_DECREASE_COOLDOWN", "1.0"))
+        self.max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+        self.limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    def limiter(self, model: str) -> AdaptiveConcurrencyLimiter:
+        limiter: AdaptiveConcurrencyLimiter | None = self.limiters.get(model)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(
+                name=model,
+                initial_limit=self.initial_limit,
+                min_limit=self.min_limit,
+                max_limit=self.max_limit,
+                latency_target=self.latency_target,
+                decrease_cooldown=self.decrease_cooldown,
+            )
+            self.limiters[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        limiter: AdaptiveConcurrencyLimiter = self.limiter(model)
+        await limiter.acquire()
+        start_time: float = time.perf_counter()
+        rate_limited: bool = False
+        cancelled: bool = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            # counted here so streamed calls and the last failed retry show up too
+            rate_limited = self.is_rate_limited(e)
+            if rate_limited:
+                LLM_RATE_LIMITED_COUNT.labels(pod_name=self.pod_name, model=model).inc()
+            raise
+        finally:
+            limiter.release(
+                time.perf_counter() - start_time,
+                rate_limited=rate_limited,
+                cancelled=cancelled,
+            )
+
+    async def call(self, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        attempt: int = 0
+        while True:
+            try:
+                async with self.slot(model):
+                    return await request()
+            except Exception as e:
+                if not self.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay: float = self.retry_delay(e, attempt)
+                logger.warning(
+                    f"llm call to {model} failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def is_rate_limited(self, exception: Exception) -> bool:
+        return getattr(exception, "status_code", None) == 429
+
+    def is_retryable(self, exception: Exception) -> bool:
+        if getattr(exception, "status_code", None) in RETRYABLE_STATUS_CODES:
+            return True
+        return type(exception).__name__ in RETRYABLE_ERRORS
+
+    def retry_delay(self, exception: Exception, attempt: int) -> float:
+        response = getattr(exception, "response", None)
+        if response is not None:
+            retry_after: str | None = response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.retry_max_delay)
+                except ValueError:
+                    pass
+        backoff: float = min(0.5 * 2 ** attempt, self.retry_max_delay)
+        return random.uniform(backoff / 2, backoff)
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+from typing import List
+from dotenv import load_dotenv
+from models.models import ModelRoute, ModelRouteRule
+from services.language_classifier import dominant_script
+from prometheus_metricks.metricks import MODEL_ROUTE_DURATION, MODEL_ROUTE_TOKENS
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# rules are checked in order and the first match wins, the last rule has no
+# conditions so every message gets a route
+DEFAULT_MODEL_ROUTES: str = json.dumps(
+    [
+        {
+            "name": "escalated",
+            "model": "gpt-4o",
+            "last_statuses": ["uncertain"],
+        },
+        {
+            "name": "short_clear",
+            "model": "gpt-4o-mini",
+            "max_length": 120,
+            "scripts": ["latin", "devanagari", "bengali"],
+        },
+        {
+            "name": "default",
+            "model": "gpt-3.5-turbo-0125",
+        },
+    ]
+)
+
+
+class ModelRouterService:
+    def __init__(self):
+        self.rules: List[ModelRouteRule] = [
+            ModelRouteRule(**rule)
+            for rule in json.loads(os.getenv("MODEL_ROUTES", DEFAULT_MODEL_ROUTES))
+        ]
+        self.default_model: str = os.getenv("MODEL_ROUTE_DEFAULT_MODEL", "gpt-3.5-turbo-0125")
+
+    def route(self, message: str, last_status: str | None = None) -> ModelRoute:
+        script: str = dominant_script(message)
+        for rule in self.rules:
+            if rule.min_length is not None and len(message) < rule.min_length:
+                continue
+            if rule.max_length is not None and len(message) > rule.max_length:
+                continue
+            if rule.scripts and script not in rule.scripts:
+                continue
+            if rule.last_statuses and last_status not in rule.last_statuses:
+                continue
+            return ModelRoute(name=rule.name, model=rule.model)
+        return ModelRoute(name="fallback", model=self.default_model)
+
+
+def record_route_usage(route: ModelRoute, duration: float, usage):
+    pod_name: str = os.environ.get("HOSTNAME", "unknown")
+    MODEL_ROUTE_DURATION.labels(
+        pod_name=pod_name, route=route.name, model=route.model
+    ).observe(duration)
+    if usage is None:
+        return
+    MODEL_ROUTE_TOKENS.labels(
+        pod_name=pod_name, route=route.name, model=route.model, kind="prompt"
+    ).observe(usage.prompt_tokens or 0)
+    MODEL_ROUTE_TOKENS.labels(
+        pod_name=pod_name, route=route.name, model=route.model, kind="completion"
+    ).observe(usage.completion_tokens or 0)
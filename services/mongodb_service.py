@@ -1,29 +1,241 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Dict
+from pymongo.errors import BulkWriteError
+from bson import json_util
+from typing import Dict, List, Tuple
 from models.models import MessageTranslated, User
+import asyncio
+import glob
+import logging
 import os
+import time
 from dotenv import load_dotenv
+from prometheus_metricks.metricks import (
+    MONGO_WRITE_QUEUE_DEPTH,
+    MONGO_BATCH_DOCUMENTS,
+    MONGO_SPILLED_COUNT,
+    MONGO_REPLAYED_COUNT,
+)
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR: int = 11000
+
+# database, collection, document
+MongoWrite = Tuple[str, str, Dict]
 
 
 class MongodbService:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(os.getenv("MONGO_DB_URI"))
+    def __init__(self, client=None):
+        self.client = client or AsyncIOMotorClient(os.getenv("MONGO_DB_URI"))
+        self.batch_size: int = int(os.getenv("MONGO_BATCH_SIZE", "500"))
+        self.flush_interval: float = float(os.getenv("MONGO_FLUSH_INTERVAL", "1.0"))
+        self.max_pending: int = int(os.getenv("MONGO_MAX_PENDING", "20000"))
+        self.enqueue_timeout: float = float(os.getenv("MONGO_ENQUEUE_TIMEOUT", "0.5"))
+        self.workers_count: int = int(os.getenv("MONGO_FLUSH_WORKERS", "2"))
+        self.spill_dir: str = os.getenv("MONGO_SPILL_DIR", "/tmp/mongo_spill")
+        self.replay_interval: float = float(os.getenv("MONGO_REPLAY_INTERVAL", "60"))
+        self.drain_timeout: float = float(os.getenv("MONGO_DRAIN_TIMEOUT", "10"))
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.queue: asyncio.Queue | None = None
+        self.workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.workers = [
+            asyncio.create_task(self.consume()) for _ in range(self.workers_count)
+        ]
+        self.workers.append(asyncio.create_task(self.replay_periodically()))
+
+    async def stop(self):
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"mongo drain timeout, documents left:{self.queue.qsize()}")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        # whatever did not drain in time stays on disk for the next replay
+        left: List[MongoWrite] = []
+        while not self.queue.empty():
+            left.append(self.queue.get_nowait())
+            self.queue.task_done()
+        if left:
+            await self.spill(left, reason="shutdown")
+        self.queue = None
 
     async def add_document_to_collection(
         self, db_name: str, collection_name: str, document: Dict
     ):
-        db = self.client.get_database(db_name)
-        collection = db.get_collection(collection_name)
-        await collection.insert_one(document)
+        await self.enqueue((db_name, collection_name, document))
 
     async def add_message_translated(self, message_translated: MessageTranslated):
-        db = self.client.get_database("intercom_app")
-        collection = db.get_collection("translations")
-        await collection.insert_one(message_translated.dict())
+        await self.enqueue(("intercom_app", "translations", message_translated.dict()))
 
     async def add_message_translated_dict(self, message_translated: Dict):
-        db = self.client.get_database("intercom_app")
-        collection = db.get_collection("translations")
-        await collection.insert_one(message_translated)
+        await self.enqueue(("intercom_app", "translations", message_translated))
+
+    async def enqueue(self, write: MongoWrite):
+        # documents are written behind in batches, callers only wait while the
+        # queue is full and never longer than enqueue_timeout
+        await self.start()
+        try:
+            await asyncio.wait_for(self.queue.put(write), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            await self.spill([write], reason="backpressure")
+            return
+        MONGO_WRITE_QUEUE_DEPTH.labels(pod_name=self.pod_name).set(self.queue.qsize())
+
+    async def consume(self):
+        while True:
+            batch: List[MongoWrite] = [await self.queue.get()]
+            try:
+                deadline: float = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout: float = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(
+                            await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                MONGO_WRITE_QUEUE_DEPTH.labels(pod_name=self.pod_name).set(
+                    self.queue.qsize()
+                )
+                if not await self.insert_batch(batch):
+                    await self.spill(batch, reason="failed")
+            except asyncio.CancelledError:
+                # stopped mid batch, documents already inserted are skipped on replay
+                await self.spill(batch, reason="shutdown")
+                raise
+            except Exception as e:
+                # a full disk must not end the worker, the batch is lost
+                logger.error(f"mongo batch of {len(batch)} documents lost: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def insert_batch(self, batch: List[MongoWrite]) -> bool:
+        collections: Dict[Tuple[str, str], List[Dict]] = {}
+        for db_name, collection_name, document in batch:
+            collections.setdefault((db_name, collection_name), []).append(document)
+        for (db_name, collection_name), documents in collections.items():
+            collection = self.client.get_database(db_name).get_collection(collection_name)
+            try:
+                await collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                # replayed documents keep their _id, duplicates are already stored
+                errors: List[Dict] = [
+                    error
+                    for error in e.details.get("writeErrors", [])
+                    if error.get("code") != DUPLICATE_KEY_ERROR
+                ]
+                if errors:
+                    logger.error(
+                        f"mongo insert_many {db_name}.{collection_name} failed documents:{len(errors)}"
+                    )
+            except Exception as e:
+                logger.error(f"mongo insert_many {db_name}.{collection_name} failed: {e}")
+                return False
+            MONGO_BATCH_DOCUMENTS.labels(pod_name=self.pod_name).observe(len(documents))
+        return True
+
+    async def spill(self, batch: List[MongoWrite], reason: str):
+        MONGO_SPILLED_COUNT.labels(pod_name=self.pod_name, reason=reason).inc(len(batch))
+        lines: str = "".join(
+            json_util.dumps({"db": db_name, "collection": collection_name, "document": document})
+            + "\n"
+            for db_name, collection_name, document in batch
+        )
+        await asyncio.to_thread(self.append_spill_file, lines)
+
+    def append_spill_file(self, lines: str):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path: str = os.path.join(self.spill_dir, f"spill_{os.getpid()}.jsonl")
+        with open(path, "a", encoding="utf-8") as spill_file:
+            spill_file.write(lines)
+
+    async def replay_periodically(self):
+        while True:
+            try:
+                await self.replay_spilled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"mongo spill replay failed: {e}")
+            await asyncio.sleep(self.replay_interval)
+
+    async def replay_spilled(self):
+        for claimed in await asyncio.to_thread(self.claim_spill_files):
+            spill_file = await asyncio.to_thread(open, claimed, encoding="utf-8")
+            replayed: int = 0
+            total: int = 0
+            try:
+                while True:
+                    # read batch by batch, a long outage can leave a large file
+                    chunk: List[MongoWrite] = await asyncio.to_thread(
+                        self.read_spill_chunk, spill_file
+                    )
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if await self.insert_batch(chunk):
+                        replayed += len(chunk)
+                    else:
+                        await self.spill(chunk, reason="failed")
+            finally:
+                await asyncio.to_thread(spill_file.close)
+            await asyncio.to_thread(os.remove, claimed)
+            MONGO_REPLAYED_COUNT.labels(pod_name=self.pod_name).inc(replayed)
+            logger.info(f"mongo replayed spilled documents:{replayed}/{total} file:{claimed}")
+
+    def claim_spill_files(self) -> List[str]:
+        claimed_files: List[str] = []
+        for path in glob.glob(os.path.join(self.spill_dir, "spill_*.jsonl*")):
+            replay_pid: str = path.rpartition(".replay.")[2] if ".replay." in path else ""
+            if replay_pid and not self.is_abandoned(replay_pid):
+                continue
+            # renaming claims the file, other processes skip it, a taken over
+            # claim keeps its old name so it cannot overwrite a newer spill file
+            claimed: str = path
+            if replay_pid != str(os.getpid()):
+                claimed = f"{path}.replay.{os.getpid()}"
+            try:
+                if path != claimed:
+                    os.rename(path, claimed)
+            except OSError:
+                continue
+            claimed_files.append(claimed)
+        return claimed_files
+
+    @staticmethod
+    def is_abandoned(replay_pid: str) -> bool:
+        # replays run one after another, a claim of this process is left over from
+        # a failed replay and a claim of a process that is gone from a crash
+        if not replay_pid.isdigit():
+            return False
+        if int(replay_pid) == os.getpid():
+            return True
+        try:
+            os.kill(int(replay_pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def read_spill_chunk(self, spill_file) -> List[MongoWrite]:
+        chunk: List[MongoWrite] = []
+        for line in spill_file:
+            item: Dict = json_util.loads(line)
+            chunk.append((item["db"], item["collection"], item["document"]))
+            if len(chunk) >= self.batch_size:
+                break
+        return chunk
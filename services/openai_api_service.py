@@ -2,22 +2,41 @@ import os
 from openai import OpenAI, AsyncOpenAI, ChatCompletion
 from dotenv import load_dotenv
 import json
+import time
 from typing import Dict, List
 from models.models import UserMessage
 from models.custom_exceptions import APPException
 from openai._exceptions import OpenAIError
-from services.redis_cache_service import MessagesCache
-from models.models import ConversationMessages, ConversationMessage
+from services.redis_cache_service import AsyncMessagesCache
+from services.llm_limiter_service import LLMLimiterService
+from models.models import ConversationMessages, ConversationMessage, ModelRoute
+from services.model_router_service import record_route_usage
+from services.incremental_json_parser import IncrementalJSONParser, FieldCallback
+from services.prompt_templates import (
+    build_messages,
+    build_user_message_input,
+    parse_user_message,
+    record_prompt_usage,
+)
 
 load_dotenv()
 
+DEFAULT_ANALYZER_ROUTE: ModelRoute = ModelRoute(name="default", model="gpt-3.5-turbo-0125")
+
 
 class OpenAIService:
-    def __init__(self, messages_cache_service: MessagesCache):
+    def __init__(
+            self,
+            messages_cache_service: AsyncMessagesCache,
+            llm_limiter_service: LLMLimiterService | None = None,
+    ):
         try:
             self.open_ai_client = OpenAI(api_key=os.getenv("OPENAPI_KEY"))
-            self.client_async = AsyncOpenAI(api_key=os.getenv("OPENAPI_KEY"))
+            # retries are done by the limiter so it sees every 429
+            self.client_async = AsyncOpenAI(api_key=os.getenv("OPENAPI_KEY"), max_retries=0)
+            self.llm_limiter_service = llm_limiter_service or LLMLimiterService()
             self.messages_cache_service = messages_cache_service
+            self.chat_history_limit: int = int(os.getenv("CHAT_HISTORY_LIMIT", "20"))
         except OpenAIError as open_ai_error:
             full_exception_name = (
                 f"{type(open_ai_error).__module__}.{type(open_ai_error).__name__}"
@@ -50,7 +69,7 @@ class OpenAIService:
         return result
 
     async def detect_language_async(self, message: str) -> str | None:
-        response: ChatCompletion = await self.client_async.chat.completions.create(
+        response: ChatCompletion = await self.create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -83,7 +102,7 @@ class OpenAIService:
     async def translate_message_from_hindi_to_english_async(
             self, message: str
     ) -> str | None:
-        response: ChatCompletion = await self.client_async.chat.completions.create(
+        response: ChatCompletion = await self.create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -118,7 +137,7 @@ class OpenAIService:
     async def translate_message_from_bengali_to_english_async(
             self, message: str
     ) -> str | None:
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -135,7 +154,7 @@ class OpenAIService:
     async def translate_message_from_english_to_bengali_async(
             self, message: str
     ) -> str | None:
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -152,7 +171,7 @@ class OpenAIService:
     async def translate_message_from_english_to_hindi_async(
             self, message: str
     ) -> str | None:
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -388,7 +407,7 @@ For "uncertain", also include:
 - Entire response must be valid JSON
 """
 
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             # model="gpt-4o-mini-2024-07-18",
             model="gpt-3.5-turbo",
             messages=[
@@ -601,239 +620,16 @@ Always provide:
 
 The goal is to ensure agents have complete information before responding to player inquiries, so err on the side of marking messages as "uncertain" whenever specific details are missing."""
 
-        system_promt2 = """
-# Casino Support AI Assistant
-
-## CRITICAL INSTRUCTION: RETURN ONLY VALID JSON
-Your response MUST be a single valid JSON object with no text before or after it.
-DO NOT include code blocks, explanations, or markdown formatting.
-DO NOT use ```json or ``` markers around your response.
-Your ENTIRE response must be parseable as JSON.
-
-## ROLE AND TASK
-You are an AI assistant for an online casino and sports betting support team. Your task is to analyze player messages in English, Hindi (Devanagari), Hinglish (Romanized Hindi), or Bengali. You must determine if messages are clear, need correction, or require further clarification.
-
-## CONTEXT ANALYSIS REQUIREMENTS
-- ALWAYS analyze the full chat history provided to understand context before interpreting the current message
-- Note that agent responses in the chat history are provided in both English (original) and translated form
-- Context from previous messages should heavily influence your interpretation of ambiguous terms
-- Pay special attention to previously discussed topics when forming interpretations of uncertain messages
-- If previous messages in chat history clearly identify what the current message refers to, use this context to determine status
-- Specific issues mentioned in previous messages (withdrawal ID, bonus type, deposit amount, etc.) provide critical context
-
-## RESPONSE FORMAT
-Always return valid JSON in this exact format:
-
-{
-    "status": "[uncertain/error_fixed/no_error]",
-    "original_text": "original message",
-    "translated_text": "English translation",
-    "context_analysis": "Brief summary of how chat history influences interpretation of current message",
-    
-    // Only include for status=error_fixed (REQUIRED):
-    "corrected_text": "message with all spelling and terminology corrections",
-    
-    // Only include for status=uncertain:
-    "possible_interpretations": [
-        "Interpretation 1: English translation with most likely meaning",
-        "Interpretation 2: Alternative English translation with different possible meaning"
-    ],
-    "note": "Note explaining unusual words, possible meanings AND two alternative translations:\\n1. [First translation - most probable]\\n2. [Second translation - alternative interpretation]\\nClarification needed."
-}
-
-## STATUS DETERMINATION WORKFLOW
-
-### Step 1: First check for clear context in chat history
-- If previous messages in chat history UNAMBIGUOUSLY clarify the current message's meaning, this can override ambiguity
-- Example: If player previously discussed a specific withdrawal request and then asks "Kitna time lagega?", use "no_error" status since we know they're asking about withdrawal timeframe
-- The chat history must completely resolve any ambiguity to allow for "no_error" classification
-
-### Step 2: Check for spelling/terminology errors
-- If message contains spelling mistakes, typos, or incorrect gambling terminology, use "error_fixed" status
-- Always provide corrected version in "corrected_text" field
-- Examples: "withdrawl" → "withdrawal", "bonoos" → "bonus", "deopsit" → "deposit"
-
-### Context-based error correction
-- When a user makes a typo in a term previously mentioned correctly in chat history, use context to correct it
-- Example: If user first mentioned "withdrawal" correctly, but later types "withdrl", correct it to "withdrawal"
-- Example: If user discussed specific games, features, or IDs earlier, and later misspells them, correct based on chat history
-- CRITICAL: If there's clear context about what term the user is trying to type based on previous messages, prioritize this context
-- Focus especially on:
-  - Game names (roulette, teen patti, andar bahar, etc.)
-  - Transaction types (withdrawal, deposit, bonus)
-  - Technical terms (verification, KYC, authentication)
-  - Transaction IDs and reference numbers
-- Such corrections should ALWAYS use "error_fixed" status with appropriate "corrected_text"
-
-### Step 3: Check for ambiguity markers
-If any of these conditions are present, use "uncertain" status:
-- Multiple possible meanings
-- Unusual words in casino context (e.g., "petrol", "engine", "fuel")
-- Regional slang or idioms
-- Vague or unclear statements
-- Non-specific complaints
-- Lack of details about which feature/function has issues
-- General requests without specifying the problem
-- Ambiguous references to previous issues
-- References to "the problem" when multiple problems were mentioned
-- Issues unrelated to casino/betting/gambling
-- Expressions of urgency without clarifying the specific issue
-- Time references without context (e.g., "it's been 3 days")
-- Generic commands without specifics (e.g., "fix it", "make it work")
-- Nonspecific references to money/payments
-
-SPECIAL HANDLING FOR ONGOING PROBLEM COMPLAINTS:
-- When user complains that problem still exists (e.g., "problem abhi bhi hai", "issue not fixed", "still waiting")
-- AND chat history contains MULTIPLE distinct issues (e.g., withdrawal delay AND bonus issue AND login problem)
-- Then list each specific previous problem as a separate possible interpretation
-- Example interpretations: "User is saying their withdrawal issue from ID #12345 is still not resolved" and "User is saying their bonus credit issue mentioned earlier is still not fixed"
-
-### Step 4: If no issues found, use "no_error" status
-A "no_error" message must:
-- Have a clear, specific request or statement
-- Contain no mistakes or ambiguity
-- Be specific about what feature, function, or service is being discussed
-- Not require guesswork to understand intent
-- Relate to casino, betting, or gambling services
-
-## DOMAIN-SPECIFIC TERMINOLOGY
-
-### Common code words in gambling contexts
-- "petrol", "diesel", "gas", "fuel" → often refer to "withdrawal" or payments
-- "engine", "car", "tank" → may refer to account functionality or balance
-- "recharge" → often means deposit
-- "mobile balance" → may refer to account balance
-- "ID" → may refer to player account or specific game/bet ID
-- "process", "processing" → often refers to withdrawal or verification procedures
-- "stuck", "frozen" → typically refers to account/game issues or pending transactions
-- "locked", "blocked" → usually refers to account restrictions or verification issues
-
-### Player pain points and common requests
-- Account issues (login problems, password reset, account verification)
-- Deposit problems (payment failed, amount not credited)
-- Withdrawal issues (delay, rejection, verification requirements)
-- Bonus problems (not received, terms misunderstood, wagering requirements)
-- Game-specific issues (crash, disconnect, bet not registered)
-- Technical problems (app not working, website errors)
-- Payment method issues (card declined, UPI failure, wallet issues)
-- KYC verification (document upload, verification pending, rejection)
-
-## EXAMPLES BY STATUS TYPE
-
-### "uncertain" status examples:
-- "Mera petrol add nahi huwa?" (Is user asking about withdrawal, bonus or something else?)
-- "Bhai mera khata me paisa nahi aaya, diesel payment ka wait kar raha hu" (What does diesel payment refer to?)
-- "Mera engine start nahi ho raha" (What does engine refer to in casino context?)
-- "My deposit has gone through, can someone help me?" (Unclear what help is needed)
-- "मेरा खाता काम नहीं कर रहा है" (Unclear what specific account issue exists)
-- "Maine amount transfer kar diya hai. Kya hogaya?" (Ambiguous whether asking about status or reporting a problem)
-- "Problem abhi bhi hai" (Unclear which of multiple previously mentioned problems)
-- "Can you help me with my tax filing issue?" (Not related to casino services)
-- "I have a problem with your service" (No specific problem described)
-- "Ab to 48 ghante se jyada ho gai use payment ko ab to kar do" (Unclear whether referring to deposit or withdrawal)
-- "3 din ho gaye hai please check karo" (Doesn't specify what happened 3 days ago)
-- "Request ko approve karo" (Doesn't specify which request needs approval)
-- "Mera account me abhi tak nahi hua" (Doesn't specify what hasn't happened in the account)
-- "System bahut slow hai" (Unclear what system is being referred to - app, website, game)
-- "Money add karo jaldi" (Doesn't specify where money should be added)
-- "Process complete karo" (Doesn't specify which process needs to be completed)
-- "Kitna time lagega?" (Doesn't specify what they're waiting for)
-
-### Special examples for ongoing problem complaints:
-When chat history contains multiple issues (like withdrawal #45678, bonus claim, and account verification), these messages should generate interpretations referencing those specific previous issues:
-- "Issue abhi bhi hai"
-- "Problem solve nahi hua"
-- "Still waiting for resolution"
-- "Not fixed yet"
-- "Kuch nahi hua abhi tak"
-- "No update?"
-- "Help karo, waiting for long time"
-
-### "error_fixed" status examples:
-- "Mera withdrawl nahi hua" → "Mera withdrawal nahi hua"
-- "Bonoos kab milega?" → "Bonus kab milega?"
-- "Deopsit failed ho gaya" → "Deposit failed ho gaya"
-- "KYC verfication kab complete hoga?" → "KYC verification kab complete hoga?"
-- "Accont login nahi ho raha" → "Account login nahi ho raha"
-- "Game me dissconnect ho gaya" → "Game me disconnect ho gaya"
-
-### Context-based error correction examples:
-- If user previously discussed withdrawal ID #45678, and then types: "Withdrl #45678 ka kya status hai?" → correct to "Withdrawal #45678 ka kya status hai?"
-- If user previously mentioned Teen Patti game, and then types: "Tin pati me problem hai" → correct to "Teen Patti me problem hai"
-- If user discussed Roulette earlier, and later says: "Rullet abhi bhi crash ho raha hai" → correct to "Roulette abhi bhi crash ho raha hai"
-- If user mentioned deposit via UPI earlier, and later says: "UPI dipst amount show nahi ho raha" → correct to "UPI deposit amount show nahi ho raha"
-
-### "no_error" status examples:
-- "Withdrawal ID #45678 ka status kya hai?"
-- "Maine 5000 rupees deposit kiya hai lekin mere account me show nahi ho raha"
-- "10% deposit bonus mujhe nahi mila"
-- "Poker game me disconnect hua tha, mera bet refund karo"
-- "App crash ho raha hai jab main roulette khelta hun"
-- "UPI se deposit nahi ho pa raha hai"
-- "Verification ke liye aur kya documents chahiye?"
-- "Password reset karna hai, help karo"
-
-## REQUIRED ELEMENTS FOR UNCERTAIN STATUS
-Always provide:
-1. Two possible interpretations as English translations
-2. A note explaining unusual words or ambiguity sources
-3. Two complete alternative translations with different interpretations
-4. Clear indication that clarification is needed
-
-### FOR ONGOING PROBLEM COMPLAINTS WITHOUT SPECIFICS:
-When user message indicates a continuing problem without specifying which one (e.g., "still not fixed", "problem persists"), and chat history shows multiple issues:
-
-- You MUST reference specific previous issues from chat history in your interpretations
-- Each interpretation should mention a specific issue from earlier in the chat
-- Example: If chat history mentions withdrawal #45678 and bonus issue, your interpretations should be:
-  1. "The withdrawal #45678 is still not processed"
-  2. "The bonus issue mentioned earlier still persists"
-- Include any ID numbers, transaction details, or specific service names from chat history
-- Your interpretations should be detailed, mentioning the exact issues previously discussed
-
-## IMPORTANT GUIDELINES
-
-### Bias toward "uncertain" status when in doubt
-- When in doubt between "no_error" and "uncertain", ALWAYS choose "uncertain"
-- Even if a message seems straightforward but lacks specificity, mark it as "uncertain"
-- Messages expressing time urgency without context should be marked "uncertain"
-- Any message containing generalized commands without specifics should be "uncertain"
-
-### Context can only override ambiguity when it provides COMPLETE clarity
-- Only classify as "no_error" based on context if chat history makes the meaning 100% clear
-- If there remain MULTIPLE possible interpretations even with chat history, use "uncertain"
-- Example: If user was discussing both a withdrawal and a bonus issue, then says "is it done?", still mark as "uncertain"
-
-### Handling references to ongoing problems
-- When a user says something like "Problem abhi bhi hai" or "Still not fixed" with multiple issues in chat history:
-  1. ALWAYS use "uncertain" status
-  2. List each specific previous issue from chat history as separate interpretations
-  3. Be specific in interpretations, referencing exact transaction IDs, bonus types, or account issues
-  4. For example: "User is referring to their withdrawal #45678 that was mentioned earlier as still pending" and "User is referring to their 10% signup bonus issue mentioned in previous messages as still unresolved"
-- Never use generic interpretations like "User says the problem still exists" - always reference specific issues
-
-## REMINDER: YOUR ENTIRE RESPONSE MUST BE VALID JSON WITH NO ADDITIONAL TEXT
-Do not include any explanatory text, disclaimers, or formatting outside the JSON structure.
-Your response will be programmatically parsed, so any text outside the JSON structure will cause errors.
-"""
-
-        messages: List[Dict] = [{"role": "system", "content": system_promt2}]
-        chat_history: List[Dict] = self.get_chat_history(
-            conversation_id=conversation_id
+        chat_history: List[Dict] = await self.get_chat_history(
+            conversation_id=conversation_id, limit=self.chat_history_limit
         )
-        for message_chat in chat_history:
-            messages.append(
-                {
-                    "role": message_chat.get("role"),
-                    "content": message_chat.get("content"),
-                }
-            )
-
         # messages.append({"role": "user", "content": f"CURRENT MESSAGE: {message}"})
-        messages.append({"role": "user", "content": message})
+        messages: List[Dict] = build_messages(
+            "chat_history_analyzer", user_content=message, history=chat_history
+        )
 
         try:
-            response = await self.client_async.chat.completions.create(
+            response = await self.create_chat_completion(
                 # model="gpt-4-0125-preview",
                 # model="gpt-3.5-turbo-0125",
                 # model='gpt-4o',
@@ -843,6 +639,7 @@ Your response will be programmatically parsed, so any text outside the JSON stru
                 temperature=0,
                 response_format={"type": "json_object"},
             )
+            record_prompt_usage("chat_history_analyzer", "gpt-4-turbo", response.usage)
             response_dict: Dict = json.loads(response.choices[0].message.content)
 
             status: str = response_dict.get("status", "")
@@ -896,7 +693,10 @@ Your response will be programmatically parsed, so any text outside the JSON stru
         except Exception as e:
             raise e
 
-    async def analyze_message_with_correction_v4(self, message: str, analys: str):
+    async def analyze_message_with_correction_v4(
+            self, message: str, analys: str, route: ModelRoute | None = None
+    ):
+        route = route or DEFAULT_ANALYZER_ROUTE
         system_promt_35 = """# Casino Support AI Assistant - User Message Analyzer
 
 ## CRITICAL INSTRUCTION: RETURN ONLY VALID JSON
@@ -1212,292 +1012,78 @@ For uncertain user messages, you MUST:
 ## REMINDER: YOUR ENTIRE RESPONSE MUST BE VALID JSON WITH NO ADDITIONAL TEXT
 Do not include any explanatory text, disclaimers, or formatting outside the JSON structure.
 Your response will be programmatically parsed, so any text outside the JSON structure will cause errors."""
-        system_promt_v3 = """# Casino Support AI Assistant - User Message Analyzer
-
-## CRITICAL INSTRUCTION: RETURN ONLY VALID JSON
-Your response MUST be a single valid JSON object with no text before or after it.
-DO NOT include code blocks, explanations, or markdown formatting.
-DO NOT use ```json or ``` markers around your response.
-Your ENTIRE response must be parseable as JSON.
-
-## ROLE AND TASK
-You are an AI assistant for an online casino and sports betting support team. Your task is to analyze player messages in English, Hindi (Devanagari), Hinglish (Romanized Hindi), or Bengali. You must determine if messages are clear, need correction, or require further clarification.
-
-## INPUT FORMAT
-You will receive input in this format:
-```
-## MESSAGE TYPE
-user_message
-
-## CURRENT MESSAGE
-"[The user's message text in its original language]"
-
-## CONTEXT ANALYSIS
-[Previous conversation context summary as plain text]
-```
-
-## HOW TO PROCESS USER MESSAGES
-- Analyze the user's message for clarity, errors, or ambiguity
-- The message will be in its original language (English, Hindi, Hinglish, Bengali, etc.)
-- Determine if the message is clear (no_error), has errors to fix (error_fixed), or is ambiguous (uncertain)
-- If this is the first message (context says "No previous context available."), analyze it directly without relying on previous context
-- For subsequent messages, use the context_analysis to help understand ambiguous references
-- Check if the user is confirming that an issue is resolved
-- Return the appropriate JSON response based on the message status
-- For uncertain messages, provide ALL possible interpretations (not limited to just two)
-
-## RESPONSE FORMAT
-Return JSON in this format:
-{
-    "status": "[uncertain/error_fixed/no_error]",
-    "original_text": "original user message",
-    "translated_text": "English translation of user message",
-    "context_analysis": "Plain text summary of the entire conversation history, including both active and resolved issues, user preferences, agent promises, etc.",
-    
-    // Only include for status=error_fixed:
-    "corrected_text": "message with spelling and terminology corrections",
-    
-    // Only include for status=uncertain:
-    "possible_interpretations": [
-        "Interpretation 1: Most likely meaning",
-        "Interpretation 2: Alternative meaning",
-        "Interpretation 3: Another possible meaning",
-        "Interpretation 4: Additional possibility if relevant",
-        "Interpretation 5: Other possibility if relevant"
-    ],
-    "note": "Note explaining unusual words, possible meanings AND all alternative translations"
-}
-
-## CONTEXT ACCUMULATION AND MAINTENANCE
-
-### CRITICAL: The context_analysis field is the memory of the conversation
-- For each new message, you MUST update the existing context_analysis with new information from the current message
-- The existing context_analysis contains valuable information from all previous messages that must be preserved
-- Never discard or overwrite the previous context; always build upon it
-- When responding, the context_analysis you return will be used for processing the next message
-
-### How to update the context_analysis with each new message:
-1. Start with the existing context_analysis provided in the input
-2. Analyze the current message for new information: issues, preferences, clarifications
-3. Add this new information to the existing context
-4. Update the status of any issues based on the current message (e.g., mark as resolved if confirmed)
-5. Ensure the updated context remains a cohesive, flowing paragraph without redundancy
-6. The updated context_analysis should represent the ENTIRE conversation history, not just the current message
-
-### Example of context accumulation:
-- Initial context: "User has reported a withdrawal issue with ID #45678 that has been delayed for 3 days."
-- User's new message: "I also haven't received my signup bonus."
-- Updated context: "User has reported a withdrawal issue with ID #45678 that has been delayed for 3 days (first mentioned May 8). User has also reported not receiving their signup bonus (first mentioned May 9). User is communicating in English."
-
-## FIRST MESSAGE HANDLING
-When the context is "No previous context available." (indicating this is the first message):
-- Focus solely on the content of the first message without trying to reference previous context
-- Create an initial context analysis based only on this first message
-- For casino terminology and specific requests, assume they relate to legitimate services
-- Extract any identifiable issues, IDs, or specific requests from this first message
-- If the message appears complete and clear, use "no_error" status even without context
-- Identify the user's language preference based on this first message
-- Detect any gambling-specific terminology or code words the user employs
-- Even for the first message, follow normal rules for identifying spelling errors or ambiguity
-
-### Example of creating initial context for first message:
-If first message is "My withdrawal ID #45678 has been delayed for 3 days", create a context like:
-"User has reported a withdrawal issue with ID #45678 that has been delayed for 3 days (first mentioned today). User is communicating in English."
-
-## CONTEXT ANALYSIS CONTENT RULES
-
-### Information to include in context_analysis:
-1. Current active issues and when they were first mentioned
-2. Issues that have been resolved and how they were resolved
-3. User's language preferences and terminology
-4. Agent's promises, timeframes, and actions 
-5. Important transaction IDs and amounts
-6. Any code words or special terminology used by the user
-
-### Writing style for context_analysis:
-1. Use a simple plain text paragraph format without headings or special formatting
-2. Write in a natural, flowing paragraph style
-3. Begin with the most important active issues
-4. Be comprehensive but concise, focusing on what would help understand future messages
-5. Track dates or timing of when issues were first mentioned
-
-### Example context_analysis:
-"User has reported a bonus issue (10% signup bonus not credited, first mentioned May 8) that is still active. User previously had a withdrawal issue with ID #45678 that was resolved on May 9 when the agent processed the funds. User is communicating in Hindi and uses the term 'petrol' to refer to withdrawals. Agent has promised to check with the accounts team about the bonus issue and provide an update within 24 hours."
-
-## STATUS DETERMINATION FOR USER MESSAGES
-
-### Step 1: First check for clear context
-- If context_analysis provides information that UNAMBIGUOUSLY clarifies the current message's meaning, this can override ambiguity
-- Example: If context shows user previously discussed a specific withdrawal request and then asks "Kitna time lagega?", use "no_error" status since we know they're asking about withdrawal timeframe
-- The context must completely resolve any ambiguity to allow for "no_error" classification
-- For first messages without previous context, focus on the clarity of the message itself
-
-### Step 2: Check for spelling/terminology errors
-- If user message contains spelling mistakes, typos, or incorrect gambling terminology, use "error_fixed" status
-- Always provide corrected version in "corrected_text" field
-- Examples: "withdrawl" → "withdrawal", "bonoos" → "bonus", "deopsit" → "deposit"
-
-### Step 3: Check for ambiguity markers
-If any of these conditions are present, use "uncertain" status:
-- Multiple possible meanings
-- Unusual words in casino context (e.g., "petrol", "engine", "fuel")
-- Regional slang or idioms
-- Vague or unclear statements
-- Non-specific complaints
-- Lack of details about which feature/function has issues
-- General requests without specifying the problem
-- Ambiguous references to previous issues
-- References to "the problem" when multiple active issues exist in context
-- Issues unrelated to casino/betting/gambling
-- Expressions of urgency without clarifying the specific issue
-- Time references without context (e.g., "it's been 3 days")
-- Generic commands without specifics (e.g., "fix it", "make it work")
-- Nonspecific references to money/payments
-
-## COMPREHENSIVE INTERPRETATION REQUIREMENTS
-
-For uncertain user messages, you MUST:
-
-1. Generate ALL possible interpretations, not just two:
-   - Start with the most likely interpretation based on context
-   - Include all reasonably possible meanings, up to 5 different interpretations
-   - Consider ALL active issues from context when generating interpretations
-   - DO NOT include resolved issues in interpretations unless user is clearly referring to them
-   - Consider different terminology interpretations (e.g., "petrol" could mean withdrawal, funds, balance)
-   - Consider different possible actions the user might be requesting
-   - Consider different possible questions the user might be asking
-
-2. For ambiguous messages with multiple active issues in context:
-   - Create a separate interpretation for EACH active issue
-   - Example: If context has withdrawal issue, bonus issue, and account issue, create at least one interpretation for each
-
-3. For messages with code words or slang:
-   - Create interpretations for EACH possible meaning of these terms
-   - Example: If user says "engine", create interpretations where this refers to account, game, app, website, etc.
-
-4. For non-specific time queries:
-   - Include interpretations for ALL time-sensitive issues in context
-   - Example: For "kitna time lagega?", create interpretations for withdrawal processing time, bonus crediting time, verification completion time, etc.
-
-5. For general complaints:
-   - Create interpretations for each potential aspect of the service that could be causing problems
-   - Example: For "not working", create interpretations for app issues, game issues, payment issues, etc.
-
-## DOMAIN-SPECIFIC TERMINOLOGY
-
-### Common code words in gambling contexts
-- "petrol", "diesel", "gas", "fuel" → often refer to "withdrawal" or payments
-- "engine", "car", "tank" → may refer to account functionality or balance
-- "recharge" → often means deposit
-- "mobile balance" → may refer to account balance
-- "ID" → may refer to player account or specific game/bet ID
-- "process", "processing" → often refers to withdrawal or verification procedures
-- "stuck", "frozen" → typically refers to account/game issues or pending transactions
-- "locked", "blocked" → usually refers to account restrictions or verification issues
-
-### Player pain points and common requests
-- Account issues (login problems, password reset, account verification)
-- Deposit problems (payment failed, amount not credited)
-- Withdrawal issues (delay, rejection, verification requirements)
-- Bonus problems (not received, terms misunderstood, wagering requirements)
-- Game-specific issues (crash, disconnect, bet not registered)
-- Technical problems (app not working, website errors)
-- Payment method issues (card declined, UPI failure, wallet issues)
-- KYC verification (document upload, verification pending, rejection)
-
-## IMPORTANT GUIDELINES
-
-### Bias toward "uncertain" status when in doubt
-- When in doubt between "no_error" and "uncertain", ALWAYS choose "uncertain"
-- Even if a message seems straightforward but lacks specificity, mark it as "uncertain"
-- Messages expressing time urgency without context should be marked "uncertain"
-- Any message containing generalized commands without specifics should be "uncertain"
-
-## REMINDER: YOUR ENTIRE RESPONSE MUST BE VALID JSON WITH NO ADDITIONAL TEXT
-Do not include any explanatory text, disclaimers, or formatting outside the JSON structure.
-Your response will be programmatically parsed, so any text outside the JSON structure will cause errors."""
-
-        if (analys == ''):
-            analys = 'No previous context available.'
-        #         user_message: str = f"""## CURRENT MESSAGE
-        # {message}
-        #
-        # ## PREVIOUS CONTEXT ANALYSIS
-        # {analys}"""
-
-        user_input = f"""## MESSAGE TYPE
-        user_message
-
-        ## CURRENT MESSAGE
-        "{message}"
 
-        ## CONTEXT ANALYSIS
-        {analys}"""
+        user_input: str = build_user_message_input(message=message, analys=analys)
         try:
-            response = await self.client_async.chat.completions.create(
+            start_time: float = time.perf_counter()
+            response = await self.create_chat_completion(
                 # model="gpt-4-0125-preview",
-                model="gpt-3.5-turbo-0125",
+                model=route.model,
                 # model='gpt-4o',
-                messages=[
-                    {"role": "system", "content": system_promt_v3},
-                    {"role": "user", "content": user_input},
-                ],
+                messages=build_messages("user_message_analyzer", user_content=user_input),
                 temperature=0,
                 response_format={"type": "json_object"},
             )
+            record_route_usage(route, time.perf_counter() - start_time, response.usage)
+            record_prompt_usage("user_message_analyzer", route.model, response.usage)
             response_dict: Dict = json.loads(response.choices[0].message.content)
 
-            status: str = response_dict.get("status", "")
-            if status == "no_error":
-                original_text: str = response_dict.get("original_text", "")
-                translated_text: str = response_dict.get("translated_text", "")
-                context_analysis = response_dict.get("context_analysis", "")
-                return UserMessage(
-                    status=status,
-                    original_text=original_text,
-                    translated_text=translated_text,
-                    note=None,
-                    corrected_text=original_text,
-                    possible_interpretations=[],
-                    context_analysis=context_analysis,
-                )
-            elif status == "error_fixed":
-                original_text: str = response_dict.get("original_text", "")
-                translated_text: str = response_dict.get("translated_text", "")
-                corrected_text: str = response_dict.get("corrected_text", "")
-                context_analysis: str = response_dict.get("context_analysis", "")
-                return UserMessage(
-                    status=status,
-                    original_text=original_text,
-                    translated_text=translated_text,
-                    note=None,
-                    corrected_text=corrected_text,
-                    possible_interpretations=[],
-                    context_analysis=context_analysis,
-                )
-            elif status == "uncertain":
-                original_text: str = response_dict.get("original_text", "")
-                translated_text: str = response_dict.get("translated_text", "")
-                note: str = response_dict.get("note", "")
-                interpretations: List[str] = response_dict.get(
-                    "possible_interpretations", []
-                )
-                context_analysis = response_dict.get("context_analysis", "")
-                return UserMessage(
-                    status=status,
-                    original_text=original_text,
-                    translated_text=translated_text,
-                    possible_interpretations=interpretations,
-                    note=note,
-                    corrected_text="",
-                    context_analysis=context_analysis,
-                )
-            else:
-                return None
+            return parse_user_message(response_dict)
 
         except Exception as e:
             raise e
 
+    async def analyze_message_with_correction_v4_stream(
+            self,
+            message: str,
+            analys: str,
+            on_field: FieldCallback,
+            route: ModelRoute | None = None,
+    ) -> UserMessage | None:
+        route = route or DEFAULT_ANALYZER_ROUTE
+        user_input: str = build_user_message_input(message=message, analys=analys)
+        parser: IncrementalJSONParser = IncrementalJSONParser()
+        start_time: float = time.perf_counter()
+        # the slot is held until the stream is fully read
+        async with self.llm_limiter_service.slot(route.model):
+            stream = await self.client_async.chat.completions.create(
+                model=route.model,
+                messages=build_messages("user_message_analyzer", user_content=user_input),
+                temperature=0,
+                response_format={"type": "json_object"},
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    record_route_usage(route, time.perf_counter() - start_time, chunk.usage)
+                    record_prompt_usage("user_message_analyzer", route.model, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for field in parser.feed(chunk.choices[0].delta.content):
+                    await on_field(field, parser.fields)
+        return parse_user_message(parser.result())
+
+    async def analyze_message_fused(
+            self, message: str, analys: str, route: ModelRoute | None = None
+    ):
+        route = route or DEFAULT_ANALYZER_ROUTE
+        user_input: str = build_user_message_input(message=message, analys=analys)
+        start_time: float = time.perf_counter()
+        response = await self.create_chat_completion(
+            model=route.model,
+            messages=build_messages("user_message_fused_analyzer", user_content=user_input),
+            temperature=0,
+            response_format={"type": "json_object"},
+        )
+        record_route_usage(route, time.perf_counter() - start_time, response.usage)
+        record_prompt_usage("user_message_fused_analyzer", route.model, response.usage)
+        response_dict: Dict = json.loads(response.choices[0].message.content)
+        user_message: UserMessage | None = parse_user_message(response_dict)
+        if user_message is not None:
+            user_message.language = response_dict.get("language", "Uncertain")
+        return user_message
+
     async def analyze_agent_message(
             self, agent_message: str, context_analys: str
     ):
@@ -1614,148 +1200,14 @@ ALWAYS return JSON in this format for agent messages:
 ## REMINDER: YOUR ENTIRE RESPONSE MUST BE VALID JSON WITH NO ADDITIONAL TEXT
 Do not include any explanatory text, disclaimers, or formatting outside the JSON structure.
 Your response will be programmatically parsed, so any text outside the JSON structure will cause errors."""
-        system_promt_full = """# Casino Support AI Assistant - Agent Message Analyzer
-
-## CRITICAL INSTRUCTION: RETURN ONLY VALID JSON
-Your response MUST be a single valid JSON object with no text before or after it.
-DO NOT include code blocks, explanations, or markdown formatting.
-DO NOT use ```json or ``` markers around your response.
-Your ENTIRE response must be parseable as JSON.
-
-## ROLE AND TASK
-You are an AI assistant for an online casino and sports betting support team. Your task is to analyze agent responses to update the conversation context, particularly tracking issue resolution, promises, and timeframes.
-
-## INPUT FORMAT
-You will receive input in this format:
-```
-## MESSAGE TYPE
-agent_message
-
-## CURRENT MESSAGE
-"[The agent's message text]"
-
-## CONTEXT ANALYSIS
-[Previous conversation context summary as plain text]
-```
-
-## HOW TO PROCESS AGENT MESSAGES
-- DO NOT analyze the agent message for errors or ambiguity
-- Update the context_analysis to include new information from the agent's response
-- Consider the agent's message in relation to ALL issues and information in the existing context
-- Critically analyze if the agent is indicating that an issue has been RESOLVED
-- Note when issues are resolved in the updated context_analysis
-- Record any promises, timeframes, or actions mentioned by the agent
-- Return a simple JSON with status="agent_message" and updated context
-
-## RESPONSE FORMAT
-ALWAYS return JSON in this format for agent messages:
-{
-    "status": "agent_message",
-    "context_analysis": "Plain text summary of the entire conversation history, including updates from this agent message"
-}
-
-## CONTEXT ACCUMULATION AND MAINTENANCE
-
-### CRITICAL: The context_analysis field is the memory of the conversation
-- For each agent message, you MUST update the existing context_analysis with new information
-- The existing context_analysis contains valuable information from all previous exchanges that must be preserved
-- Never discard or overwrite the previous context; always build upon it
-- Pay special attention to agent's commitments, timeframes, and resolution statements
-- When responding, the context_analysis you return will be used for processing all future messages
-- The quality of your context updates directly impacts the system's ability to understand future interactions
-
-### How to update the context_analysis with each agent message:
-1. Start with the existing context_analysis provided in the input
-2. Analyze the agent's message for:
-   - Issue resolutions or status updates
-   - Promises or commitments made
-   - Timeframes provided
-   - Actions taken or planned
-   - Information provided about processes or procedures
-3. Add this new information to the existing context
-4. Update the status of any issues based on the agent's message (e.g., mark as resolved if confirmed)
-5. Ensure the updated context remains a cohesive, flowing paragraph without redundancy
-6. The updated context_analysis should represent the ENTIRE conversation history, not just the current message
-
-### Example of context accumulation:
-- Initial context: "User has reported a withdrawal issue with ID #45678 that has been delayed for 3 days. User is communicating in Hindi."
-- Agent's message: "We've processed your withdrawal ID #45678. The funds should be in your account within 24 hours."
-- Updated context: "User had reported a withdrawal issue with ID #45678 that was delayed for 3 days, which has now been resolved. Agent has processed the withdrawal and informed the user that funds should be in their account within 24 hours (informed on May 9). User is communicating in Hindi."
-
-## ISSUE RESOLUTION TRACKING
-
-### Identifying resolved issues from agent messages:
-- When agent explicitly states "issue resolved", "problem fixed", "request completed"
-- When agent confirms a transaction has been processed successfully
-- When agent states that funds have been credited or action completed
-- When agent provides confirmation numbers or completion timestamps
-- When agent uses phrases like "done", "completed", "resolved", "fixed"
-
-### Example agent resolution messages:
-- "We've processed your withdrawal ID #45678, the funds should be in your account within 24 hours"
-- "Your bonus has been credited to your account now"
-- "We've resolved the login issue with your account"
-- "Your verification is now complete"
-- "Your request has been completed successfully, here is your confirmation number: XYZ123"
-
-### Agent promises and timeframes to track:
-- Specific timeframes for issue resolution (e.g., "within 24 hours", "by tomorrow")
-- Commitments to take action (e.g., "we will check this", "we'll escalate this")
-- Information about processes (e.g., "verification typically takes 48 hours")
-- Conditional promises (e.g., "if you provide X, we will do Y")
-- Follow-up commitments (e.g., "we will update you once we have more information")
-
-## CONTEXT ANALYSIS CONTENT RULES
-
-### Information to include in context_analysis:
-- Current active issues and when they were first mentioned
-- Issues that have been resolved and how they were resolved
-- User's language preferences and terminology
-- Agent's promises, timeframes, and actions 
-- Important transaction IDs and amounts
-- Procedural information provided by the agent
-- Status updates on previously mentioned issues
-
-### Writing style for context_analysis:
-1. Use a simple plain text paragraph format without headings or special formatting
-2. Write in a natural, flowing paragraph style
-3. Begin with the most important active issues
-4. Be comprehensive but concise, focusing on what would help understand future messages
-5. Track dates or timing of when issues were mentioned and when agent actions occurred
-
-### Example context_analysis:
-"User has reported a bonus issue (10% signup bonus not credited, first mentioned May 8) that is still active. User previously had a withdrawal issue with ID #45678 that was resolved on May 9 when the agent processed the funds. User is communicating in Hindi and uses the term 'petrol' to refer to withdrawals. Agent has just promised to check with the accounts team about the bonus issue and provide an update within 24 hours."
-
-## DOMAIN-SPECIFIC TERMINOLOGY
-
-### Common agent actions
-- "Escalate" - send the issue to a higher support tier or specialized team
-- "Process" - complete a transaction or request
-- "Verify" - check the validity of documents or information
-- "Credit" - add funds to user's account
-- "Update" - provide new information to the user
-- "Expedite" - speed up the normal process
-- "Override" - make an exception to standard procedures
-- "Troubleshoot" - investigate and solve technical issues
-
-### Common agent promises
-- Time estimations ("within 24 hours", "2-3 business days")
-- Follow-up commitments ("we'll get back to you")
-- Action promises ("we will check this", "we'll process it")
-- Conditional commitments ("once you provide X, we will do Y")
-- Escalation promises ("I'll forward this to our specialist team")
-
-## IMPORTANT GUIDELINES
+        response = await self.create_chat_completion(
+            **self.agent_message_request(agent_message, context_analys)
+        )
+        record_prompt_usage("agent_message_analyzer", "gpt-3.5-turbo-0125", response.usage)
 
-### For agent_message, ALWAYS use status="agent_message"
-- Do not evaluate agent messages for correctness or clarity
-- Simply update the context with information from the agent's message
-- Include promises, timeframes, and actions mentioned by the agent
-- Carefully analyze if the agent is indicating that an issue has been resolved
+        return self.parse_agent_message(response.choices[0].message.content)
 
-## REMINDER: YOUR ENTIRE RESPONSE MUST BE VALID JSON WITH NO ADDITIONAL TEXT
-Do not include any explanatory text, disclaimers, or formatting outside the JSON structure.
-Your response will be programmatically parsed, so any text outside the JSON structure will cause errors."""
+    def agent_message_request(self, agent_message: str, context_analys: str) -> Dict:
         if context_analys == '':
             context_analys = "No previous context available."
         agent_input = f"""## MESSAGE TYPE
@@ -1766,32 +1218,91 @@ Your response will be programmatically parsed, so any text outside the JSON stru
 
         ## CONTEXT ANALYSIS
         {context_analys}"""
-
-        response = await self.client_async.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": system_promt_full},
-                {"role": "user", "content": agent_input},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0,
-        )
-
-        result = response.choices[0].message.content
+        return {
+            "model": "gpt-3.5-turbo-0125",
+            "messages": build_messages("agent_message_analyzer", user_content=agent_input),
+            "response_format": {"type": "json_object"},
+            "temperature": 0,
+        }
+
+    def parse_agent_message(self, result: str) -> str:
         response_dict: Dict = json.loads(result)
         context_analys_result: str = response_dict.get("context_analysis", "")
         return context_analys_result
 
-    def get_chat_history(self, conversation_id: str) -> List[Dict]:
-        chat_mesages: ConversationMessages | None = (
-            self.messages_cache_service.get_conversation_messages(
-                conversation_id='conv:' + conversation_id
+    async def submit_chat_batch(self, requests: Dict[str, Dict]) -> str:
+        # requests maps custom_id to the chat completion body
+        lines: List[str] = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": body,
+                }
             )
+            for custom_id, body in requests.items()
+        ]
+        batch_file = await self.client_async.files.create(
+            file=("chat_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.client_async.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
         )
-        if chat_mesages == None:
-            return []
+        return batch.id
 
-        messages: List[ConversationMessage] = chat_mesages.messages
+    async def get_chat_batch_results(self, batch_id: str) -> Dict[str, str] | None:
+        # None while the batch is still running, otherwise custom_id to message
+        # content for every request that succeeded
+        batch = await self.client_async.batches.retrieve(batch_id)
+        if batch.status not in ("completed", "failed", "expired", "cancelled"):
+            return None
+        results: Dict[str, str] = {}
+        if batch.output_file_id is None:
+            return results
+        output = await self.client_async.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item: Dict = json.loads(line)
+            response: Dict | None = item.get("response")
+            if response is None or response.get("status_code") != 200:
+                continue
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return results
+
+    async def compact_context_analysis(
+            self, context_analysis: str, word_limit: int, model: str
+    ) -> str:
+        user_input: str = f"""## WORD LIMIT
+{word_limit}
+
+## CONTEXT ANALYSIS
+{context_analysis}"""
+        response = await self.create_chat_completion(
+            model=model,
+            messages=build_messages("context_compaction", user_content=user_input),
+            temperature=0,
+        )
+        record_prompt_usage("context_compaction", model, response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def create_chat_completion(self, **kwargs) -> ChatCompletion:
+        return await self.llm_limiter_service.call(
+            kwargs["model"], lambda: self.client_async.chat.completions.create(**kwargs)
+        )
+
+    async def get_chat_history(
+            self, conversation_id: str, limit: int | None = None
+    ) -> List[Dict]:
+        messages: List[ConversationMessage] = (
+            await self.messages_cache_service.get_last_conversation_messages(
+                conversation_id=conversation_id.removeprefix("conv:"), limit=limit
+            )
+        )
         result_messages: List[Dict] = []
         for chat_message in messages:
             if chat_message.user.type == "admin":
@@ -1806,16 +1317,14 @@ Your response will be programmatically parsed, so any text outside the JSON stru
 
         return result_messages
 
-    def get_chat_history_v2(self, conversation_id: str) -> List[Dict]:
-        chat_mesages: ConversationMessages | None = (
-            self.messages_cache_service.get_conversation_messages(
-                conversation_id=conversation_id
+    async def get_chat_history_v2(
+            self, conversation_id: str, limit: int | None = None
+    ) -> List[Dict]:
+        messages: List[ConversationMessage] = (
+            await self.messages_cache_service.get_last_conversation_messages(
+                conversation_id=conversation_id.removeprefix("conv:"), limit=limit
             )
         )
-        if chat_mesages == None:
-            return []
-
-        messages: List[ConversationMessage] = chat_mesages.messages
         result_messages: List[Dict] = []
         for chat_message in messages:
             if chat_message.user.type == "admin":
@@ -1877,7 +1386,7 @@ Example for uncertain message:
     \"note\": \"The player used the words 'engine' and 'petrol', which are unusual in a casino login context. Possible meanings:\\n1. Website/app not loading properly after password entry\\n2. Session expiring or connection dropping during login\\nAlternative translations:\\n1. 'Brother, I cannot log in to the site, the page doesn't load, session expires right after entering password'\\n2. 'Brother, I cannot log in to the site, the application crashes, an error appears right after entering password'\\nClarification needed.\"
 }"""
 
-    response = await self.client_async.chat.completions.create(
+    response = await self.create_chat_completion(
         model="gpt-4",  # Используй нужную модель
         messages=[
             {"role": "system", "content": promt},
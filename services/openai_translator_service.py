@@ -6,15 +6,36 @@ from typing import Dict, List
 from models.models import UserMessage
 from models.custom_exceptions import APPException
 from openai._exceptions import OpenAIError
+from typing import Awaitable, Callable
+from services.translation_cache_service import TranslationCacheService
+from services.language_classifier import LanguageClassifier, language_label
+from services.llm_limiter_service import LLMLimiterService
+from services.prompt_templates import (
+    ENGLISH_TO_HINGLISH_PROMPT,
+    build_messages,
+    record_prompt_usage,
+)
+from prometheus_metricks.metricks import LANGUAGE_DETECTION_COUNT
 
 load_dotenv()
 
 
 class OpenAITranslatorService:
-    def __init__(self):
+    def __init__(
+            self,
+            translation_cache: TranslationCacheService | None = None,
+            llm_limiter_service: LLMLimiterService | None = None,
+    ):
+        self.translation_cache = translation_cache
+        self.llm_limiter_service = llm_limiter_service or LLMLimiterService()
+        self.language_classifier = LanguageClassifier(
+            min_confidence=float(os.getenv("LANGUAGE_CLASSIFIER_MIN_CONFIDENCE", "0.75"))
+        )
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
         try:
             self.open_ai_client = OpenAI(api_key=os.getenv("OPENAPI_KEY"))
-            self.client_async = AsyncOpenAI(api_key=os.getenv("OPENAPI_KEY"))
+            # retries are done by the limiter so it sees every 429
+            self.client_async = AsyncOpenAI(api_key=os.getenv("OPENAPI_KEY"), max_retries=0)
         except OpenAIError as open_ai_error:
             full_exception_name = (
                 f"{type(open_ai_error).__module__}.{type(open_ai_error).__name__}"
@@ -30,6 +51,33 @@ class OpenAITranslatorService:
         except Exception as e:
             raise e
 
+    async def create_chat_completion(self, **kwargs) -> ChatCompletion:
+        return await self.llm_limiter_service.call(
+            kwargs["model"], lambda: self.client_async.chat.completions.create(**kwargs)
+        )
+
+    @staticmethod
+    def prompt_version(prompt: str) -> str:
+        return TranslationCacheService.prompt_version(prompt)
+
+    async def get_cached_translation(
+            self,
+            message: str,
+            target_language: str,
+            prompt_version: str,
+            model: str,
+            translate: Callable[[], Awaitable[str]],
+    ) -> str:
+        if self.translation_cache is None:
+            return await translate()
+        return await self.translation_cache.get_or_translate(
+            message=message,
+            target_language=target_language,
+            prompt_version=prompt_version,
+            model=model,
+            translate=translate,
+        )
+
     async def translate_message_from_english_to_hindi_async(
             self, message: str
     ) -> str | None:
@@ -42,24 +90,34 @@ The message is being sent **to a male player**, so please use **respectful and a
 
 Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that Hindi-speaking players commonly understand.
 """
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt2,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="Hindi",
+            prompt_version=self.prompt_version(promt2),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt2,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-
-        return result
 
     async def translate_message_from_english_to_bengali_async(
             self, message: str
@@ -73,157 +131,187 @@ The message is being sent to a male player. While Bengali verbs generally do not
 
 Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that Bengali-speaking players commonly understand.
 """
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt2,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="Bengali",
+            prompt_version=self.prompt_version(promt2),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt2,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-
-        return result
 
     async def translate_message_from_english_to_hinglish_async(
             self, message: str
     ) -> str | None:
         promt = "You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from India and Bangladesh. Your task is to translate the following English message into Romanized Hindi (Hinglish) while preserving the exact meaning and making it easy to understand for a native Hindi speaker. Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that Indian players commonly understand."
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            result = response.choices[0].message.content.strip()
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="Hinglish",
+            prompt_version=self.prompt_version(promt),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        result = response.choices[0].message.content.strip()
-
-        return result
 
     async def translate_message_from_english_to_hinglish_async_v2(
             self, message: str
     ) -> str | None:
-        prompt = f"""You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from India and Bangladesh. Your task is to translate the following English message into **Hinglish (Romanized Hindi)**, ensuring that the translation is written **entirely in the Latin alphabet** (English letters).
-
-The translation must **not use Devanagari script** (हिंदी). Instead, it should be written in **a natural, easy-to-read Romanized Hindi style** that native Hindi speakers commonly use in chat or casual writing.
-
-Make sure that no extra symbols (such as exclamation marks, commas, or other punctuation marks) are added unless they are part of the original message.
-
-Maintain a **friendly and professional tone**, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that Indian players commonly understand.
-
-Example:
-- **English:** "Your bet has been placed successfully."
-- - **Correct Hinglish:** "Aapka bet successfully lag gaya hai."
-- - **Incorrect (Devanagari):** "आपका बेट सफलतापूर्वक लग गया है।"
-
-Now, translate the following message into **Hinglish (Romanized Hindi) only**:
-
-"{message}"
-"""
-        promt2 = f"""You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from India and Bangladesh. Your task is to translate the following English message into **Hinglish (Romanized Hindi)**, ensuring that the translation is written **entirely in the Latin alphabet** (English letters). The translation must **not use Devanagari script** (हिंदी). Instead, it should be written in **a natural, easy-to-read Romanized Hindi style** that native Hindi speakers commonly use in chat or casual writing.
-
-Important: The note is written by a **female support agent**, so the tone and style should reflect that. The message is being sent **to a male player**, so please use **masculine grammatical forms and respectful male-addressing style in Hindi** where applicable.
-
-Make sure that no extra symbols (such as exclamation marks, commas, or other punctuation marks) are added unless they are part of the original message. Maintain a **friendly and professional tone**, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that Indian players commonly understand.
-
-Example:
-- **English:** "Your bet has been placed successfully."
-- - **Correct Hinglish:** "Aapka bet successfully lag gaya hai."
-- - **Incorrect (Devanagari):** "आपका बेट सफलतापूर्वक लग गया है।"
-
-Now, translate the following message into **Hinglish (Romanized Hindi) only**, using **masculine forms** where appropriate: "{message} """
-
-        response = await self.client_async.chat.completions.create(
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo-0125",
+                messages=build_messages("english_to_hinglish", user_content=message),
+                temperature=0.2,
+            )
+            record_prompt_usage("english_to_hinglish", "gpt-3.5-turbo-0125", response.usage)
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="Hinglish",
+            prompt_version=self.prompt_version(ENGLISH_TO_HINGLISH_PROMPT),
             model="gpt-3.5-turbo-0125",
-            messages=[{"role": "system", "content": promt2}],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-        return result
 
     async def translate_message_from_bengali_to_english_async(
             self, message: str
     ) -> str | None:
         promt = "You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from Bangladesh and India. Your task is to translate the following Bengali (বাংলা) message into English while preserving the exact meaning and making it easy to understand for a native English speaker. Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that English-speaking players commonly understand."
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="English",
+            prompt_version=self.prompt_version(promt),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-
-        return result
 
     async def translate_message_from_hindi_to_english_async(
             self, message: str
     ) -> str | None:
         promt = "You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from India. Your task is to translate the following Hindi (हिंदी) message into English while preserving the exact meaning and making it easy to understand for a native English speaker. Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that English-speaking players commonly understand."
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="English",
+            prompt_version=self.prompt_version(promt),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-
-        return result
 
     async def translate_message_from_hinglish_to_english_async(
             self, message: str
     ) -> str | None:
         promt = "You are an AI assistant for the customer support team of an online casino and sports betting platform, handling conversations with players from India. Your task is to translate the following Hinglish (a mix of Hindi and English) message into proper English while preserving the exact meaning and making it easy to understand for a native English speaker. Maintain a friendly and professional tone, ensuring clarity for the player. If the message contains casino or betting-related terms, translate them in a way that English-speaking players commonly understand. Also, ensure that informal or slang expressions are appropriately adapted for clarity and professionalism."
-        response = await self.client_async.chat.completions.create(
+
+        async def translate() -> str:
+            response = await self.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": promt,
+                    },
+                    {
+                        "role": "user",
+                        "content": message,
+                    },
+                ],
+                temperature=0.2,
+            )
+            translated_text = response.choices[0].message.content
+            result = translated_text.strip('"')
+
+            return result
+
+        return await self.get_cached_translation(
+            message=message,
+            target_language="English",
+            prompt_version=self.prompt_version(promt),
             model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": promt,
-                },
-                {
-                    "role": "user",
-                    "content": message,
-                },
-            ],
-            temperature=0.2,
+            translate=translate,
         )
-        translated_text = response.choices[0].message.content
-        result = translated_text.strip('"')
-
-        return result
 
     async def detect_language_async(self, message: str) -> str | None:
         promt = """You are an AI assistant for an online casino and sports betting customer support team. Your task is to determine the language of a player's message.
@@ -239,7 +327,7 @@ IMPORTANT: Pay special attention to the writing system. If the message uses Lati
 
 Return ONLY the language name without explanation."""
 
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             model="gpt-4o-mini-2024-07-18",
             messages=[
                 {"role": "system", "content": promt},
@@ -252,25 +340,35 @@ Return ONLY the language name without explanation."""
         return result
 
     async def detect_language_async_v2(self, message: str):
-        prompt = f"""
-            Determine the language of the given text. The possible options are:
-            - 'Hindi' – if the text is written in Devanagari script (e.g., 'नमस्ते, मेरी समस्या है...').
-            - 'Hinglish' – if the text is written in the Latin alphabet but represents Hindi words phonetically (e.g., 'namaste, meri samasya hai...').
-            - 'English' – if the text is standard English (e.g., 'Hello, I have a problem...').
-            - 'Bengali' – if the text is written in Bengali script (বাংলা).
-            - 'Uncertain' – if the language is unclear or mixed in a way that makes identification difficult.
-
-            Return only the name of the language from the list above. Do not provide explanations or additional text.
-
-            Text: {message}
-            Language:
-            """
-        response = await self.client_async.chat.completions.create(
+        response = await self.create_chat_completion(
             # model="gpt-4",
             model="gpt-3.5-turbo-0125",
-            messages=[{"role": "system", "content": prompt}],
+            messages=build_messages("language_detection", user_content=message),
             max_tokens=10,
             temperature=0,
         )
+        record_prompt_usage("language_detection", "gpt-3.5-turbo-0125", response.usage)
         result = response.choices[0].message.content.strip()
         return result
+
+    def detect_language_locally(self, message: str) -> str | None:
+        language, confidence = self.language_classifier.classify(message)
+        if not self.language_classifier.is_confident(confidence):
+            return None
+        LANGUAGE_DETECTION_COUNT.labels(
+            pod_name=self.pod_name, source="local", language=language
+        ).inc()
+        return language
+
+    async def detect_language_async_v3(self, message: str) -> str:
+        language: str | None = self.detect_language_locally(message)
+        if language is not None:
+            return language
+        return await self.detect_language_remotely(message)
+
+    async def detect_language_remotely(self, message: str) -> str:
+        result: str = await self.detect_language_async_v2(message)
+        LANGUAGE_DETECTION_COUNT.labels(
+            pod_name=self.pod_name, source="llm", language=language_label(result)
+        ).inc()
+        return result
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import List, Mapping, Tuple
+from prometheus_metricks.metricks import (
+    RATE_LIMITER_TOKENS,
+    RATE_LIMITER_RATE,
+    RATE_LIMITER_QUEUE_SIZE,
+    RATE_LIMITER_WAIT_TIME,
+)
+
+PRIORITY_REPLY: int = 0
+PRIORITY_NOTE: int = 1
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, name: str, rate_per_second: float, capacity: float):
+        self.name = name
+        self.base_rate: float = rate_per_second
+        self.rate: float = rate_per_second
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated_at: float = time.monotonic()
+        self.blocked_until: float = 0.0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.wakeup_handle: asyncio.TimerHandle | None = None
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    async def acquire(self, priority: int = PRIORITY_NOTE):
+        start_time = time.perf_counter()
+        self.refill()
+        if not self.waiters and self.tokens >= 1:
+            self.tokens -= 1
+        else:
+            future: asyncio.Future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+            self.schedule_wakeup()
+            self.report()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.tokens += 1
+                else:
+                    self.waiters = [w for w in self.waiters if w[2] is not future]
+                    heapq.heapify(self.waiters)
+                raise
+        RATE_LIMITER_WAIT_TIME.labels(
+            pod_name=self.pod_name, limiter=self.name, priority=str(priority)
+        ).observe(time.perf_counter() - start_time)
+        self.report()
+
+    def update_from_headers(self, headers: Mapping[str, str], status: int):
+        now_wall: float = time.time()
+        remaining: str | None = headers.get("X-RateLimit-Remaining")
+        reset: str | None = headers.get("X-RateLimit-Reset")
+        seconds_to_reset: float | None = None
+        if reset is not None and reset.isdigit():
+            seconds_to_reset = max(float(reset) - now_wall, 0.0)
+
+        self.refill()
+        if remaining is not None and remaining.isdigit():
+            remaining_count: int = int(remaining)
+            # the server counts requests from every pod, never spend more than it allows
+            self.tokens = min(self.tokens, float(remaining_count))
+            if remaining_count == 0 and seconds_to_reset is not None:
+                self.block_for(seconds_to_reset)
+            elif seconds_to_reset:
+                self.rate = min(self.base_rate, remaining_count / seconds_to_reset)
+            else:
+                self.rate = self.base_rate
+
+        if status == 429:
+            self.tokens = 0.0
+            retry_after: str | None = headers.get("Retry-After")
+            if seconds_to_reset is None and retry_after is not None and retry_after.isdigit():
+                seconds_to_reset = float(retry_after)
+            self.block_for(seconds_to_reset if seconds_to_reset is not None else 1.0)
+        self.report()
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.rate = self.base_rate
+        if self.wakeup_handle is not None:
+            self.wakeup_handle.cancel()
+            self.wakeup_handle = None
+        if self.waiters:
+            self.schedule_wakeup()
+
+    def refill(self):
+        now: float = time.monotonic()
+        if now < self.blocked_until:
+            self.updated_at = now
+            return
+        elapsed: float = now - max(self.updated_at, self.blocked_until)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def schedule_wakeup(self):
+        if self.wakeup_handle is not None:
+            return
+        now: float = time.monotonic()
+        if now < self.blocked_until:
+            delay: float = self.blocked_until - now
+        else:
+            delay = max((1 - self.tokens) / max(self.rate, 0.001), 0.001)
+        self.wakeup_handle = asyncio.get_running_loop().call_later(
+            delay, self.release_waiters
+        )
+
+    def release_waiters(self):
+        self.wakeup_handle = None
+        self.refill()
+        while self.waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        if self.waiters:
+            self.schedule_wakeup()
+        self.report()
+
+    def report(self):
+        RATE_LIMITER_TOKENS.labels(pod_name=self.pod_name, limiter=self.name).set(self.tokens)
+        RATE_LIMITER_RATE.labels(pod_name=self.pod_name, limiter=self.name).set(self.rate)
+        RATE_LIMITER_QUEUE_SIZE.labels(pod_name=self.pod_name, limiter=self.name).set(
+            len(self.waiters)
+        )
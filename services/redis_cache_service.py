@@ -1,7 +1,11 @@
 from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis, ConnectionPool as AsyncConnectionPool
+from redis.exceptions import WatchError
 import os
+import json
 from dotenv import load_dotenv
-from models.models import ConversationMessages
+from typing import Dict, List
+from models.models import ConversationMessages, ConversationMessage, ConversationState
 from models.custom_exceptions import APPException
 from models.models import ConversationContext
 
@@ -39,6 +43,9 @@ class RedisService:
         is_key_exist: bool = self.redis_client.setnx(key_name, key_value)
         return is_key_exist
 
+    def delete_key(self, key_name: str):
+        self.redis_client.delete(key_name)
+
 
 class MessagesCache:
     def __init__(self):
@@ -127,3 +134,225 @@ class MessagesCache:
 
     def close(self):
         self.redis_client.close()
+
+
+def create_async_redis_pool(db: int) -> AsyncConnectionPool:
+    return AsyncConnectionPool(
+        host=os.getenv("REDIS_URI_KS"),
+        port=6379,
+        db=db,
+        decode_responses=True,
+        max_connections=int(os.getenv("REDIS_POOL_MAX_CONNECTIONS", "50")),
+        socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+        health_check_interval=30,
+    )
+
+
+class AsyncRedisService:
+    def __init__(self, connection_pool: AsyncConnectionPool):
+        self.redis_client = AsyncRedis(connection_pool=connection_pool)
+
+    def get_redis_client(self):
+        return self.redis_client
+
+    async def close(self):
+        await self.redis_client.aclose()
+
+    async def set_key(self, key_name: str, key_value: str) -> bool:
+        is_key_exist: bool = await self.redis_client.setnx(key_name, key_value)
+        return is_key_exist
+
+    async def delete_key(self, key_name: str):
+        await self.redis_client.delete(key_name)
+
+
+class AsyncMessagesCache:
+    def __init__(self, connection_pool: AsyncConnectionPool):
+        self.redis_client = AsyncRedis(connection_pool=connection_pool)
+        self.key_ttl: int = 21600
+        self.history_max_length: int = int(
+            os.getenv("CONVERSATION_HISTORY_MAX_LENGTH", "100")
+        )
+
+    async def set_key(self, key_name: str, key_value: str):
+        await self.redis_client.set(key_name, key_value, ex=self.key_ttl)
+
+    async def set_conversation_messages(
+        self, conversation_id: str, messages: ConversationMessages
+    ):
+        key_value: str = messages.model_dump_json()
+        await self.set_key(conversation_id, key_value)
+
+    async def get_conversation_messages(
+        self, conversation_id: str
+    ) -> ConversationMessages | None:
+        value: str | None = await self.redis_client.get(conversation_id)
+        if value is None:
+            return None
+        return ConversationMessages.model_validate_json(value)
+
+    async def append_conversation_message(
+        self, conversation_id: str, message: ConversationMessage
+    ):
+        key_name: str = "conv_messages:" + conversation_id
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key_name, message.model_dump_json())
+            pipe.ltrim(key_name, -self.history_max_length, -1)
+            pipe.expire(key_name, self.key_ttl)
+            await pipe.execute()
+
+    async def reset_conversation_messages(
+        self, conversation_id: str, message: ConversationMessage
+    ):
+        key_name: str = "conv_messages:" + conversation_id
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(key_name)
+            pipe.rpush(key_name, message.model_dump_json())
+            pipe.expire(key_name, self.key_ttl)
+            await pipe.execute()
+
+    async def get_last_conversation_messages(
+        self, conversation_id: str, limit: int | None = None
+    ) -> List[ConversationMessage]:
+        start: int = 0 if limit is None else -limit
+        values: List[str] = await self.redis_client.lrange(
+            "conv_messages:" + conversation_id, start, -1
+        )
+        return [ConversationMessage.model_validate_json(value) for value in values]
+
+    async def get_conversation_state(
+        self, conversation_id: str, history_limit: int = 0
+    ) -> ConversationState:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.mget(
+                "conv_status:" + conversation_id,
+                conversation_id,
+                "conv_analys:" + conversation_id,
+                "conv_analysis_status:" + conversation_id,
+            )
+            if history_limit > 0:
+                pipe.lrange("conv_messages:" + conversation_id, -history_limit, -1)
+            results: List = await pipe.execute()
+        status, language, context_analysis, analysis_status = results[0]
+        messages: List[ConversationMessage] = []
+        if history_limit > 0:
+            messages = [
+                ConversationMessage.model_validate_json(value) for value in results[1]
+            ]
+        return ConversationState(
+            conversation_id=conversation_id,
+            status=status,
+            language=language,
+            context_analysis=context_analysis,
+            analysis_status=analysis_status,
+            messages=messages,
+        )
+
+    async def save_conversation_state(
+        self,
+        conversation_id: str,
+        status: str | None = None,
+        language: str | None = None,
+        context_analysis: str | None = None,
+        message: ConversationMessage | None = None,
+        analysis_status: str | None = None,
+    ):
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            if status is not None:
+                pipe.set("conv_status:" + conversation_id, status, ex=self.key_ttl)
+            if language is not None:
+                pipe.set(conversation_id, language, ex=self.key_ttl)
+            if context_analysis is not None:
+                pipe.set(
+                    "conv_analys:" + conversation_id, context_analysis, ex=self.key_ttl
+                )
+            if analysis_status is not None:
+                pipe.set(
+                    "conv_analysis_status:" + conversation_id,
+                    analysis_status,
+                    ex=self.key_ttl,
+                )
+            if message is not None:
+                key_name: str = "conv_messages:" + conversation_id
+                pipe.rpush(key_name, message.model_dump_json())
+                pipe.ltrim(key_name, -self.history_max_length, -1)
+                pipe.expire(key_name, self.key_ttl)
+            await pipe.execute()
+
+    async def replace_context_analysis(
+        self, conversation_id: str, expected: str | None, context_analysis: str
+    ) -> bool:
+        key_name: str = "conv_analys:" + conversation_id
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key_name)
+                current: str | None = await pipe.get(key_name)
+                if current != expected:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(key_name, context_analysis, ex=self.key_ttl)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def save_deferred_batch(self, batch_id: str, requests: Dict):
+        await self.redis_client.hset("deferred_batches", batch_id, json.dumps(requests))
+
+    async def get_deferred_batches(self) -> Dict[str, Dict]:
+        batches: Dict[str, str] = await self.redis_client.hgetall("deferred_batches")
+        return {batch_id: json.loads(requests) for batch_id, requests in batches.items()}
+
+    async def claim_deferred_batch(self, batch_id: str) -> bool:
+        # only the pod that removes the batch writes its results back
+        removed: int = await self.redis_client.hdel("deferred_batches", batch_id)
+        return removed == 1
+
+    async def delete_conversation_messages(self, conversation_id: str):
+        await self.redis_client.delete("conv_messages:" + conversation_id)
+
+    async def set_conversation_context(
+        self, conversation_id: str, conversation_context: ConversationContext
+    ):
+        key_value = conversation_context.model_dump_json()
+        await self.set_key("conversation_context:" + conversation_id, key_value)
+
+    async def get_conversation_context(
+        self, conversation_id: str
+    ) -> ConversationContext | None:
+        value: str | None = await self.redis_client.get(
+            "conversation_context:" + conversation_id
+        )
+        if value is None:
+            return None
+        return ConversationContext.model_validate_json(value)
+
+    async def delete_conversation(self, conversation_id: str):
+        await self.redis_client.delete(conversation_id)
+
+    async def set_conversation_language(self, conversation_id: str, language: str):
+        await self.set_key(conversation_id, language)
+
+    async def get_conversation_language(self, conversation_id: str) -> str | None:
+        language: str | None = await self.redis_client.get(conversation_id)
+        return language
+
+    async def set_conversation_analis(self, conversation_id: str, analys: str):
+        await self.set_key(conversation_id, analys)
+
+    async def get_conversation_analis(self, conversation_id: str) -> str | None:
+        analis: str | None = await self.redis_client.get(conversation_id)
+        return analis
+
+    async def set_conversation_status(self, conversation_d: str, status: str):
+        await self.set_key("conv_status:" + conversation_d, status)
+
+    async def get_conversation_status(self, conversation_id: str) -> str | None:
+        status: str | None = await self.redis_client.get(
+            "conv_status:" + conversation_id
+        )
+        return status
+
+    async def close(self):
+        await self.redis_client.aclose()
@@ -0,0 +1,81 @@
+import asyncio
+import gc
+import logging
+import os
+import psutil
+from dotenv import load_dotenv
+from prometheus_metricks.metricks import (
+    APP_MEMORY_USAGE,
+    APP_CPU_PERCENT,
+    APP_OPEN_FDS,
+    APP_THREADS,
+    APP_GC_OBJECTS,
+    APP_GC_COLLECTIONS,
+    EVENT_LOOP_LAG,
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class ResourceMonitorService:
+    def __init__(self):
+        self.sample_interval: float = float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "5"))
+        self.lag_probe_interval: float = float(os.getenv("EVENT_LOOP_LAG_PROBE_INTERVAL", "0.25"))
+        self.process = psutil.Process()
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.task is not None:
+            return
+        # the first cpu_percent call only sets the baseline
+        self.process.cpu_percent(None)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        max_lag: float = 0.0
+        next_sample_at: float = loop.time()
+        while True:
+            started_at: float = loop.time()
+            await asyncio.sleep(self.lag_probe_interval)
+            # anything past the requested sleep is time the loop was busy elsewhere
+            max_lag = max(max_lag, loop.time() - started_at - self.lag_probe_interval)
+            if loop.time() < next_sample_at:
+                continue
+            EVENT_LOOP_LAG.labels(pod_name=self.pod_name).set(max_lag)
+            max_lag = 0.0
+            try:
+                self.sample()
+            except psutil.Error as e:
+                logger.warning(f"resource sampling failed: {e}")
+            next_sample_at = loop.time() + self.sample_interval
+
+    def sample(self):
+        with self.process.oneshot():
+            memory_mb: float = self.process.memory_info().rss / (1024 * 1024)
+            cpu_percent: float = self.process.cpu_percent(None)
+            threads: int = self.process.num_threads()
+            # num_fds only exists on posix
+            open_fds: int | None = (
+                self.process.num_fds() if hasattr(self.process, "num_fds") else None
+            )
+        APP_MEMORY_USAGE.labels(pod_name=self.pod_name).set(memory_mb)
+        APP_CPU_PERCENT.labels(pod_name=self.pod_name).set(cpu_percent)
+        APP_THREADS.labels(pod_name=self.pod_name).set(threads)
+        if open_fds is not None:
+            APP_OPEN_FDS.labels(pod_name=self.pod_name).set(open_fds)
+        for generation, objects in enumerate(gc.get_count()):
+            APP_GC_OBJECTS.labels(pod_name=self.pod_name, generation=str(generation)).set(objects)
+        for generation, stats in enumerate(gc.get_stats()):
+            APP_GC_COLLECTIONS.labels(
+                pod_name=self.pod_name, generation=str(generation)
+            ).set(stats["collections"])
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+import os
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict
+from dotenv import load_dotenv
+from redis.asyncio import Redis as AsyncRedis, ConnectionPool as AsyncConnectionPool
+from redis.exceptions import RedisError
+from prometheus_metricks.metricks import TRANSLATION_CACHE_REQUESTS
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class TranslationCacheService:
+    def __init__(self, connection_pool: AsyncConnectionPool, redis_client=None):
+        self.redis_client = redis_client or AsyncRedis(connection_pool=connection_pool)
+        self.memory_size: int = int(os.getenv("TRANSLATION_CACHE_MEMORY_SIZE", "2048"))
+        self.ttl: int = int(os.getenv("TRANSLATION_CACHE_TTL", "604800"))
+        self.memory_cache: OrderedDict[str, str] = OrderedDict()
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @staticmethod
+    def prompt_version(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    def make_key(
+        self, message: str, target_language: str, prompt_version: str, model: str
+    ) -> str:
+        raw_key: str = "\x1f".join(
+            [self.normalize_text(message), target_language, prompt_version, model]
+        )
+        return "translation:" + hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    async def get_or_translate(
+        self,
+        message: str,
+        target_language: str,
+        prompt_version: str,
+        model: str,
+        translate: Callable[[], Awaitable[str]],
+    ) -> str:
+        key: str = self.make_key(message, target_language, prompt_version, model)
+        value: str | None = self.memory_cache.get(key)
+        if value is not None:
+            self.memory_cache.move_to_end(key)
+            TRANSLATION_CACHE_REQUESTS.labels(pod_name=self.pod_name, result="memory_hit").inc()
+            return value
+
+        # identical messages arriving together share one llm call
+        pending: asyncio.Future | None = self.in_flight.get(key)
+        while pending is not None:
+            TRANSLATION_CACHE_REQUESTS.labels(pod_name=self.pod_name, result="coalesced").inc()
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # only the owner was cancelled, this caller takes over the key
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            pending = self.in_flight.get(key)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            value = await self.get_from_redis(key)
+            if value is not None:
+                TRANSLATION_CACHE_REQUESTS.labels(pod_name=self.pod_name, result="redis_hit").inc()
+            else:
+                TRANSLATION_CACHE_REQUESTS.labels(pod_name=self.pod_name, result="miss").inc()
+                value = await translate()
+                await self.set_to_redis(key, value)
+            self.set_to_memory(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # consumed here so an unawaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+    def set_to_memory(self, key: str, value: str):
+        self.memory_cache[key] = value
+        self.memory_cache.move_to_end(key)
+        while len(self.memory_cache) > self.memory_size:
+            self.memory_cache.popitem(last=False)
+
+    async def get_from_redis(self, key: str) -> str | None:
+        try:
+            return await self.redis_client.get(key)
+        except RedisError as redis_error:
+            logger.warning(f"translation cache read failed: {redis_error}")
+            return None
+
+    async def set_to_redis(self, key: str, value: str):
+        try:
+            await self.redis_client.set(key, value, ex=self.ttl)
+        except RedisError as redis_error:
+            logger.warning(f"translation cache write failed: {redis_error}")
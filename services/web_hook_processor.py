@@ -1,4 +1,5 @@
-from typing import Dict
+import asyncio
+from typing import Dict, Tuple
 from services.mongodb_service import MongodbService
 from services.openai_api_service import OpenAIService
 from bs4 import BeautifulSoup
@@ -12,21 +13,38 @@ from models.models import (
     ConversationMessages,
     RequestInfo,
     ConversationContext,
+    ConversationState,
+    ModelRoute,
 )
 from models.custom_exceptions import APPException
 from tasks import mongodb_task_async, translate_message_for_admin_bengali
 import datetime
 from services.conversation_parts_service import ConversationPartsService
-from services.redis_cache_service import MessagesCache
+from services.redis_cache_service import AsyncMessagesCache
 from services.openai_translator_service import OpenAITranslatorService
 from typing import List
 from aiohttp.client_exceptions import ClientResponseError
 from openai._exceptions import OpenAIError
 from redis.exceptions import RedisError
 from services.es_service import ESService
+from services.hedging_service import HedgedAnalyzerService
+from services.incremental_json_parser import FieldCallback
+from services.model_router_service import ModelRouterService
+from services.context_compaction_service import ContextCompactionService
+from services.deferred_analysis_service import DeferredAnalysisService
+from services.language_classifier import language_label
 import time
 import os
-from prometheus_metricks.metricks import USER_REPLIED_DURATION, ADMIN_NOTED_DURATION, USER_CREATED_DURATION
+from prometheus_metricks.metricks import (
+    USER_REPLIED_DURATION,
+    ADMIN_NOTED_DURATION,
+    USER_CREATED_DURATION,
+    LANGUAGE_DETECTION_COUNT,
+    USER_REPLIED_PIPELINE_DURATION,
+    SPECULATIVE_ANALYSIS_COUNT,
+)
+
+ANALYZED_LANGUAGES: List[str] = ["Hindi", "Hinglish", "Bengali"]
 
 
 class WebHookProcessor:
@@ -37,10 +55,14 @@ class WebHookProcessor:
             openai_service: OpenAIService,
             intercom_service: IntercomAPIService,
             conversation_parts_service: ConversationPartsService,
-            messages_cache_service: MessagesCache,
+            messages_cache_service: AsyncMessagesCache,
             translations_service: OpenAITranslatorService,
             es_service: ESService,
             claude_ai_service: ClaudeService,
+            hedged_analyzer_service: HedgedAnalyzerService,
+            model_router_service: ModelRouterService,
+            context_compaction_service: ContextCompactionService,
+            deferred_analysis_service: DeferredAnalysisService,
     ):
         self.mongo_db_service = mongo_db_service
         self.openai_service = openai_service
@@ -50,26 +72,31 @@ class WebHookProcessor:
         self.translations_service = translations_service
         self.es_service = es_service
         self.claude_ai_service = claude_ai_service
+        self.hedged_analyzer_service = hedged_analyzer_service
+        self.model_router_service = model_router_service
+        self.context_compaction_service = context_compaction_service
+        self.deferred_analysis_service = deferred_analysis_service
+        self.user_replied_analyzer_mode: str = os.getenv(
+            "USER_REPLIED_ANALYZER_MODE", "two_step"
+        )
+        self.streaming_enabled: bool = (
+            os.getenv("USER_REPLIED_STREAMING_ENABLED", "false") == "true"
+        )
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
 
     async def process_message(self, topic: str, message: Dict):
         conversation_id: str = message.get("data", {}).get("item", {}).get("id", "")
-        conv_status: str | None = self.messages_cache_service.get_conversation_status(
-            conversation_id=conversation_id
-        )
 
         if topic == "conversation.user.created":
             start_time = time.time()
 
             # await self.handle_conversation_user_created_v2(data=message)
 
-            await self.set_conversation_status(
-                conversation_id=conversation_id, status="stoped"
-            )
             # conv_context: ConversationContext = ConversationContext(last_user_message='', current_context_analys='')
             # self.messages_cache_service.set_conversation_context(conversation_id=conversation_id,
             #                                                      conversation_context=conv_context)
-            self.messages_cache_service.set_conversation_analis(
-                "conv_analys:" + conversation_id, analys=''
+            await self.messages_cache_service.save_conversation_state(
+                conversation_id=conversation_id, status="stoped", context_analysis=""
             )
             USER_CREATED_DURATION.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).observe(
                 time.time() - start_time)
@@ -77,10 +104,17 @@ class WebHookProcessor:
             return
 
         elif topic == "conversation.user.replied":
-            if conv_status == "stoped":
+            conv_state: ConversationState = (
+                await self.messages_cache_service.get_conversation_state(
+                    conversation_id=conversation_id
+                )
+            )
+            if conv_state.status == "stoped":
                 return
             start_time = time.time()
-            await self.handle_conversation_user_replied_v3(data=message)
+            await self.handle_conversation_user_replied_v3(
+                data=message, conv_state=conv_state
+            )
             USER_REPLIED_DURATION.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).observe(
                 time.time() - start_time)
             return
@@ -91,7 +125,14 @@ class WebHookProcessor:
 
         elif topic == "conversation.admin.noted":
             start_time = time.time()
-            await self.handle_conversation_admin_noted_v3(data=message)
+            conv_state: ConversationState = (
+                await self.messages_cache_service.get_conversation_state(
+                    conversation_id=conversation_id
+                )
+            )
+            await self.handle_conversation_admin_noted_v3(
+                data=message, conv_state=conv_state
+            )
             ADMIN_NOTED_DURATION.labels(pod_name=os.environ.get('HOSTNAME', 'unknown')).observe(
                 time.time() - start_time)
             return
@@ -108,20 +149,26 @@ class WebHookProcessor:
 
     async def handle_conversation_admin_closed(self, data: Dict):
         conversation_id: str = data.get("data", {}).get("item", {}).get("id", "")
-        self.messages_cache_service.delete_conversation(conversation_id=conversation_id)
-        self.messages_cache_service.delete_conversation(
+        await self.messages_cache_service.delete_conversation(conversation_id=conversation_id)
+        await self.messages_cache_service.delete_conversation(
             conversation_id="conv:" + conversation_id
         )
-        self.messages_cache_service.delete_conversation(
+        await self.messages_cache_service.delete_conversation(
             "conv_status:" + conversation_id
         )
+        await self.messages_cache_service.delete_conversation(
+            "conv_analysis_status:" + conversation_id
+        )
+        await self.messages_cache_service.delete_conversation_messages(
+            conversation_id=conversation_id
+        )
 
     async def handle_conversation_user_created_v3(self, data: Dict):
         try:
             start_time = time.perf_counter()
             print("conversation.user.created")
             conversation_id: str = data.get("data", {}).get("item", {}).get("id", "")
-            self.intercom_service.attach_admin_to_conversation(
+            await self.intercom_service.attach_admin_to_conversation_async(
                 conversation_id=conversation_id, admin_id=8028082
             )
             user_data: Dict = data.get("data", {}).get("item", {}).get("source", {})
@@ -132,7 +179,7 @@ class WebHookProcessor:
             user: User = User(id=user_id, email=user_email, type="user")
             admin_id = "8024055"
             message_language: str = (
-                await self.translations_service.detect_language_async_v2(
+                await self.translations_service.detect_language_async_v3(
                     message=clean_message
                 )
             )
@@ -148,7 +195,7 @@ class WebHookProcessor:
             #     conversation_id=conversation_id, message=message
             # )
             if message_language == "English":
-                self.messages_cache_service.set_conversation_language(
+                await self.messages_cache_service.set_conversation_language(
                     conversation_id=conversation_id, language=message_language
                 )
                 conv_message.translated_en = clean_message
@@ -162,7 +209,7 @@ class WebHookProcessor:
                 )
 
             if message_language in ["Hindi", "Hinglish", "Bengali"]:
-                self.messages_cache_service.set_conversation_language(
+                await self.messages_cache_service.set_conversation_language(
                     conversation_id=conversation_id, language=message_language
                 )
                 analyzed_user_message: UserMessage = (
@@ -425,9 +472,8 @@ class WebHookProcessor:
     async def save_first_message_to_cache(
             self, conversation_id: str, message: ConversationMessage
     ):
-        messages: ConversationMessages = ConversationMessages(messages=[message])
-        self.messages_cache_service.set_conversation_messages(
-            conversation_id="conv:" + conversation_id, messages=messages
+        await self.messages_cache_service.reset_conversation_messages(
+            conversation_id=conversation_id, message=message
         )
 
     async def save_first_message_to_cache_2(
@@ -439,33 +485,19 @@ class WebHookProcessor:
         translated_message: str = analyzed_message.translated_text
         if analyzed_message.status == "no_error":
             message.translated_en = translated_message
-            messages: ConversationMessages = ConversationMessages(messages=[message])
-            self.messages_cache_service.set_conversation_messages(
-                conversation_id="conv:" + conversation_id, messages=messages
+            await self.messages_cache_service.reset_conversation_messages(
+                conversation_id=conversation_id, message=message
             )
 
     async def save_message_to_cache(
             self, conversation_id: str, message: ConversationMessage
     ):
-        all_conversation_messages = (
-            self.messages_cache_service.get_conversation_messages(
-                conversation_id="conv:" + conversation_id
-            )
-        )
-        if all_conversation_messages == None:
-            await self.save_first_message_to_cache(
-                conversation_id=conversation_id, message=message
-            )
-            return
-
-        all_conversation_messages.messages.append(message)
-        self.messages_cache_service.set_conversation_messages(
-            conversation_id="conv:" + conversation_id,
-            messages=all_conversation_messages,
+        await self.messages_cache_service.append_conversation_message(
+            conversation_id=conversation_id, message=message
         )
 
     async def set_conversation_status(self, conversation_id: str, status: str):
-        self.messages_cache_service.set_conversation_status(
+        await self.messages_cache_service.set_conversation_status(
             conversation_d=conversation_id, status=status
         )
 
@@ -488,7 +520,7 @@ class WebHookProcessor:
             )
         )
         message_language_code: str = analyzed_message.language
-        self.messages_cache_service.set_conversation_language(
+        await self.messages_cache_service.set_conversation_language(
             conversation_id=conversation_id, language=message_language_code
         )
 
@@ -565,7 +597,114 @@ class WebHookProcessor:
 
                 return
 
-    async def handle_conversation_user_replied_v3(self, data: Dict):
+    async def detect_and_analyze_user_message(
+            self,
+            message: str,
+            current_analys: str,
+            on_field: FieldCallback | None = None,
+            route: ModelRoute | None = None,
+    ) -> Tuple[str, UserMessage | None]:
+        if self.user_replied_analyzer_mode == "fused":
+            local_language: str | None = self.translations_service.detect_language_locally(
+                message
+            )
+            if local_language == "English":
+                return local_language, None
+            # one call returns the language together with the analysis
+            analyzed_message: UserMessage = await self.openai_service.analyze_message_fused(
+                message=message, analys=current_analys, route=route
+            )
+            if local_language is not None:
+                return local_language, analyzed_message
+            if analyzed_message is None:
+                return "Uncertain", None
+            message_language: str = analyzed_message.language or "Uncertain"
+            LANGUAGE_DETECTION_COUNT.labels(
+                pod_name=self.pod_name,
+                source="fused",
+                language=language_label(message_language),
+            ).inc()
+            return message_language, analyzed_message
+
+        if self.user_replied_analyzer_mode == "speculative":
+            return await self.detect_and_analyze_speculatively(
+                message=message,
+                current_analys=current_analys,
+                on_field=on_field,
+                route=route,
+            )
+
+        message_language: str = await self.translations_service.detect_language_async_v3(
+            message=message
+        )
+        if message_language not in ANALYZED_LANGUAGES:
+            return message_language, None
+        analyzed_message: UserMessage = (
+            await self.hedged_analyzer_service.analyze_user_message(
+                message=message,
+                analys=current_analys,
+                event_type="conversation.user.replied",
+                on_field=on_field,
+                route=route,
+            )
+        )
+        return message_language, analyzed_message
+
+    async def detect_and_analyze_speculatively(
+            self,
+            message: str,
+            current_analys: str,
+            on_field: FieldCallback | None = None,
+            route: ModelRoute | None = None,
+    ) -> Tuple[str, UserMessage | None]:
+        local_language: str | None = self.translations_service.detect_language_locally(
+            message
+        )
+        if local_language is not None:
+            if local_language not in ANALYZED_LANGUAGES:
+                return local_language, None
+            analyzed_message: UserMessage = (
+                await self.hedged_analyzer_service.analyze_user_message(
+                    message=message,
+                    analys=current_analys,
+                    event_type="conversation.user.replied",
+                    on_field=on_field,
+                    route=route,
+                )
+            )
+            return local_language, analyzed_message
+
+        # analysis starts before the language is known and is dropped for english
+        analysis_task: asyncio.Task = asyncio.create_task(
+            self.hedged_analyzer_service.analyze_user_message(
+                message=message,
+                analys=current_analys,
+                event_type="conversation.user.replied",
+                route=route,
+            )
+        )
+        analysis_task.add_done_callback(
+            lambda task: task.cancelled() or task.exception()
+        )
+        try:
+            message_language: str = (
+                await self.translations_service.detect_language_remotely(message)
+            )
+        except BaseException:
+            analysis_task.cancel()
+            raise
+        if message_language not in ANALYZED_LANGUAGES:
+            analysis_task.cancel()
+            SPECULATIVE_ANALYSIS_COUNT.labels(
+                pod_name=self.pod_name, result="discarded"
+            ).inc()
+            return message_language, None
+        SPECULATIVE_ANALYSIS_COUNT.labels(pod_name=self.pod_name, result="used").inc()
+        return message_language, await analysis_task
+
+    async def handle_conversation_user_replied_v3(
+            self, data: Dict, conv_state: ConversationState | None = None
+    ):
         try:
 
             start_time = time.perf_counter()
@@ -579,13 +718,61 @@ class WebHookProcessor:
             user_id: str = user_reply.get("author", {}).get("id", "")
             admin_id: str = "4687718"
             conversation_id: str = data["data"]["item"]["id"]
-            start_detect = time.perf_counter()
-            message_language: str = (
-                await self.translations_service.detect_language_async_v2(
-                    message=clean_message
+            if conv_state is None:
+                conv_state = await self.messages_cache_service.get_conversation_state(
+                    conversation_id=conversation_id
+                )
+            # what the early note said, compared with the final analysis below
+            early_note: Dict = {"posted": False, "status": None, "translated_text": None}
+            early_posts: List[asyncio.Task] = []
+
+            # the note only needs the translation, so it goes out while the
+            # model is still writing context_analysis
+            async def post_translation_note(field: str, fields: Dict[str, str]):
+                status: str | None = fields.get("status")
+                if early_note["posted"] or status not in ["no_error", "error_fixed"]:
+                    return
+                if "translated_text" not in fields:
+                    return
+                early_note["posted"] = True
+                early_note["status"] = status
+                early_note["translated_text"] = fields["translated_text"]
+                original_text: str = clean_message
+                if status == "error_fixed":
+                    original_text = fields.get("original_text", clean_message)
+                post: asyncio.Task = asyncio.create_task(
+                    self.intercom_service.add_admin_note_to_conversation_async(
+                        conversation_id=conversation_id,
+                        admin_id=admin_id,
+                        note="original:" + original_text + "\n\n" + fields["translated_text"],
+                    )
                 )
+                early_posts.append(post)
+                # the hedge loser gets cancelled, the note it started may already
+                # be sent so the post itself keeps running
+                try:
+                    await asyncio.shield(post)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    early_note["posted"] = False
+                    raise
+                print(f"user.replied(early note):{time.perf_counter() - start_time}")
+
+            start_detect = time.perf_counter()
+            message_language, analyzed_message = await self.detect_and_analyze_user_message(
+                message=clean_message,
+                current_analys=conv_state.context_analysis or "",
+                on_field=post_translation_note if self.streaming_enabled else None,
+                route=self.model_router_service.route(
+                    message=clean_message, last_status=conv_state.analysis_status
+                ),
             )
             print(time.perf_counter() - start_detect)
+            if early_posts:
+                # settle a shielded early note before deciding whether to post it below
+                results: List = await asyncio.gather(*early_posts, return_exceptions=True)
+                early_note["posted"] = not isinstance(results[-1], BaseException)
             user: User = User(id=user_id, email=user_email, type="user")
             conv_message: ConversationMessage = ConversationMessage(
                 conversation_id=conversation_id,
@@ -599,12 +786,11 @@ class WebHookProcessor:
             #     conversation_id=conversation_id, message=message
             # )
             if message_language == "English":
-                self.messages_cache_service.set_conversation_language(
-                    conversation_id=conversation_id, language=message_language
-                )
                 conv_message.translated_en = clean_message
-                await self.save_message_to_cache(
-                    conversation_id=conversation_id, message=conv_message
+                await self.messages_cache_service.save_conversation_state(
+                    conversation_id=conversation_id,
+                    language=message_language,
+                    message=conv_message,
                 )
 
                 await self.save_request_info(
@@ -613,37 +799,33 @@ class WebHookProcessor:
                     event_type="conversation.user.replied(english)",
                 )
 
-            if message_language in ["Hindi", "Hinglish", "Bengali"]:
-                self.messages_cache_service.set_conversation_language(
-                    conversation_id=conversation_id, language=message_language
-                )
-
-                current_analys: str = self.messages_cache_service.get_conversation_analis(
-                    "conv_analys:" + conversation_id
-                )
+            if message_language in ANALYZED_LANGUAGES:
                 # conv_context: ConversationContext = self.messages_cache_service.get_conversation_context(
                 #     conversation_id=conversation_id)
-                analyzed_message: UserMessage = (
-                    await self.openai_service.analyze_message_with_correction_v4(
-                        message=clean_message, analys=current_analys
-                    )
-                )
 
                 # self.messages_cache_service.set_conversation_context(conversation_id=conversation_id,
                 #                                                      conversation_context=conv_context)
-                self.messages_cache_service.set_conversation_analis(
-                    conversation_id="conv_analys:" + conversation_id,
-                    analys=analyzed_message.context_analysis,
-                )
-
                 conv_message.translated_en = analyzed_message.translated_text
-                await self.save_message_to_cache(
-                    conversation_id=conversation_id, message=conv_message
+                await self.messages_cache_service.save_conversation_state(
+                    conversation_id=conversation_id,
+                    language=message_language,
+                    context_analysis=analyzed_message.context_analysis,
+                    message=conv_message,
+                    analysis_status=analyzed_message.status,
                 )
-                if analyzed_message.status == "no_error":
+                # a hedge that won after the early note can disagree with it, the
+                # agent then gets a correction instead of a second plain note
+                note_is_current: bool = (
+                        early_note["posted"]
+                        and early_note["status"] == analyzed_message.status
+                        and early_note["translated_text"] == analyzed_message.translated_text
+                )
+                note_prefix: str = "correction:\n" if early_note["posted"] else ""
+                if analyzed_message.status == "no_error" and not note_is_current:
                     if message_language != "English":
                         note_for_admin: str = (
-                                "original:"
+                                note_prefix
+                                + "original:"
                                 + clean_message
                                 + "\n\n"
                                 + analyzed_message.translated_text
@@ -666,10 +848,11 @@ class WebHookProcessor:
                         #     execution_time=time.perf_counter() - start_time,
                         #     event_type="conversation.user.replied",
                         # )
-                if analyzed_message.status == "error_fixed":
+                if analyzed_message.status == "error_fixed" and not note_is_current:
                     corrected_message: str = analyzed_message.corrected_text
                     note_for_admin: str = (
-                            "original:"
+                            note_prefix
+                            + "original:"
                             + analyzed_message.original_text
                             + "\n\n"
                             + analyzed_message.translated_text
@@ -696,7 +879,11 @@ class WebHookProcessor:
                 if analyzed_message.status == "uncertain":
                     note: str = await self.create_admin_note(analyzed_message)
                     note_for_admin: str = (
-                            "original:" + analyzed_message.original_text + "\n\n" + note
+                            note_prefix
+                            + "original:"
+                            + analyzed_message.original_text
+                            + "\n\n"
+                            + note
                     )
                     note_time = time.perf_counter()
                     await self.intercom_service.add_admin_note_to_conversation_async(
@@ -718,6 +905,16 @@ class WebHookProcessor:
                     #     execution_time=time.perf_counter() - start_time,
                     #     event_type="conversation.user.replied",
                     # )
+            if message_language in ANALYZED_LANGUAGES and analyzed_message is not None:
+                await self.context_compaction_service.compact(
+                    conversation_id=conversation_id,
+                    context_analysis=analyzed_message.context_analysis,
+                )
+            USER_REPLIED_PIPELINE_DURATION.labels(
+                pod_name=self.pod_name,
+                mode=self.user_replied_analyzer_mode,
+                language=language_label(message_language),
+            ).observe(time.perf_counter() - start_time)
             return
         except ClientResponseError as client_response_error:
             full_exception_name = f"{type(client_response_error).__module__}.{type(client_response_error).__name__}"
@@ -776,7 +973,7 @@ class WebHookProcessor:
             )
         )
         message_language_code: str = analyzed_message.language
-        self.messages_cache_service.set_conversation_language(
+        await self.messages_cache_service.set_conversation_language(
             conversation_id=conversation_id, language=message_language_code
         )
         # message: ConversationMessage = ConversationMessage(
@@ -854,7 +1051,9 @@ class WebHookProcessor:
 
         print("conversation.admin.replied")
 
-    async def handle_conversation_admin_noted_v3(self, data: Dict):
+    async def handle_conversation_admin_noted_v3(
+            self, data: Dict, conv_state: ConversationState | None = None
+    ):
         try:
 
             start_time = time.perf_counter()
@@ -867,17 +1066,13 @@ class WebHookProcessor:
             clean_message: str = BeautifulSoup(message, "html.parser").getText()
             admin_id: str = admin_note.get("author", {}).get("id", "")
             conversation_id: str = data["data"]["item"]["id"]
-            conv_status: str | None = (
-                self.messages_cache_service.get_conversation_status(
+            if conv_state is None:
+                conv_state = await self.messages_cache_service.get_conversation_state(
                     conversation_id=conversation_id
                 )
-            )
+            conv_status: str | None = conv_state.status
             is_note_for_reply: bool = clean_message.startswith("!")
-            conversation_language: str | None = (
-                self.messages_cache_service.get_conversation_language(
-                    conversation_id=conversation_id
-                )
-            )
+            conversation_language: str | None = conv_state.language
             if clean_message == "!force stop" or clean_message == "!force start":
                 status: str = ""
                 if clean_message == "!force stop":
@@ -912,6 +1107,7 @@ class WebHookProcessor:
                     target_language=conversation_language,
                     message=clean_message,
                     user=user,
+                    current_analys=conv_state.context_analysis,
                 )
                 await self.save_request_info(
                     status="ok",
@@ -964,6 +1160,7 @@ class WebHookProcessor:
             admin_id: str,
             message: str,
             target_language: str,
+            current_analys: str | None = None,
     ):
         if target_language == None:
             return
@@ -975,16 +1172,21 @@ class WebHookProcessor:
             language="English",
             message_type="conversation.admin.noted",
         )
-        current_analys: str = self.messages_cache_service.get_conversation_analis(
-            conversation_id='conv_analys:' + conversation_id)
+        if current_analys is None:
+            current_analys = await self.messages_cache_service.get_conversation_analis(
+                conversation_id='conv_analys:' + conversation_id)
 
-        new_context_analys: str = await self.openai_service.analyze_agent_message(
+        # the context update is not customer visible, run it off the webhook when possible
+        new_context_analys: str | None = None
+        if not self.deferred_analysis_service.defer_agent_message(
+            conversation_id=conversation_id,
             agent_message=message,
-            context_analys=current_analys,
-
-        )
-        self.messages_cache_service.set_conversation_analis(conversation_id='conv_analys:' + conversation_id,
-                                                            analys=new_context_analys)
+            context_analysis=current_analys,
+        ):
+            new_context_analys = await self.openai_service.analyze_agent_message(
+                agent_message=message,
+                context_analys=current_analys or "",
+            )
 
         if target_language == "Hinglish":
             admin_reply_message: str = (
@@ -992,62 +1194,46 @@ class WebHookProcessor:
                     message=message
                 )
             )
-            conv_message.translated_en = admin_reply_message
-            await self.intercom_service.add_admin_message_to_conversation_async(
-                conversation_id=conversation_id,
-                admin_id=admin_id,
-                message=admin_reply_message,
-            )
-            await self.save_message_to_cache(
-                conversation_id=conversation_id, message=conv_message
-            )
-            return
         elif target_language == "Hindi":
             admin_reply_message: str = (
                 await self.translations_service.translate_message_from_english_to_hindi_async(
                     message=message
                 )
             )
-            conv_message.translated_en = admin_reply_message
-            await self.intercom_service.add_admin_message_to_conversation_async(
-                conversation_id=conversation_id,
-                admin_id=admin_id,
-                message=admin_reply_message,
-            )
-            await self.save_message_to_cache(
-                conversation_id=conversation_id, message=conv_message
-            )
-            return
         elif target_language == "Bengali":
             admin_reply_message: str = (
                 await self.translations_service.translate_message_from_english_to_bengali_async(
                     message=message
                 )
             )
-            conv_message.translated_en = admin_reply_message
-            await self.intercom_service.add_admin_message_to_conversation_async(
-                conversation_id=conversation_id,
-                admin_id=admin_id,
-                message=admin_reply_message,
-            )
-            await self.save_message_to_cache(
-                conversation_id=conversation_id, message=conv_message
-            )
-            return
         elif target_language == "English":
-            await self.intercom_service.add_admin_message_to_conversation_async(
-                conversation_id=conversation_id,
-                admin_id=admin_id,
-                message=message,
-            )
-            conv_message.translated_en = message
-            await self.save_message_to_cache(
-                conversation_id=conversation_id, message=conv_message
-            )
-            return
+            admin_reply_message: str = message
         else:
+            if new_context_analys is not None:
+                await self.messages_cache_service.save_conversation_state(
+                    conversation_id=conversation_id, context_analysis=new_context_analys
+                )
+                await self.context_compaction_service.compact(
+                    conversation_id=conversation_id, context_analysis=new_context_analys
+                )
             return
 
+        conv_message.translated_en = admin_reply_message
+        await self.intercom_service.add_admin_message_to_conversation_async(
+            conversation_id=conversation_id,
+            admin_id=admin_id,
+            message=admin_reply_message,
+        )
+        await self.messages_cache_service.save_conversation_state(
+            conversation_id=conversation_id,
+            context_analysis=new_context_analys,
+            message=conv_message,
+        )
+        if new_context_analys is not None:
+            await self.context_compaction_service.compact(
+                conversation_id=conversation_id, context_analysis=new_context_analys
+            )
+
     async def handle_conversation_admin_noted_v2(self, data: Dict):
         admin_translator_id: str = "8024055"
         admin_note: Dict = data["data"]["item"]["conversation_parts"][
@@ -1058,7 +1244,7 @@ class WebHookProcessor:
         admin_id: str = admin_note.get("author", {}).get("id", "")
         conversation_id: str = data["data"]["item"]["id"]
         conversation_language: str | None = (
-            self.messages_cache_service.get_conversation_language(
+            await self.messages_cache_service.get_conversation_language(
                 conversation_id=conversation_id
             )
         )
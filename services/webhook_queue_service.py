@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from models.custom_exceptions import APPException
+from models.models import RequestInfo
+from services.conversation_executor import ConversationExecutor
+from services.es_service import ESService
+from prometheus_metricks.metricks import (
+    WEBHOOK_QUEUE_DEPTH,
+    WEBHOOK_QUEUE_WAIT_TIME,
+    WEBHOOK_QUEUE_REJECTED_COUNT,
+    WEBHOOK_QUEUE_FAILED_COUNT,
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class WebHookQueueService:
+    def __init__(
+        self, conversation_executor: ConversationExecutor, es_service: ESService
+    ):
+        self.conversation_executor = conversation_executor
+        self.es_service = es_service
+        self.max_size: int = int(os.getenv("WEBHOOK_QUEUE_MAX_SIZE", "1000"))
+        self.workers_count: int = int(os.getenv("WEBHOOK_QUEUE_WORKERS", "8"))
+        self.drain_timeout: float = float(os.getenv("WEBHOOK_QUEUE_DRAIN_TIMEOUT", "25"))
+        self.pod_name: str = os.environ.get("HOSTNAME", "unknown")
+        self.queue: asyncio.Queue | None = None
+        self.workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.workers = [
+            asyncio.create_task(self.consume()) for _ in range(self.workers_count)
+        ]
+        logger.info(
+            f"webhook queue started max_size:{self.max_size} workers:{self.workers_count}"
+        )
+
+    async def stop(self):
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"webhook queue drain timeout, events left:{self.queue.qsize()}"
+            )
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def enqueue(self, topic: str, payload: Dict) -> bool:
+        if self.queue is None:
+            return False
+        item: Tuple[str, Dict, float] = (topic, payload, time.perf_counter())
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            WEBHOOK_QUEUE_REJECTED_COUNT.labels(pod_name=self.pod_name).inc()
+            return False
+        WEBHOOK_QUEUE_DEPTH.labels(pod_name=self.pod_name).set(self.queue.qsize())
+        return True
+
+    async def consume(self):
+        while True:
+            topic, payload, enqueued_at = await self.queue.get()
+            WEBHOOK_QUEUE_DEPTH.labels(pod_name=self.pod_name).set(self.queue.qsize())
+            WEBHOOK_QUEUE_WAIT_TIME.labels(pod_name=self.pod_name).observe(
+                time.perf_counter() - enqueued_at
+            )
+            try:
+                await self.conversation_executor.process_message(topic, payload)
+            except asyncio.CancelledError:
+                raise
+            except APPException as app_exception:
+                self.save_exception(app_exception)
+            except Exception as e:
+                full_exception_name = f"{type(e).__module__}.{type(e).__name__}"
+                app_exception: APPException = APPException(
+                    message=str(e),
+                    ex_class=full_exception_name,
+                    event_type=topic,
+                    params={},
+                )
+                self.save_exception(app_exception)
+            finally:
+                self.queue.task_done()
+
+    def save_exception(self, exception: APPException):
+        WEBHOOK_QUEUE_FAILED_COUNT.labels(pod_name=self.pod_name).inc()
+        logger.error(f" error:{exception.message} event_type:{exception.event_type} ")
+        request_info: RequestInfo = RequestInfo(
+            exception=exception.__dict__,
+            status="error",
+            execution_time=None,
+            event_type=exception.event_type,
+        )
+        try:
+            self.es_service.add_document(
+                index_name="requests", document=request_info.dict()
+            )
+        except Exception as e:
+            logger.error(f"failed to save exception to es: {e}")
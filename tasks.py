@@ -1,10 +1,11 @@
 from celery_app import celery_app
-from services.mongodb_service import MongodbService
+from celery.signals import worker_process_init, worker_process_shutdown
 import asyncio
 import sys
 import logging
+import threading
 from services.celery_tasks_service import CeleryTasksService
-from typing import Dict
+from typing import Any, Coroutine, Dict
 
 handler = logging.StreamHandler(sys.stdout)
 handler.setLevel(logging.DEBUG)
@@ -15,6 +16,70 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.addHandler(handler)
 
+# one loop thread and one service graph per worker process, tasks only submit
+# coroutines to it so clients, pools and the mongo batcher outlive the task
+WORKER_LOOP: asyncio.AbstractEventLoop | None = None
+WORKER_THREAD: threading.Thread | None = None
+WORKER_CONTAINER = None
+WORKER_LOCK: threading.Lock = threading.Lock()
+
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    # imported here because the container imports web_hook_processor, which imports this module
+    from di.di_container import Container
+
+    global WORKER_LOOP, WORKER_THREAD, WORKER_CONTAINER
+    with WORKER_LOCK:
+        if WORKER_LOOP is not None:
+            return
+        WORKER_LOOP = asyncio.new_event_loop()
+        WORKER_THREAD = threading.Thread(
+            target=WORKER_LOOP.run_forever, name="celery-worker-loop", daemon=True
+        )
+        WORKER_THREAD.start()
+        WORKER_CONTAINER = Container()
+    run_async(start_services())
+    logger.info("celery worker loop and services started")
+
+
+async def start_services():
+    # clients are created on the loop thread that will use them
+    await WORKER_CONTAINER.http_session_service().start()
+    WORKER_CONTAINER.celery_tasks_service()
+    await WORKER_CONTAINER.mongo_db_service().start()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker(**kwargs):
+    if WORKER_LOOP is None:
+        return
+    run_async(stop_services())
+    WORKER_LOOP.call_soon_threadsafe(WORKER_LOOP.stop)
+    WORKER_THREAD.join(timeout=10)
+
+
+async def stop_services():
+    await WORKER_CONTAINER.mongo_db_service().stop()
+    await WORKER_CONTAINER.http_session_service().close()
+
+
+def run_async(coroutine: Coroutine) -> Any:
+    # worker_process_init does not fire for the solo pool or eager tasks
+    if WORKER_LOOP is None:
+        init_worker()
+    return asyncio.run_coroutine_threadsafe(coroutine, WORKER_LOOP).result()
+
+
+def worker_container():
+    if WORKER_CONTAINER is None:
+        init_worker()
+    return WORKER_CONTAINER
+
+
+def celery_tasks_service() -> CeleryTasksService:
+    return worker_container().celery_tasks_service()
+
 
 @celery_app.task(name="mongodb_task")
 def mongodb_task(data):
@@ -26,15 +91,15 @@ def mongodb_task(data):
 
 @celery_app.task(name="mongodb_task_async")
 def mongodb_task_async(message: Dict):
-    asyncio.run(MongodbService().add_message_translated_dict(message))
+    run_async(worker_container().mongo_db_service().add_message_translated_dict(message))
 
     return f"Data Inserted"
 
 
 @celery_app.task(name="translate_message_for_admin_hindi")
 def translate_message_for_admin_hindi(message: str, admin_id: str, conversation_id: str):
-    asyncio.run(
-        CeleryTasksService().translate_message_from_hindi_to_admin(
+    run_async(
+        celery_tasks_service().translate_message_from_hindi_to_admin(
             message, admin_id=admin_id, conversation_id=conversation_id
         )
     )
@@ -45,8 +110,8 @@ def translate_message_for_admin_hindi(message: str, admin_id: str, conversation_
 def translate_message_for_admin_bengali(
         message: str, admin_id: str, conversation_id: str
 ):
-    asyncio.run(
-        CeleryTasksService().translate_message_from_bengali_to_admin(
+    run_async(
+        celery_tasks_service().translate_message_from_bengali_to_admin(
             message=message, conversation_id=conversation_id, admin_id=admin_id
         )
     )
@@ -55,6 +120,6 @@ def translate_message_for_admin_bengali(
 
 @celery_app.task(name="handle_admin_note")
 def handle_admin_note(conversation_id: str, admin_id: str, admin_note: str):
-    asyncio.run(CeleryTasksService().handle_admin_note(conversation_id=conversation_id, admin_id=admin_id,
-                                                       admin_note=admin_note))
+    run_async(celery_tasks_service().handle_admin_note(conversation_id=conversation_id, admin_id=admin_id,
+                                                      admin_note=admin_note))
     return 'admin message send'
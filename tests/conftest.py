@@ -0,0 +1,191 @@
+import asyncio
+import json
+import pytest
+from typing import Dict, List, Tuple
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.bulks: List[List[Dict]] = []
+        self.available: bool = True
+
+    async def bulk(self, operations: List[Dict]) -> Dict:
+        if not self.available:
+            raise ConnectionError("elasticsearch is down")
+        self.bulks.append(operations)
+        return {"errors": False, "items": []}
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def es_client() -> FakeElasticsearch:
+    return FakeElasticsearch()
+
+
+class FakeCollection:
+    def __init__(self, client: "FakeMongoClient"):
+        self.client = client
+
+    async def insert_many(self, documents: List[Dict], ordered: bool):
+        if not self.client.available:
+            raise ConnectionError("mongo is down")
+        self.client.inserts.append(documents)
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.inserts: List[List[Dict]] = []
+        self.available: bool = True
+
+    def get_database(self, db_name: str):
+        return self
+
+    def get_collection(self, collection_name: str) -> FakeCollection:
+        return FakeCollection(self)
+
+
+@pytest.fixture
+def mongo_client() -> FakeMongoClient:
+    return FakeMongoClient()
+
+
+class FakeOpenAIService:
+    def __init__(self):
+        self.summary: str = ""
+        self.compact_calls: int = 0
+        self.realtime_calls: int = 0
+        self.batches: Dict[str, Dict[str, Dict]] = {}
+        self.stream_delay: float = 1.0
+
+    async def compact_context_analysis(self, context_analysis: str, word_limit: int, model: str) -> str:
+        self.compact_calls += 1
+        return self.summary
+
+    async def analyze_message_with_correction_v4_stream(self, message: str, analys: str, on_field, route=None) -> str:
+        await on_field("status", {"status": "no_error"})
+        await asyncio.sleep(self.stream_delay)
+        return "primary"
+
+    async def analyze_agent_message(self, agent_message: str, context_analys: str) -> str:
+        self.realtime_calls += 1
+        return f"{context_analys} Agent: {agent_message}".strip()
+
+    def agent_message_request(self, agent_message: str, context_analys: str) -> Dict:
+        return {"agent_message": agent_message, "context_analys": context_analys}
+
+    def parse_agent_message(self, result: str) -> str:
+        return json.loads(result)["context_analysis"]
+
+    async def submit_chat_batch(self, requests: Dict[str, Dict]) -> str:
+        batch_id: str = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = requests
+        return batch_id
+
+    async def get_chat_batch_results(self, batch_id: str) -> Dict[str, str] | None:
+        return {
+            custom_id: json.dumps(
+                {"context_analysis": f"{body['context_analys']} Agent: {body['agent_message']}".strip()}
+            )
+            for custom_id, body in self.batches[batch_id].items()
+        }
+
+
+class FakeClaudeService:
+    async def analyze_message_with_context(self, message: str, analys: str) -> str:
+        return "secondary"
+
+
+class FakeMessagesCache:
+    def __init__(self):
+        self.analysis: Dict[str, str] = {}
+        self.deferred_batches: Dict[str, Dict] = {}
+
+    async def replace_context_analysis(self, conversation_id: str, expected: str | None, context_analysis: str) -> bool:
+        if self.analysis.get(conversation_id) != expected:
+            return False
+        self.analysis[conversation_id] = context_analysis
+        return True
+
+    async def get_conversation_analis(self, conversation_id: str) -> str | None:
+        return self.analysis.get(conversation_id.removeprefix("conv_analys:"))
+
+    async def save_deferred_batch(self, batch_id: str, requests: Dict):
+        self.deferred_batches[batch_id] = json.loads(json.dumps(requests))
+
+    async def get_deferred_batches(self) -> Dict[str, Dict]:
+        return dict(self.deferred_batches)
+
+    async def claim_deferred_batch(self, batch_id: str) -> bool:
+        return self.deferred_batches.pop(batch_id, None) is not None
+
+
+class FakeCompactionService:
+    async def compact(self, conversation_id: str, context_analysis: str):
+        pass
+
+
+@pytest.fixture
+def openai_service() -> FakeOpenAIService:
+    return FakeOpenAIService()
+
+
+@pytest.fixture
+def claude_service() -> FakeClaudeService:
+    return FakeClaudeService()
+
+
+@pytest.fixture
+def messages_cache() -> FakeMessagesCache:
+    return FakeMessagesCache()
+
+
+@pytest.fixture
+def compaction_service() -> FakeCompactionService:
+    return FakeCompactionService()
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.processed: List[Tuple[str, int]] = []
+
+    async def process_message(self, topic: str, message: Dict):
+        if message["number"] < 0:
+            raise ValueError("broken event")
+        await asyncio.sleep(0)
+        self.processed.append((message["data"]["item"]["id"], message["number"]))
+
+
+class FakeESService:
+    def __init__(self):
+        self.documents: List[Dict] = []
+
+    def add_document(self, index_name: str, document: Dict):
+        self.documents.append(document)
+
+
+@pytest.fixture
+def conversation_executor() -> FakeExecutor:
+    return FakeExecutor()
+
+
+@pytest.fixture
+def es_service() -> FakeESService:
+    return FakeESService()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None):
+        self.values[key] = value
+
+
+@pytest.fixture
+def redis_client() -> FakeRedis:
+    return FakeRedis()
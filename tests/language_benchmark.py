@@ -0,0 +1,32 @@
+from typing import List, Tuple
+
+# messages labeled by hand, used to measure the local classifier and the llm detector
+LABELED_MESSAGES: List[Tuple[str, str]] = [
+    ("I have not received my withdrawal yet", "English"),
+    ("Hello, my deposit is still not showing in the account", "English"),
+    ("Why is my bonus not credited? I did the deposit yesterday", "English"),
+    ("Can you please check my withdrawal status", "English"),
+    ("Thank you for the help, it is working now", "English"),
+    ("How long will it take for the money to come?", "English"),
+    ("I am waiting for 3 hours, this is very bad service", "English"),
+    ("My account is blocked, what should I do", "English"),
+    ("ok", "English"),
+    ("Bhai mera withdrawal abhi tak nahi aaya", "Hinglish"),
+    ("Meri payment mein problem hai", "Hinglish"),
+    ("Yaar mera account freeze ho gaya hai", "Hinglish"),
+    ("Kitna balance bacha hai check karo please", "Hinglish"),
+    ("mera paisa kab aayega bhai", "Hinglish"),
+    ("deposit kiya tha 2 ghante pehle abhi tak nahi aaya", "Hinglish"),
+    ("aap log jaldi karo mera bonus nahi mila", "Hinglish"),
+    ("kya hua mera withdrawal reject kyu ho gaya", "Hinglish"),
+    ("theek hai bhai thank you", "Hinglish"),
+    ("मेरा पैसा अभी तक नहीं आया", "Hindi"),
+    ("मेरी पेमेंट में प्रॉब्लम है", "Hindi"),
+    ("नमस्ते, मेरी समस्या है", "Hindi"),
+    ("मैंने 500 रुपये डिपॉजिट किए थे लेकिन बैलेंस में नहीं दिखा", "Hindi"),
+    ("मेरा withdrawal कब आएगा", "Hindi"),
+    ("আমার পেমেন্ট নিয়ে সমস্যা আছে", "Bengali"),
+    ("আমি পেমেন্ট করতে অসমর্থ।", "Bengali"),
+    ("আমার টাকা এখনো আসেনি", "Bengali"),
+    ("ডিপোজিট করেছি কিন্তু ব্যালেন্স দেখাচ্ছে না", "Bengali"),
+]
@@ -0,0 +1,42 @@
+import pytest
+from services.context_compaction_service import ContextCompactionService
+
+
+@pytest.fixture
+def service(monkeypatch, openai_service, messages_cache) -> ContextCompactionService:
+    monkeypatch.setenv("CONTEXT_COMPACTION_MODE", "sync")
+    monkeypatch.setenv("CONTEXT_COMPACTION_THRESHOLD", "10")
+    return ContextCompactionService(
+        openai_service=openai_service, messages_cache_service=messages_cache
+    )
+
+
+@pytest.mark.asyncio
+async def test_short_analysis_is_left_alone(service, openai_service, messages_cache):
+    messages_cache.analysis["1"] = "User asks about bonus."
+
+    await service.compact(conversation_id="1", context_analysis="User asks about bonus.")
+
+    assert openai_service.compact_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_long_analysis_is_replaced_with_summary(service, openai_service, messages_cache):
+    analysis: str = "User reported a missing deposit. " * 10
+    openai_service.summary = "Missing deposit, still unresolved."
+    messages_cache.analysis["1"] = analysis
+
+    await service.compact(conversation_id="1", context_analysis=analysis)
+
+    assert messages_cache.analysis["1"] == "Missing deposit, still unresolved."
+
+
+@pytest.mark.asyncio
+async def test_newer_analysis_is_not_overwritten(service, openai_service, messages_cache):
+    analysis: str = "User reported a missing deposit. " * 10
+    openai_service.summary = "Missing deposit."
+    messages_cache.analysis["1"] = "Newer analysis from the next turn."
+
+    await service.compact(conversation_id="1", context_analysis=analysis)
+
+    assert messages_cache.analysis["1"] == "Newer analysis from the next turn."
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Dict, List
+import pytest
+from services.conversation_executor import ConversationExecutor
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.events: List[str] = []
+        self.running: Dict[str, int] = {}
+        self.max_parallel: int = 0
+
+    async def process_message(self, topic: str, message: Dict):
+        conversation_id: str = message["data"]["item"]["id"]
+        self.running[conversation_id] = self.running.get(conversation_id, 0) + 1
+        assert self.running[conversation_id] == 1
+        self.max_parallel = max(self.max_parallel, sum(self.running.values()))
+        await asyncio.sleep(message["delay"])
+        self.events.append(f"{conversation_id}:{topic}")
+        self.running[conversation_id] -= 1
+
+
+def make_event(conversation_id: str, delay: float) -> Dict:
+    return {"data": {"item": {"id": conversation_id}}, "delay": delay}
+
+
+@pytest.mark.asyncio
+async def test_conversation_events_are_serialized_in_order():
+    processor = RecordingProcessor()
+    executor = ConversationExecutor(web_hook_processor=processor)
+
+    await asyncio.gather(
+        executor.process_message("conversation.user.replied", make_event("1", 0.03)),
+        executor.process_message("conversation.admin.noted", make_event("1", 0.0)),
+        executor.process_message("conversation.user.replied", make_event("2", 0.01)),
+    )
+
+    conversation_1: List[str] = [e for e in processor.events if e.startswith("1:")]
+    assert conversation_1 == [
+        "1:conversation.user.replied",
+        "1:conversation.admin.noted",
+    ]
+    assert processor.events[0] == "2:conversation.user.replied"
+    assert processor.max_parallel == 2
+    assert executor.active_conversations() == 0
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from services.deferred_analysis_service import DeferredAnalysisService
+
+
+@pytest.fixture
+def mode() -> str:
+    return "background"
+
+
+@pytest.fixture
+def service(
+    monkeypatch, mode, openai_service, messages_cache, compaction_service
+) -> DeferredAnalysisService:
+    monkeypatch.setenv("AGENT_CONTEXT_MODE", mode)
+    return DeferredAnalysisService(
+        openai_service=openai_service,
+        messages_cache_service=messages_cache,
+        context_compaction_service=compaction_service,
+    )
+
+
+@pytest.mark.parametrize("mode", ["sync"])
+@pytest.mark.asyncio
+async def test_sync_mode_does_not_defer(service):
+    await service.start()
+
+    assert not service.defer_agent_message("1", "We will check", None)
+
+
+@pytest.mark.asyncio
+async def test_background_update_is_written_back(service, messages_cache):
+    messages_cache.analysis["1"] = "User asks about bonus."
+    await service.start()
+
+    assert service.defer_agent_message("1", "We will check", "User asks about bonus.")
+    await service.stop()
+
+    assert messages_cache.analysis["1"] == "User asks about bonus. Agent: We will check"
+
+
+@pytest.mark.asyncio
+async def test_update_is_redone_on_top_of_a_newer_analysis(service, openai_service, messages_cache):
+    messages_cache.analysis["1"] = "User asks about bonus again."
+
+    await service.process(("1", "We will check", "User asks about bonus."))
+
+    assert messages_cache.analysis["1"] == "User asks about bonus again. Agent: We will check"
+    assert openai_service.realtime_calls == 2
+
+
+@pytest.mark.parametrize("mode", ["batch"])
+@pytest.mark.asyncio
+async def test_batch_results_are_written_back_once(service, openai_service, messages_cache):
+    messages_cache.analysis["1"] = "User asks about bonus."
+    await service.submit_batch([("1", "We will check", "User asks about bonus.")])
+
+    await asyncio.gather(service.collect_batches(), service.collect_batches())
+
+    assert messages_cache.analysis["1"] == "User asks about bonus. Agent: We will check"
+    assert openai_service.realtime_calls == 0
+    assert messages_cache.deferred_batches == {}
+
+
+@pytest.mark.parametrize("mode", ["batch"])
+@pytest.mark.asyncio
+async def test_stale_batch_result_is_dropped(service, openai_service, messages_cache):
+    messages_cache.analysis["1"] = "User asks about bonus."
+    await service.submit_batch([("1", "We will check", "User asks about bonus.")])
+    messages_cache.analysis["1"] = "User asks about bonus again."
+
+    await service.collect_batches()
+
+    assert messages_cache.analysis["1"] == "User asks about bonus again."
+    assert openai_service.realtime_calls == 0
@@ -0,0 +1,57 @@
+import pytest
+from services.es_service import ESService
+
+
+def test_full_buffer_drops_the_oldest_documents(monkeypatch, es_client):
+    monkeypatch.setenv("ES_BUFFER_MAX_SIZE", "3")
+    monkeypatch.setenv("ES_FLUSH_SIZE", "10")
+    service = ESService(client=es_client)
+
+    for number in range(5):
+        service.add_document(index_name="requests", document={"number": number})
+
+    assert [document["number"] for _, document in service.buffer] == [2, 3, 4]
+
+
+def test_sampling_keeps_every_error(monkeypatch, es_client):
+    monkeypatch.setenv("ES_BUFFER_MAX_SIZE", "10")
+    monkeypatch.setenv("ES_FLUSH_SIZE", "10")
+    monkeypatch.setenv("ES_OVERLOAD_POLICY", "sample")
+    monkeypatch.setenv("ES_OVERLOAD_SAMPLE_RATE", "0")
+    service = ESService(client=es_client)
+
+    for _ in range(8):
+        service.add_document(index_name="requests", document={"status": "success"})
+    service.add_document(index_name="requests", document={"status": "error"})
+
+    assert [document["status"] for _, document in service.buffer] == ["success"] * 5 + ["error"]
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_bulk_requests_of_flush_size(monkeypatch, es_client):
+    monkeypatch.setenv("ES_FLUSH_SIZE", "2")
+    service = ESService(client=es_client)
+    for number in range(3):
+        service.add_document(index_name="requests", document={"number": number})
+
+    await service.flush()
+
+    assert [len(operations) for operations in es_client.bulks] == [4, 2]
+    assert es_client.bulks[0][0] == {"index": {"_index": "requests"}}
+    assert len(service.buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_the_batch_for_the_next_flush(monkeypatch, es_client):
+    monkeypatch.setenv("ES_FLUSH_SIZE", "2")
+    service = ESService(client=es_client)
+    for number in range(3):
+        service.add_document(index_name="requests", document={"number": number})
+    es_client.available = False
+
+    await service.flush()
+
+    assert [document["number"] for _, document in service.buffer] == [0, 1, 2]
+    es_client.available = True
+    await service.flush()
+    assert [len(operations) for operations in es_client.bulks] == [4, 2]
@@ -0,0 +1,89 @@
+import asyncio
+from collections import deque
+import pytest
+from services.hedging_service import HedgedAnalyzerService
+
+
+@pytest.fixture
+def service(monkeypatch, openai_service, claude_service) -> HedgedAnalyzerService:
+    monkeypatch.setenv("LLM_HEDGE_DEFAULT_DELAY", "0.05")
+    monkeypatch.setenv("LLM_HEDGE_MIN_SAMPLES", "2")
+    return HedgedAnalyzerService(
+        openai_service=openai_service, claude_ai_service=claude_service
+    )
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(service):
+    secondary_calls = []
+
+    async def primary():
+        return "primary"
+
+    async def secondary():
+        secondary_calls.append(1)
+        return "secondary"
+
+    result = await service.run_hedged(primary, secondary, event_type="test")
+
+    assert result == "primary"
+    assert secondary_calls == []
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_to_secondary_and_is_cancelled(service):
+    primary_cancelled = asyncio.Event()
+
+    async def primary():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return "primary"
+
+    async def secondary():
+        return "secondary"
+
+    result = await service.run_hedged(primary, secondary, event_type="test")
+    await asyncio.sleep(0)
+
+    assert result == "secondary"
+    assert primary_cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_secondary(service):
+    async def primary():
+        raise RuntimeError("provider down")
+
+    async def secondary():
+        return "secondary"
+
+    result = await service.run_hedged(primary, secondary, event_type="test")
+
+    assert result == "secondary"
+
+
+@pytest.mark.asyncio
+async def test_only_the_primary_streams_fields(service):
+    fields_seen = []
+
+    async def on_field(field, fields):
+        fields_seen.append(field)
+
+    result = await service.analyze_user_message(
+        message="hola", analys="", event_type="test", on_field=on_field
+    )
+
+    assert result == "secondary"
+    assert fields_seen == ["status"]
+
+
+def test_hedge_delay_is_kept_per_route(service):
+    service.latencies["short_clear"] = deque([0.6, 0.7])
+    service.latencies["escalated"] = deque([4.0, 5.0])
+
+    assert service.hedge_delay("short_clear") == 0.7
+    assert service.hedge_delay("escalated") == 5.0
+    assert service.hedge_delay("default") == 0.05
@@ -0,0 +1,34 @@
+import json
+from typing import List
+from services.incremental_json_parser import IncrementalJSONParser
+
+RESPONSE: str = json.dumps(
+    {
+        "status": "uncertain",
+        "original_text": 'Mera "petrol" add nahi huwa?',
+        "translated_text": "My petrol was not added?\nPlease check.",
+        "possible_interpretations": ["Interpretation 1: withdrawal", "Interpretation 2: deposit"],
+        "context_analysis": "User mentions {petrol}, a [code] word.",
+    }
+)
+
+
+def test_fields_complete_in_order_across_chunk_boundaries():
+    parser = IncrementalJSONParser()
+    completed: List[str] = []
+    for index in range(0, len(RESPONSE), 3):
+        completed.extend(parser.feed(RESPONSE[index:index + 3]))
+
+    assert completed == ["status", "original_text", "translated_text", "context_analysis"]
+    assert parser.fields["original_text"] == 'Mera "petrol" add nahi huwa?'
+    assert parser.fields["translated_text"] == "My petrol was not added?\nPlease check."
+    assert parser.result() == json.loads(RESPONSE)
+
+
+def test_translation_is_available_before_the_object_closes():
+    parser = IncrementalJSONParser()
+    cut: int = RESPONSE.index('"possible_interpretations"')
+    parser.feed(RESPONSE[:cut])
+
+    assert parser.fields["translated_text"] == "My petrol was not added?\nPlease check."
+    assert "context_analysis" not in parser.fields
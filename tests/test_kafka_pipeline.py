@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from typing import Dict, List, Tuple
+from kafka_handler.in_memory_broker import InMemoryBroker, InMemoryConsumer, InMemoryProducer
+from kafka_handler.kafka_producer_service import KafkaProducerService
+from kafka_handler.kafka_consumer_service import KafkaConsumerService
+
+
+def event(conversation_id: str, number: int) -> Dict:
+    return {"topic": "conversation.user.replied", "number": number, "data": {"item": {"id": conversation_id}}}
+
+
+@pytest.fixture
+def partitions() -> int:
+    return 4
+
+
+@pytest.fixture
+def broker(partitions) -> InMemoryBroker:
+    return InMemoryBroker(partitions=partitions)
+
+
+@pytest.fixture
+def producer_service(broker) -> KafkaProducerService:
+    return KafkaProducerService(producer=InMemoryProducer(broker))
+
+
+@pytest.fixture
+def consumer_service(monkeypatch, broker, conversation_executor, es_service) -> KafkaConsumerService:
+    monkeypatch.setenv("KAFKA_POLL_TIMEOUT_MS", "10")
+    return KafkaConsumerService(
+        conversation_executor=conversation_executor,
+        es_service=es_service,
+        consumer=InMemoryConsumer(broker, group_id="test"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_events_of_a_conversation_are_processed_in_order(
+    broker, producer_service, consumer_service, conversation_executor
+):
+    for number in range(5):
+        for conversation_id in ("101", "202", "303"):
+            assert await producer_service.publish(event(conversation_id, number))
+
+    await consumer_service.start()
+    await asyncio.sleep(0.05)
+    await consumer_service.stop()
+
+    processed: List[Tuple[str, int]] = conversation_executor.processed
+    for conversation_id in ("101", "202", "303"):
+        assert [number for key, number in processed if key == conversation_id] == list(range(5))
+    assert sum(broker.committed["test"].values()) == 15
+
+
+@pytest.mark.parametrize("partitions", [1])
+@pytest.mark.asyncio
+async def test_failed_event_is_recorded_and_does_not_block_the_partition(
+    broker, producer_service, consumer_service, conversation_executor, es_service
+):
+    await producer_service.publish(event("101", -1))
+    await producer_service.publish(event("101", 1))
+
+    await consumer_service.start()
+    await asyncio.sleep(0.05)
+    await consumer_service.stop()
+
+    assert conversation_executor.processed == [("101", 1)]
+    assert len(es_service.documents) == 1
+    assert list(broker.committed["test"].values()) == [2]
+
+
+@pytest.mark.parametrize("partitions", [2])
+@pytest.mark.asyncio
+async def test_restarted_consumer_resumes_from_committed_offsets(
+    broker, producer_service, consumer_service, conversation_executor, es_service
+):
+    await producer_service.publish(event("101", 1))
+    await consumer_service.start()
+    await asyncio.sleep(0.05)
+    await consumer_service.stop()
+
+    await producer_service.publish(event("101", 2))
+    restarted = KafkaConsumerService(
+        conversation_executor=conversation_executor,
+        es_service=es_service,
+        consumer=InMemoryConsumer(broker, group_id="test"),
+    )
+    await restarted.start()
+    await asyncio.sleep(0.05)
+    await restarted.stop()
+
+    assert conversation_executor.processed == [("101", 1), ("101", 2)]
+
+
+@pytest.mark.parametrize("partitions", [1])
+@pytest.mark.asyncio
+async def test_failed_commit_is_retried_for_a_quiet_partition(
+    broker, producer_service, consumer_service
+):
+    await producer_service.publish(event("101", 1))
+    consumer = consumer_service.consumer
+    commit = consumer.commit
+
+    async def failing_commit(offsets):
+        raise ConnectionError("coordinator not available")
+
+    consumer.commit = failing_commit
+    await consumer_service.start()
+    await asyncio.sleep(0.05)
+    await consumer_service.commit()
+    assert "test" not in broker.committed
+
+    consumer.commit = commit
+    await consumer_service.stop()
+
+    assert list(broker.committed["test"].values()) == [1]
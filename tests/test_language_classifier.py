@@ -0,0 +1,47 @@
+import os
+import pytest
+from services.language_classifier import LanguageClassifier, language_label
+from services.openai_translator_service import OpenAITranslatorService
+from tests.language_benchmark import LABELED_MESSAGES
+
+classifier: LanguageClassifier = LanguageClassifier()
+
+
+def test_confident_local_predictions_match_labels():
+    resolved: int = 0
+    for message, label in LABELED_MESSAGES:
+        language, confidence = classifier.classify(message)
+        if classifier.is_confident(confidence):
+            resolved += 1
+            assert language == label, message
+    print(f"resolved locally: {resolved}/{len(LABELED_MESSAGES)}")
+
+
+def test_native_scripts_are_resolved_locally():
+    assert classifier.classify("मेरा पैसा अभी तक नहीं आया") == ("Hindi", 1.0)
+    assert classifier.classify("আমার টাকা এখনো আসেনি") == ("Bengali", 1.0)
+    assert not classifier.is_confident(classifier.classify("12345 ??")[1])
+
+
+def test_free_text_llm_answers_get_a_bounded_label():
+    assert language_label("Hinglish") == "Hinglish"
+    assert language_label("The language is Hindi") == "other"
+
+
+# compares against the live openai detector, only runs when a key is configured
+@pytest.mark.skipif(not os.getenv("OPENAPI_KEY"), reason="needs the openai api")
+@pytest.mark.asyncio
+async def test_local_classifier_against_llm():
+    translator: OpenAITranslatorService = OpenAITranslatorService()
+    llm_correct: int = 0
+    local_correct: int = 0
+    for message, label in LABELED_MESSAGES:
+        if await translator.detect_language_async_v2(message) == label:
+            llm_correct += 1
+        if await translator.detect_language_async_v3(message) == label:
+            local_correct += 1
+    print(
+        f"llm accuracy: {llm_correct}/{len(LABELED_MESSAGES)} "
+        f"with local classifier: {local_correct}/{len(LABELED_MESSAGES)}"
+    )
+    assert local_correct >= llm_correct
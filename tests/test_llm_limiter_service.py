@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from services.llm_limiter_service import LLMLimiterService
+
+
+class RateLimitError(Exception):
+    status_code = 429
+    response = None
+
+
+@pytest.fixture
+def limiter_env(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_MIN", "1")
+    monkeypatch.setenv("LLM_CONCURRENCY_MAX", "10")
+    monkeypatch.setenv("LLM_LATENCY_TARGET", "5")
+    monkeypatch.setenv("LLM_DECREASE_COOLDOWN", "0")
+    monkeypatch.setenv("LLM_RETRY_MAX_DELAY", "0")
+    return monkeypatch
+
+
+@pytest.mark.asyncio
+async def test_in_flight_calls_never_exceed_the_limit(limiter_env):
+    # capped at the initial limit so additive increase cannot open a third slot
+    limiter_env.setenv("LLM_CONCURRENCY_INITIAL", "2")
+    limiter_env.setenv("LLM_CONCURRENCY_MAX", "2")
+    service = LLMLimiterService()
+    running: int = 0
+    peak: int = 0
+
+    async def request():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*[service.call("test-model", request) for _ in range(10)])
+
+    assert peak <= 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_call_halves_the_limit_and_is_retried(limiter_env):
+    limiter_env.setenv("LLM_CONCURRENCY_INITIAL", "8")
+    service = LLMLimiterService()
+    attempts: int = 0
+
+    async def request():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RateLimitError()
+        return "ok"
+
+    result = await service.call("test-model", request)
+
+    assert result == "ok"
+    assert attempts == 2
+    assert service.limiter("test-model").limit < 5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_does_not_move_the_limit(limiter_env):
+    limiter_env.setenv("LLM_CONCURRENCY_INITIAL", "4")
+    service = LLMLimiterService()
+
+    async def request():
+        await asyncio.sleep(1)
+
+    task = asyncio.create_task(service.call("test-model", request))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert service.limiter("test-model").limit == 4
+    assert service.limiter("test-model").in_flight == 0
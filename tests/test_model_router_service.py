@@ -0,0 +1,28 @@
+import json
+from services.model_router_service import ModelRouterService
+
+
+def test_uncertain_conversations_are_escalated():
+    router = ModelRouterService()
+
+    route = router.route(message="Problem abhi bhi hai", last_status="uncertain")
+
+    assert route.name == "escalated"
+
+
+def test_short_messages_go_to_the_fast_route():
+    router = ModelRouterService()
+
+    assert router.route(message="Bonoos kab milega?", last_status="no_error").name == "short_clear"
+    assert router.route(message="x" * 500, last_status="no_error").name == "default"
+
+
+def test_routes_are_read_from_config(monkeypatch):
+    monkeypatch.setenv(
+        "MODEL_ROUTES",
+        json.dumps([{"name": "bengali", "model": "gpt-4o", "scripts": ["bengali"]}]),
+    )
+    router = ModelRouterService()
+
+    assert router.route(message="আমার টাকা এখনো আসেনি").model == "gpt-4o"
+    assert router.route(message="hello").name == "fallback"
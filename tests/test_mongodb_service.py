@@ -0,0 +1,82 @@
+import pytest
+from services.mongodb_service import MongodbService
+
+
+@pytest.fixture
+def mongo_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("MONGO_SPILL_DIR", str(tmp_path))
+    monkeypatch.setenv("MONGO_FLUSH_INTERVAL", "0.05")
+    monkeypatch.setenv("MONGO_FLUSH_WORKERS", "1")
+    return monkeypatch
+
+
+@pytest.mark.asyncio
+async def test_documents_are_coalesced_into_one_insert_many(mongo_env, mongo_client):
+    service = MongodbService(client=mongo_client)
+
+    for number in range(10):
+        await service.add_message_translated_dict({"number": number})
+    await service.stop()
+
+    assert [len(documents) for documents in mongo_client.inserts] == [10]
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_spilled_and_replayed(mongo_env, mongo_client, tmp_path):
+    service = MongodbService(client=mongo_client)
+    mongo_client.available = False
+
+    await service.add_message_translated_dict({"number": 1})
+    await service.stop()
+    assert mongo_client.inserts == []
+    assert list(tmp_path.iterdir())
+
+    mongo_client.available = True
+    await service.replay_spilled()
+
+    assert mongo_client.inserts == [[{"number": 1}]]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_full_queue_spills_instead_of_blocking(mongo_env, mongo_client, tmp_path):
+    mongo_env.setenv("MONGO_MAX_PENDING", "1")
+    mongo_env.setenv("MONGO_ENQUEUE_TIMEOUT", "0.01")
+    mongo_env.setenv("MONGO_FLUSH_WORKERS", "0")
+    mongo_env.setenv("MONGO_DRAIN_TIMEOUT", "0.01")
+    service = MongodbService(client=mongo_client)
+
+    await service.add_message_translated_dict({"number": 1})
+    await service.add_message_translated_dict({"number": 2})
+
+    assert service.queue.qsize() == 1
+    assert list(tmp_path.iterdir())
+    await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_documents_left_after_the_drain_timeout_are_spilled(mongo_env, mongo_client):
+    mongo_env.setenv("MONGO_FLUSH_WORKERS", "0")
+    mongo_env.setenv("MONGO_DRAIN_TIMEOUT", "0.01")
+    service = MongodbService(client=mongo_client)
+
+    await service.add_message_translated_dict({"number": 1})
+    await service.add_message_translated_dict({"number": 2})
+    await service.stop()
+
+    await service.replay_spilled()
+
+    assert mongo_client.inserts == [[{"number": 1}, {"number": 2}]]
+
+
+@pytest.mark.asyncio
+async def test_replay_left_by_a_dead_process_is_claimed_again(mongo_env, mongo_client, tmp_path):
+    service = MongodbService(client=mongo_client)
+    await service.spill([("intercom_app", "translations", {"number": 1})], reason="failed")
+    (spill_path,) = tmp_path.iterdir()
+    spill_path.rename(f"{spill_path}.replay.999999999")
+
+    await service.replay_spilled()
+
+    assert mongo_client.inserts == [[{"number": 1}]]
+    assert list(tmp_path.iterdir()) == []
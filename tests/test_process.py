@@ -10,11 +10,11 @@ async def dialog_process():
     user_id: str = "6798a0c79645a8b3711b89d3"
     admin_id: str = "8028082"
 
-    status, data = intercom_client.create_conversation(
+    status, data = await intercom_client.create_conversation_async(
         user_id=user_id, message="namaste"
     )
     new_conversatin_id: str = data.get("conversation_id", "")
-    intercom_client.attach_admin_to_conversation(
+    await intercom_client.attach_admin_to_conversation_async(
         admin_id=admin_id, conversation_id=new_conversatin_id
     )
     await asyncio.sleep(random.uniform(3, 5))
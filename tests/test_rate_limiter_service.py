@@ -0,0 +1,36 @@
+import asyncio
+from typing import List
+import pytest
+from services.rate_limiter_service import (
+    TokenBucketRateLimiter,
+    PRIORITY_NOTE,
+    PRIORITY_REPLY,
+)
+
+
+@pytest.mark.asyncio
+async def test_replies_are_served_before_queued_notes():
+    limiter = TokenBucketRateLimiter(name="test", rate_per_second=50, capacity=1)
+    await limiter.acquire(PRIORITY_NOTE)
+    order: List[str] = []
+
+    async def request(name: str, priority: int):
+        await limiter.acquire(priority)
+        order.append(name)
+
+    await asyncio.gather(
+        request("note_1", PRIORITY_NOTE),
+        request("note_2", PRIORITY_NOTE),
+        request("reply", PRIORITY_REPLY),
+    )
+
+    assert order == ["reply", "note_1", "note_2"]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_remaining_header_blocks_until_reset():
+    limiter = TokenBucketRateLimiter(name="test", rate_per_second=1000, capacity=10)
+    limiter.update_from_headers({"X-RateLimit-Remaining": "0"}, status=429)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.acquire(PRIORITY_REPLY), timeout=0.5)
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from services.translation_cache_service import TranslationCacheService
+
+
+@pytest.fixture
+def cache(monkeypatch, redis_client) -> TranslationCacheService:
+    monkeypatch.setenv("TRANSLATION_CACHE_MEMORY_SIZE", "2")
+    return TranslationCacheService(connection_pool=None, redis_client=redis_client)
+
+
+def counting_translator(calls: list, value: str = "hello"):
+    async def translate() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return value
+
+    return translate
+
+
+async def lookup(cache: TranslationCacheService, message: str, translate) -> str:
+    return await cache.get_or_translate(
+        message=message,
+        target_language="English",
+        prompt_version="v1",
+        model="gpt-4o-mini",
+        translate=translate,
+    )
+
+
+@pytest.mark.asyncio
+async def test_memory_hit_skips_the_translator(cache):
+    calls = []
+
+    assert await lookup(cache, "hola", counting_translator(calls)) == "hello"
+    assert await lookup(cache, "  hola ", counting_translator(calls)) == "hello"
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted(cache):
+    calls = []
+
+    await lookup(cache, "uno", counting_translator(calls, "one"))
+    await lookup(cache, "dos", counting_translator(calls, "two"))
+    await lookup(cache, "uno", counting_translator(calls, "one"))
+    await lookup(cache, "tres", counting_translator(calls, "three"))
+
+    assert len(cache.memory_cache) == 2
+    assert cache.make_key("dos", "English", "v1", "gpt-4o-mini") not in cache.memory_cache
+    assert cache.make_key("uno", "English", "v1", "gpt-4o-mini") in cache.memory_cache
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_fills_the_memory_cache(cache, redis_client):
+    calls = []
+    key: str = cache.make_key("hola", "English", "v1", "gpt-4o-mini")
+    redis_client.values[key] = "hello from redis"
+
+    assert await lookup(cache, "hola", counting_translator(calls)) == "hello from redis"
+
+    assert calls == []
+    assert cache.memory_cache[key] == "hello from redis"
+
+
+@pytest.mark.asyncio
+async def test_identical_messages_share_one_call(cache):
+    calls = []
+
+    results = await asyncio.gather(
+        *(lookup(cache, "hola", counting_translator(calls)) for _ in range(5))
+    )
+
+    assert results == ["hello"] * 5
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_owner_is_cancelled(cache):
+    calls = []
+    owner: asyncio.Task = asyncio.create_task(
+        lookup(cache, "hola", counting_translator(calls))
+    )
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(lookup(cache, "hola", counting_translator(calls)))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    results = await asyncio.gather(*waiters)
+
+    assert owner.cancelled()
+    assert results == ["hello"] * 3
+    assert len(calls) == 2